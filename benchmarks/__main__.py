@@ -0,0 +1,10 @@
+### Includes ###
+## Native
+from sys	import exit
+## Project
+from benchmarks.suite	import Main
+
+##
+# python -m benchmarks: Run the benchmark suite. See benchmarks.suite
+##
+exit(Main())
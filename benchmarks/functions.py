@@ -0,0 +1,62 @@
+### Includes ###
+## Native
+from numpy		import asarray, cos, e, exp, pi, sqrt
+## Project
+from lib.mealpy_optimiser_base	import MealPyOptimiserBase
+
+##
+# Benchmark function: A classic n-dimensional test function as a MealPyOptimiserBase problem
+#
+# values() scores a [population, dimensions] array. score() goes through it one agent
+# at a time, like a user's problem would. Batched() adds the scoreBatch() path.
+##
+class BenchmarkFunction(MealPyOptimiserBase):
+	BOUND		= 5.0		# float search space is [-BOUND, BOUND] in every dimension
+	OPTIMUM		= 0.0		# float global minimum
+	##
+	# params:
+	#	dimensions:	int number of variables
+	#	options:	MealPyOptimiserBase options, e.g. epochs and population
+	##
+	def __init__(self, dimensions=2, **options):
+		options.setdefault("varType", MealPyOptimiserBase.FLOAT_VAR)
+		super().__init__(**options)
+		self.dimensions	= dimensions	# int number of variables
+	@property
+	def lowerBounds(self):
+		return [-self.BOUND] * self.dimensions
+	@property
+	def upperBounds(self):
+		return [self.BOUND] * self.dimensions
+	def score(self, solution):
+		return float(self.values(asarray(solution, dtype=float)[None, :])[0])
+	##
+	# Vectorised function values (Abstract)
+	##
+	def values(self, solutions):
+		raise Exception("%s doesn't override abstract values method of BenchmarkFunction" %(__class__.__name__))
+	##
+	# Subclass of a function that scores whole generations with scoreBatch()
+	##
+	@classmethod
+	def Batched(cls):
+		return type("Batch%s" %(cls.__name__), (cls,), {"scoreBatch": lambda self, solutions: self.values(solutions)})
+class Sphere(BenchmarkFunction):
+	BOUND	= 5.12
+	def values(self, solutions):
+		return (solutions ** 2).sum(axis=1)
+class Rosenbrock(BenchmarkFunction):
+	BOUND	= 5.0
+	def values(self, solutions):
+		return (100 * (solutions[:, 1:] - solutions[:, :-1] ** 2) ** 2 + (1 - solutions[:, :-1]) ** 2).sum(axis=1)
+class Rastrigin(BenchmarkFunction):
+	BOUND	= 5.12
+	def values(self, solutions):
+		return 10 * solutions.shape[1] + (solutions ** 2 - 10 * cos(2 * pi * solutions)).sum(axis=1)
+class Ackley(BenchmarkFunction):
+	BOUND	= 32.768
+	def values(self, solutions):
+		return (-20 * exp(-0.2 * sqrt((solutions ** 2).mean(axis=1)))
+			- exp(cos(2 * pi * solutions).mean(axis=1)) + 20 + e)
+
+FUNCTIONS	= {"sphere": Sphere, "rosenbrock": Rosenbrock, "rastrigin": Rastrigin, "ackley": Ackley}
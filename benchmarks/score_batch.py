@@ -0,0 +1,60 @@
+### Includes ###
+## Native
+from argparse	import ArgumentParser
+from time		import perf_counter
+## Project
+from lib.mealpy_optimiser_base	import MealPyOptimiserBase
+
+##
+# scoreBatch benchmark: README Rosenbrock scored per agent vs per generation
+#
+# Usage: python -m benchmarks.score_batch --population 500 --epochs 1000
+##
+class Rosenbrock(MealPyOptimiserBase):
+	@property
+	def lowerBounds(self):
+		return [-5, -5]
+	@property
+	def upperBounds(self):
+		return [5, 5]
+	def score(self, solution):
+		a, b	= 1, 100
+		x, y	= solution[0], solution[1]
+		return (x - a) ** 2 + b * (y - x**2) ** 2
+##
+# Same problem, scored a whole generation at a time
+##
+class BatchRosenbrock(Rosenbrock):
+	def scoreBatch(self, solutions):
+		a, b	= 1, 100
+		x, y	= solutions[:, 0], solutions[:, 1]
+		return (x - a) ** 2 + b * (y - x**2) ** 2
+##
+# Time one solve()
+#
+# output:	(float seconds, float best fitness, int fitness evaluations)
+##
+def timeSolve(optimiserClass, algorithm, epochs, population, seed):
+	optimiser	= optimiserClass(
+		algorithm=	MealPyOptimiserBase.CONSTRCUTORS[algorithm],
+		varType=	MealPyOptimiserBase.FLOAT_VAR,
+		epochs=		epochs,
+		population=	population
+	)
+	started		= perf_counter()
+	optimiser.solve(seed=seed)
+	return perf_counter() - started, optimiser.lastResult.target.fitness, optimiser.solver.nfe_counter
+
+if __name__ == "__main__":
+	parser	= ArgumentParser(description="Compare score() and scoreBatch() on the README Rosenbrock problem")
+	parser.add_argument("--algorithms", nargs="+", default=["OriginalGWO", "OriginalPSO", "OriginalDE", "OriginalWOA"])
+	parser.add_argument("--epochs", type=int, default=200)
+	parser.add_argument("--population", type=int, default=500)
+	parser.add_argument("--seed", type=int, default=1)
+	args	= parser.parse_args()
+	MealPyOptimiserBase.MapConstructors()
+	print("%-14s %12s %12s %9s %14s %14s" %("algorithm", "score (s)", "batch (s)", "speedup", "score best", "batch best"))
+	for algorithm in args.algorithms:
+		single	= timeSolve(Rosenbrock, algorithm, args.epochs, args.population, args.seed)
+		batch	= timeSolve(BatchRosenbrock, algorithm, args.epochs, args.population, args.seed)
+		print("%-14s %12.3f %12.3f %8.1fx %14.3g %14.3g" %(algorithm, single[0], batch[0], single[0] / batch[0], single[1], batch[1]))
\ No newline at end of file
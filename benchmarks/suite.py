@@ -0,0 +1,256 @@
+### Includes ###
+## Native
+from argparse			import ArgumentParser
+from datetime			import datetime
+from json				import dump, load
+from multiprocessing	import Pipe, Process
+from os					import environ, pathsep
+from os.path			import abspath, dirname
+from platform			import platform, python_version
+from resource			import getrusage, RUSAGE_SELF
+from subprocess			import run
+from sys				import executable, exit
+from time				import perf_counter
+from hyperopt.hp		import uniformint
+from sklearn.datasets	import make_friedman1
+from pandas				import DataFrame
+## Project
+from benchmarks.functions			import FUNCTIONS
+from lib.estimators					import GBDTEstimator, MLPEstimator, XGBoostEstimator
+from lib.estimators.svr				import SVREstimator
+from lib.hyperopt_hp_tuner_base		import HyperoptHpTunerBase
+from lib.mealpy_optimiser_base		import MealPyOptimiserBase
+
+##
+# Benchmark suite: Standard workloads for the optimiser, estimator and tuner hot paths
+#
+# Every workload runs in its own process so peak RSS is its own and one failure
+# doesn't stop the rest. Results are a JSON dict of workload name: metrics:
+#	wallTime				float seconds
+#	evaluations				int fitness evaluations, trials or rows predicted
+#	evaluationsPerSecond	float
+#	peakRssMb				float peak resident memory of the workload's process
+#	quality					float lower is better: best fitness, test rmse or best trial loss
+#
+# import: workloads time a cold import in a fresh interpreter against IMPORT_BUDGETS,
+# with quality the number of HEAVY_MODULES it loaded. Going over budget is a failure.
+#
+# Usage:	python -m benchmarks --quick --output results.json
+#			python -m benchmarks --baseline results.json	(exit code 1 on a regression)
+##
+ESTIMATORS		= {"XGBoostEstimator": XGBoostEstimator, "GBDTEstimator": GBDTEstimator,
+	"MLPEstimator": MLPEstimator, "SVREstimator": SVREstimator}
+MAX_ROWS		= {"SVREstimator": 10000}		# Estimators too slow for the biggest sizes
+COMPARED		= ["wallTime", "peakRssMb", "quality"]
+QUALITY_FLOOR	= 1e-9		# Smallest quality change that can be a regression
+ROOT			= dirname(dirname(abspath(__file__)))		# Repository root, for import workloads' PYTHONPATH
+HEAVY_MODULES	= ["xgboost", "sklearn", "hyperopt", "mealpy", "colorama", "scipy"]	# Backends only their users should import
+##
+# Cold import workloads: {string name: (string statement, float budget seconds)}
+##
+IMPORT_BUDGETS	= {
+	"import:XGBoostEstimator":		("from lib.estimators import XGBoostEstimator", 0.5),
+	"import:MealPyOptimiserBase":	("from lib.mealpy_optimiser_base import MealPyOptimiserBase", 0.5)
+}
+IMPORT_SCRIPT	= """
+from sys	import modules
+from time	import perf_counter
+started	= perf_counter()
+%s
+print(perf_counter() - started)
+print(" ".join(name for name in %r if name in modules))
+"""
+##
+# Tuner for the benchmark: Train and test rmse
+##
+class BenchmarkTuner(HyperoptHpTunerBase):
+	def evaluate(self):
+		self.model.train()
+		return self.model.test()["rmse"]
+##
+# Synthetic regression data: Friedman #1 with extra noise features
+##
+def SyntheticData(rows, features=20, seed=1):
+	inputs, targets	= make_friedman1(n_samples=rows, n_features=features, noise=1.0, random_state=seed)
+	data			= DataFrame(inputs, columns=["x%d" %(index) for index in range(features)])
+	data["target"]	= targets
+	return data
+############
+# Workloads: Each returns its metrics dict
+############
+def SolveWorkload(function, dimensions, algorithm, batch, epochs, population, seed):
+	functionClass	= FUNCTIONS[function].Batched() if batch else FUNCTIONS[function]
+	optimiser		= functionClass(dimensions, algorithm=MealPyOptimiserBase.CONSTRCUTORS[algorithm], epochs=epochs, population=population)
+	started			= perf_counter()
+	optimiser.solve(seed=seed)
+	wallTime		= perf_counter() - started
+	evaluations		= optimiser.solver.nfe_counter
+	return {"wallTime": wallTime, "evaluations": evaluations, "evaluationsPerSecond": evaluations / wallTime,
+		"quality": float(optimiser.lastResult.target.fitness)}
+def BarrageWorkload(function, dimensions, algorithms, epochs, population, seed):
+	optimiser	= FUNCTIONS[function](dimensions, epochs=epochs, population=population)
+	started		= perf_counter()
+	results		= optimiser.barrage(models=algorithms, seed=seed)
+	wallTime	= perf_counter() - started
+	evaluations	= int(results["evaluations"].sum())
+	return {"wallTime": wallTime, "evaluations": evaluations, "evaluationsPerSecond": evaluations / wallTime,
+		"quality": float(results["fitness"].min())}
+def EstimatorWorkload(estimator, rows, seed):
+	model		= ESTIMATORS[estimator](SyntheticData(rows, seed=seed), "target")
+	started		= perf_counter()
+	model.train()
+	trained		= perf_counter()
+	scores		= model.test()
+	tested		= perf_counter()
+	predictions	= model.predict(model.testInputs)
+	predicted	= perf_counter()
+	return {"wallTime": predicted - started, "trainTime": trained - started, "testTime": tested - trained,
+		"predictTime": predicted - tested, "evaluations": len(predictions),
+		"evaluationsPerSecond": len(predictions) / (predicted - tested), "quality": scores["rmse"]}
+##
+# Time a statement's import in a fresh interpreter: The best of repeats, so a busy disk doesn't fail it
+##
+def ImportWorkload(statement, budget, repeats=3):
+	environment	= dict(environ, PYTHONPATH=pathsep.join(filter(None, [ROOT, environ.get("PYTHONPATH")])))
+	times		= []
+	for _ in range(repeats):
+		process	= run([executable, "-c", IMPORT_SCRIPT %(statement, HEAVY_MODULES)], cwd=ROOT, env=environment,
+			capture_output=True, text=True, check=True)
+		lines	= process.stdout.splitlines()
+		times.append(float(lines[0]))
+	loaded		= lines[1].split() if len(lines) > 1 else []
+	wallTime	= min(times)
+	return {"wallTime": wallTime, "evaluations": 1, "evaluationsPerSecond": 1 / wallTime, "quality": len(loaded),
+		"budget": budget, "overBudget": wallTime > budget, "heavyModules": loaded}
+def TunerWorkload(estimator, rows, iterations, workers, seed):
+	model		= ESTIMATORS[estimator](SyntheticData(rows, seed=seed), "target")
+	parameters	= dict(model.HYPEROPT_HP_TUNER_PARAMS)
+	if model.BUDGET_PARAMETER:
+		parameters[model.BUDGET_PARAMETER]	= uniformint(model.BUDGET_PARAMETER, 50, 200)
+	tuner		= BenchmarkTuner(model, iterations=iterations, parameters=parameters, workers=workers)
+	started		= perf_counter()
+	tuner.tune()
+	wallTime	= perf_counter() - started
+	return {"wallTime": wallTime, "evaluations": iterations, "evaluationsPerSecond": iterations / wallTime,
+		"quality": float(min(tuner.trials.losses()))}
+##
+# Every workload: {string name: (function, kwargs)}
+##
+def Workloads(quick=False):
+	workloads	= {}
+	epochs		= 30 if quick else 100
+	for name, (statement, budget) in IMPORT_BUDGETS.items():
+		workloads[name]	= (ImportWorkload, {"statement": statement, "budget": budget})
+	for function in FUNCTIONS:
+		for dimensions in ([2, 10] if quick else [2, 10, 30]):
+			for algorithm in (["OriginalGWO"] if quick else ["OriginalGWO", "OriginalDE"]):
+				for batch in [False, True]:
+					workloads["solve:%s:%dd:%s:%s" %(function, dimensions, algorithm, "batch" if batch else "agent")]	= (
+						SolveWorkload, {"function": function, "dimensions": dimensions, "algorithm": algorithm,
+						"batch": batch, "epochs": epochs, "population": 50, "seed": 1})
+	workloads["barrage:rastrigin:10d"]	= (BarrageWorkload, {"function": "rastrigin", "dimensions": 10,
+		"algorithms": ["OriginalGWO", "OriginalPSO", "OriginalDE", "OriginalWOA"], "epochs": epochs, "population": 50, "seed": 1})
+	for estimator in ESTIMATORS:
+		for rows in ([1000, 10000] if quick else [1000, 10000, 100000]):
+			if rows <= MAX_ROWS.get(estimator, rows):
+				workloads["estimator:%s:%d" %(estimator, rows)]	= (EstimatorWorkload, {"estimator": estimator, "rows": rows, "seed": 1})
+	for workers in [1, 2]:
+		workloads["tuner:XGBoostEstimator:%dworkers" %(workers)]	= (TunerWorkload, {"estimator": "XGBoostEstimator",
+			"rows": 2000 if quick else 10000, "iterations": 6 if quick else 20, "workers": workers, "seed": 1})
+	return workloads
+##
+# Run a workload in its own process
+#
+# output:	metrics dict with peakRssMb, or {"failure": string}
+##
+def RunIsolated(function, kwargs):
+	receiver, sender	= Pipe(duplex=False)
+	process				= Process(target=_IsolatedWorker, args=(function, kwargs, sender))
+	process.start()
+	sender.close()
+	try:
+		result	= receiver.recv()
+	except EOFError:
+		result	= False
+	process.join()
+	return result or {"failure": "worker exited with code %s" %(process.exitcode)}
+def _IsolatedWorker(function, kwargs, connection):
+	try:
+		result				= function(**kwargs)
+		# ru_maxrss is in KiB on Linux
+		result["peakRssMb"]	= getrusage(RUSAGE_SELF).ru_maxrss / 1024
+	except Exception as error:
+		result	= {"failure": "%s: %s" %(type(error).__name__, error)}
+	connection.send(result)
+	connection.close()
+##
+# Compare results against a baseline's
+#
+# A regression is wallTime or peakRssMb more than tolerance (relative) above the
+# baseline, or quality more than tolerance worse. Changes under minimumChange seconds/MB,
+# or under QUALITY_FLOOR for quality (fitnesses near an optimum of 0), are noise.
+#
+# output:	DataFrame: workload, metric, baseline, current, change, regression
+##
+def Compare(results, baseline, tolerance=0.25, minimumChange=0.05):
+	rows	= []
+	for name, metrics in results.items():
+		old	= baseline.get(name)
+		if not old or "failure" in old or "failure" in metrics:
+			continue
+		for metric in COMPARED:
+			if metric not in old or metric not in metrics:
+				continue
+			change		= metrics[metric] - old[metric]
+			regression	= change > tolerance * abs(old[metric]) and change > (QUALITY_FLOOR if metric == "quality" else minimumChange)
+			rows.append([name, metric, old[metric], metrics[metric], change / abs(old[metric]) if old[metric] else 0.0, regression])
+	return DataFrame(rows, columns=["workload", "metric", "baseline", "current", "change", "regression"])
+##
+# CLI
+##
+def Main(arguments=None):
+	parser	= ArgumentParser(description="Benchmark duckula's optimiser, estimator and tuner hot paths")
+	parser.add_argument("--quick", action="store_true", help="Smaller sizes and fewer epochs")
+	parser.add_argument("--only", nargs="+", default=[], help="Run workloads whose name contains any of these")
+	parser.add_argument("--list", action="store_true", help="List workloads and exit")
+	parser.add_argument("--output", default=None, help="Write results JSON here")
+	parser.add_argument("--baseline", default=None, help="Compare with a results JSON written by --output")
+	parser.add_argument("--tolerance", type=float, default=0.25, help="Relative slowdown allowed before it's a regression")
+	args		= parser.parse_args(arguments)
+	workloads	= {name: workload for name, workload in Workloads(args.quick).items()
+		if not args.only or any(part in name for part in args.only)}
+	if args.list:
+		print("\n".join(workloads))
+		return 0
+	results	= {}
+	for name, (function, kwargs) in workloads.items():
+		results[name]	= RunIsolated(function, kwargs)
+		metrics			= results[name]
+		if "failure" in metrics:
+			print("%-48s FAILED %s" %(name, metrics["failure"]))
+		else:
+			print("%-48s %9.3fs %12.1f/s %8.1fMB quality %.6g" %(name, metrics["wallTime"], metrics["evaluationsPerSecond"],
+				metrics["peakRssMb"], metrics["quality"]))
+			if metrics.get("overBudget"):
+				print("%-48s OVER BUDGET %.3fs > %.3fs, heavy modules: %s" %(name, metrics["wallTime"], metrics["budget"],
+					" ".join(metrics["heavyModules"]) or "none"))
+	if args.output:
+		with open(args.output, "w") as file:
+			dump({"meta": {"python": python_version(), "platform": platform(), "date": datetime.now().isoformat(),
+				"quick": args.quick}, "results": results}, file, indent=1)
+	overBudget	= [name for name, metrics in results.items() if metrics.get("overBudget")]
+	if args.baseline:
+		with open(args.baseline) as file:
+			comparison	= Compare(results, load(file)["results"], args.tolerance)
+		regressions	= comparison[comparison["regression"]]
+		print(comparison.to_string(index=False) if len(comparison) else "Nothing in common with the baseline")
+		if len(regressions):
+			print("%d regression(s)" %(len(regressions)))
+			return 1
+	if overBudget:
+		print("%d import(s) over budget" %(len(overBudget)))
+		return 1
+	return 0
+
+if __name__ == "__main__":
+	exit(Main())
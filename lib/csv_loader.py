@@ -0,0 +1,148 @@
+### Includes ###
+## Native
+from json		import dump, load
+from os			import makedirs, replace, stat
+from os.path	import isdir, isfile, join
+from shutil		import rmtree
+from numpy		import load as loadArray, save as saveArray
+from pandas		import DataFrame, concat, read_csv, to_numeric
+## Project
+
+##
+# CSV loader: Chunked, downcasting CSV parsing with a memory-mappable binary cache
+#
+# Parses the CSV in chunks, downcasting floats to float32 and integers to the
+# smallest integer type that holds them. The result is written next to the CSV as
+# a column store (<path>.duckula/, one .npy per column) keyed by the CSV's size,
+# mtime and the load options. Later loads memory-map the columns instead of
+# parsing, so they are near-instant and only touch the pages that get used.
+#
+# Cached columns are mapped copy-on-write, so the DataFrame can be edited freely
+# without changing the cache.
+##
+class CsvLoader():
+	CACHE_SUFFIX	= ".duckula"
+	##
+	# params:
+	#	path:		string CSV path
+	#	columns:	string[] columns to load. None for all
+	#	downcast:	bool float -> float32, int -> smallest int
+	#	engine:		string read_csv engine: c (chunked) or pyarrow (multi-threaded, whole file)
+	#	chunkSize:	int rows per parsed chunk with the c engine
+	#	cache:		bool read/write the binary copy next to the CSV
+	##
+	def __init__(self, path, columns=None, downcast=True, engine="c", chunkSize=1000000, cache=True):
+		self.path		= path			# string CSV path
+		self.columns	= columns		# string[] or None
+		self.downcast	= downcast		# bool downcast numeric columns
+		self.engine		= engine		# string c or pyarrow
+		self.chunkSize	= chunkSize		# int rows per chunk
+		self.cache		= cache			# bool use the column store
+	##
+	# Column store directory next to the CSV
+	##
+	@property
+	def cachePath(self):
+		return self.path + __class__.CACHE_SUFFIX
+	##
+	# What the cached copy depends on: The CSV's size and mtime plus the load options
+	##
+	@property
+	def cacheKey(self):
+		status	= stat(self.path)
+		return {
+			"size":		status.st_size,
+			"mtime":	status.st_mtime_ns,
+			"columns":	list(self.columns) if self.columns is not None else None,
+			"downcast":	self.downcast
+		}
+	##
+	# Load the CSV: From the column store if it's current, else parse (and cache)
+	#
+	# output:	DataFrame
+	##
+	def load(self):
+		if self.cache:
+			data	= self.loadCache()
+			if data is not None:
+				return data
+		data	= self.parse()
+		if self.cache:
+			try:
+				self.saveCache(data)
+			except OSError:
+				pass
+		return data
+	##
+	# Parse the CSV, downcasting chunk by chunk so the float64 copy never exists in full
+	##
+	def parse(self):
+		if self.engine == "pyarrow":
+			return self.downcastFrame(read_csv(self.path, usecols=self.columns, engine="pyarrow"))
+		chunks	= [self.downcastFrame(chunk) for chunk in
+			read_csv(self.path, usecols=self.columns, engine=self.engine, chunksize=self.chunkSize)]
+		# Chunks may have downcast the same column differently. concat finds the common type
+		return concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+	##
+	# Downcast numeric columns in place: float -> float32, int -> smallest int
+	##
+	def downcastFrame(self, data):
+		if not self.downcast:
+			return data
+		for column in data.columns:
+			kind	= data[column].dtype.kind
+			if kind == "f":
+				data[column]	= data[column].astype("float32")
+			elif kind in "iu":
+				data[column]	= to_numeric(data[column], downcast="integer")
+		return data
+	##
+	# Memory-map the cached columns if the cache matches the CSV and options
+	#
+	# output:	DataFrame or None
+	##
+	def loadCache(self):
+		metaPath	= join(self.cachePath, "meta.json")
+		if not isfile(metaPath):
+			return None
+		try:
+			with open(metaPath) as file:
+				meta	= load(file)
+			if meta["key"] != self.cacheKey:
+				return None
+			columns	= {}
+			for index, column in enumerate(meta["columns"]):
+				columnPath	= join(self.cachePath, "%d.npy" %(index))
+				if meta["dtypes"][index] == "object":
+					columns[column]	= loadArray(columnPath, allow_pickle=True)
+				else:
+					columns[column]	= loadArray(columnPath, mmap_mode="c")
+			return DataFrame(columns, copy=False)
+		except (OSError, ValueError, KeyError):
+			return None
+	##
+	# Write the column store. Written to a temporary directory and swapped in
+	##
+	def saveCache(self, data):
+		temporaryPath	= self.cachePath + ".tmp"
+		if isdir(temporaryPath):
+			rmtree(temporaryPath)
+		makedirs(temporaryPath)
+		for index, column in enumerate(data.columns):
+			values	= data[column].to_numpy()
+			saveArray(join(temporaryPath, "%d.npy" %(index)), values, allow_pickle=values.dtype.kind == "O")
+		with open(join(temporaryPath, "meta.json"), "w") as file:
+			dump({
+				"key":		self.cacheKey,
+				"columns":	[str(column) for column in data.columns],
+				"dtypes":	[str(data[column].dtype) if data[column].dtype.kind != "O" else "object" for column in data.columns]
+			}, file)
+		if isdir(self.cachePath):
+			rmtree(self.cachePath)
+		replace(temporaryPath, self.cachePath)
+	##
+	# Delete the column store
+	##
+	def clearCache(self):
+		if isdir(self.cachePath):
+			rmtree(self.cachePath)
\ No newline at end of file
@@ -1,21 +1,48 @@
 ### Include ###
 ## Native
-from importlib				import import_module
-from inspect				import getmembers, isclass, getmodule
-from argparse				import ArgumentParser
-from pandas					import read_csv
-from sklearn.metrics 		import r2_score, mean_absolute_error, mean_squared_error
-from sklearn.preprocessing	import Normalizer, StandardScaler
+from collections			import deque
+from concurrent.futures		import ThreadPoolExecutor
+from copy					import copy as shallowCopy
+from multiprocessing		import cpu_count
+from numpy					import ascontiguousarray, concatenate, empty, float64, ndarray, savetxt
+from numpy.lib.format		import open_memmap
+from pandas					import DataFrame
 ## Project
+from lib.csv_loader				import CsvLoader
+from lib.instrumentation			import INSTRUMENTATION
+from lib.model_cache			import ModelCache
+from lib.preprocessing_pipeline	import FixedPipeline, PreprocessingPipeline
+from lib.streaming_data_source	import StreamingDataSource, StreamingScores
 
 ##
 # Estiamtor base: A class for interchangeable supervised learning models
 ##
 class EstimatorBase():
 	HYPEROPT_HP_TUNER_PARAMS	= {}
+	BUDGET_PARAMETER			= False		# string attribute sizing training, e.g. nRounds. False if it can't be trained incrementally
+	##
+	# Quick load: Parse with CsvLoader, cached as a binary column store next to the CSV
+	#
+	# params:
+	#	columns:		string[] columns to load. The target is always included
+	#	loaderOptions:	CsvLoader options: downcast, engine, chunkSize, cache
+	##
+	@classmethod
+	def QuickLoad(cls, path, target, columns=None, **loaderOptions):
+		if columns is not None and target not in columns:
+			columns	= list(columns) + [target]
+		return cls(CsvLoader(path, columns=columns, **loaderOptions).load(), target)
+	##
+	# Quick stream: Read the CSV/Parquet in batches instead of loading it. See StreamingDataSource
+	#
+	# Only estimators that can train from batches support this, e.g. XGBoostEstimator.
+	#
+	# params:
+	#	sourceOptions:	StreamingDataSource options: batchSize, columns, splitRule, hashSeed, downcast
+	##
 	@classmethod
-	def QuickLoad(cls, path, target):
-		return cls(read_csv(path), target)
+	def QuickStream(cls, path, target, **sourceOptions):
+		return cls(StreamingDataSource(path, **sourceOptions), target)
 	##
 	# params:
 	#	trainData:			DataFrame
@@ -23,29 +50,102 @@ class EstimatorBase():
 	#	trainTestSplit:		float 0 < x < 1 split of data for training and testing. x = train size
 	##
 	def __init__(self, trainData, target, trainTestSplit=0.5, customParams={}, 
-			  scaler=StandardScaler(), normaliser=Normalizer()):
-		self.data				= trainData			# DataFrame with features and target
+			  scaler=None, normaliser=None):
+		self.data				= trainData			# DataFrame with features and target, or a StreamingDataSource
 		self.target				= target			# string target label
 		self.trainTestSplit		= trainTestSplit	# float train/test split
 		self.model				= False				# Trained model (XGBoost, MLP, or whatever)
-		self.scaler				= scaler			# sklearn.preprocessing Scaler
-		self.normaliser			= normaliser		# sklearn.preprocessing Normaliser
+		self.scaler				= scaler if scaler is not None else __class__.DefaultScaler()			# sklearn.preprocessing Scaler
+		self.normaliser			= normaliser if normaliser is not None else __class__.DefaultNormaliser()	# sklearn.preprocessing Normaliser
 		self.applyScaler		= False				# bool apply scaler during preprocessing inputs
 		self.applyNormaliser	= False				# bool apply normaliser during preprocessing inputs
 		self.customParams		= customParams		# dict of params not covered by the default model
+		self.fold				= False				# (trainRows, testRows) index arrays overriding trainTestSplit
+		self.warmStart			= False				# bool let train() continue the current model when only the budget grew
+		self.trainedState		= False				# (params, split key) the current model was trained with
+		self.pipeline			= PreprocessingPipeline(self)	# Cached train/test split and fitted preprocessing
+		self.modelCache			= False				# ModelCache train() loads from and saves to, or False
+		self.modelCacheKey		= False				# string ModelCache key of the configuration being trained
+	##
+	# Default scaler and normaliser: StandardScaler and Normalizer. sklearn is imported on first use
+	##
+	@staticmethod
+	def DefaultScaler():
+		from sklearn.preprocessing	import StandardScaler
+		return StandardScaler()
+	@staticmethod
+	def DefaultNormaliser():
+		from sklearn.preprocessing	import Normalizer
+		return Normalizer()
 	##
 	# Shuffle data
 	##
 	def shuffleData(self):
 		self.data	= self.data.sample(frac=1).reset_index(drop=True)
 	##
+	# Untrained shallow copy: Shares data and its raw arrays but has its own split and model
+	#
+	# Used to train the same estimator on several folds at once.
+	##
+	def copy(self):
+		estimator			= shallowCopy(self)
+		estimator.model		= False
+		if self.streaming:
+			estimator.pipeline	= PreprocessingPipeline(estimator)
+		else:
+			estimator.pipeline	= self.pipeline.refreshData().copyFor(estimator)
+		return estimator
+	##
+	# Trained copy without the data: The model, fitted scaler/normaliser and feature names
+	#
+	# Small enough to pickle for serving (see PredictionServer). Its FixedPipeline holds the
+	# feature names and fitted scaler/normaliser without a split, so predict() takes raw
+	# DataFrames and preprocessed arrays as usual, and never looks for data to refresh from.
+	##
+	def servingCopy(self):
+		if not self.model:
+			self.train()
+		featureNames	= self.featureNames
+		if not self.streaming:
+			self.pipeline.refresh()
+		estimator				= shallowCopy(self)
+		estimator.data			= None
+		estimator.fold			= False
+		estimator.modelCache	= False
+		estimator.pipeline		= FixedPipeline(estimator, featureNames, (None, None, None, None), self.pipeline.scaler, self.pipeline.normaliser)
+		return estimator
+	##
+	# Is data a StreamingDataSource rather than a DataFrame?
+	##
+	@property
+	def streaming(self):
+		return isinstance(self.data, StreamingDataSource)
+	##
+	# Key of the current train/test split: The pipeline's, or the StreamingDataSource's split rule
+	##
+	@property
+	def splitKey(self):
+		if self.streaming:
+			return self.data.key(self.target, self.trainTestSplit)
+		return self.pipeline.refresh().key
+	##
+	# Training (inputs, targets) batches of a StreamingDataSource
+	##
+	def trainingBatches(self):
+		return self.data.splitBatches(self.target, self.trainTestSplit, training=True)
+	##
+	# Test (inputs, targets) batches of a StreamingDataSource
+	##
+	def testBatches(self):
+		return self.data.splitBatches(self.target, self.trainTestSplit, training=False)
+	##
 	# Get training data  with target
 	#
 	# output:	DataFrame of training data including targets, not test data
 	##
 	@property
 	def trainingData(self):
-		return self.data[: int(len(self.data) * self.trainTestSplit)]
+		return self.data.iloc[self.pipeline.rows[0]]
 	##
 	# Get test data  with target
 	#
@@ -53,27 +153,23 @@ class EstimatorBase():
 	##
 	@property
 	def testData(self):
-		return self.data[int(len(self.data) * self.trainTestSplit) : ]
+		return self.data.iloc[self.pipeline.rows[1]]
 	##
 	# Get training data  without targets + Preprocessing Standard/Normal etc
 	#
-	# output:	DataFrame of training data excluding targets, not test data
+	# output:	ndarray of training data excluding targets, not test data. Cached by self.pipeline
 	##
 	@property
 	def trainingInputs(self):
-		data	= self.data[: int(len(self.data) * self.trainTestSplit)]
-		del data[self.target]
-		return self.preprocessInputs(data)
+		return self.pipeline.trainingInputs
 	##
-	# Get test data  without targets
+	# Get test data  without targets + Preprocessing fitted on the training data
 	#
-	# output:	DataFrame of test data excluding targets, not training data
+	# output:	ndarray of test data excluding targets, not training data. Cached by self.pipeline
 	##
 	@property
 	def testInputs(self):
-		data	= self.data[int(len(self.data) * self.trainTestSplit) : ]
-		del data[self.target]
-		return data
+		return self.pipeline.testInputs
 	##
 	# Get training targets
 	#
@@ -81,7 +177,7 @@ class EstimatorBase():
 	##
 	@property
 	def trainingTargets(self):
-		return self.data[self.target].values[:  int(len(self.data) * self.trainTestSplit)]
+		return self.pipeline.trainingTargets
 	##
 	# Get test targets
 	#
@@ -89,18 +185,16 @@ class EstimatorBase():
 	##
 	@property
 	def testTargets(self):
-		return self.data[self.target].values[ int(len(self.data) * self.trainTestSplit) : ]
+		return self.pipeline.testTargets
 	##
 	# Preprocess input data (Virtual)
 	#
-	# Use this method to apply Scaler, Normalisers, whatever
+	# Apply the Scaler, Normaliser, whatever was fitted on the training inputs. Never refits
 	##
 	def preprocessInputs(self, data):
-		if self.applyScaler and self.scaler:
-			data	= self.scaler.fit_transform(data)
-		if self.applyNormaliser and self.normaliser:
-			data	= self.normaliser.fit_transform(data)
-		return data
+		pipeline	= self.pipeline.refresh()
+		with INSTRUMENTATION.span("preprocessInputs"):
+			return pipeline.transform(data)
 	##
 	# Preprocess targets (Virtual)
 	##
@@ -114,6 +208,86 @@ class EstimatorBase():
 	def train(self):
 		raise "%s doesn't override abstract train method of EstimatorBase" %(__class__.__name__)
 	##
+	# State a model is trained from: Params without the budget, plus the split
+	##
+	def trainingState(self, params):
+		return (params, self.splitKey)
+	##
+	# Can train() continue the current model instead of starting again? (Final)
+	#
+	# True when self.warmStart is on and the model was trained on the same split with the
+	# same params, but for less than the current budget (see BUDGET_PARAMETER).
+	#
+	# params:
+	#	params:			dict model params excluding the budget
+	#	trainedBudget:	int rounds/estimators the current model already has
+	##
+	def canWarmStart(self, params, trainedBudget):
+		return bool(self.warmStart and self.model and self.BUDGET_PARAMETER
+			and self.trainedState == self.trainingState(params)
+			and trainedBudget < getattr(self, self.BUDGET_PARAMETER))
+	##
+	# Everything a trained model depends on, for the ModelCache key (Virtual)
+	#
+	# Content fingerprints stand in for the data and folds, so equal configurations
+	# match across runs and copies. Add anything train() reads outside allParams.
+	##
+	@property
+	def modelCacheState(self):
+		if self.streaming:
+			data	= self.data.fingerprint
+			split	= (self.trainTestSplit, self.data.splitRule, self.data.hashSeed)
+		else:
+			data	= self.pipeline.fingerprint
+			split	= self.trainTestSplit if self.fold is False else tuple(ModelCache.ArrayFingerprint(rows) for rows in self.fold)
+		preprocessing	= [(type(preprocessor).__name__, sorted(preprocessor.get_params().items())) if apply and preprocessor else None
+			for apply, preprocessor in ((self.applyScaler, self.scaler), (self.applyNormaliser, self.normaliser))]
+		params			= sorted((key, __class__.PlainValue(value)) for key, value in self.allParams.items())
+		budget			= __class__.PlainValue(getattr(self, self.BUDGET_PARAMETER)) if self.BUDGET_PARAMETER else None
+		return (type(self).__module__, type(self).__qualname__, data, self.target, split, preprocessing, params, budget)
+	##
+	# NumPy scalars -> Python values, so hyperopt's and hand-set params key alike
+	##
+	@staticmethod
+	def PlainValue(value):
+		return value.item() if hasattr(value, "item") and not hasattr(value, "__len__") else value
+	##
+	# Load the model for the current configuration from self.modelCache (Final)
+	#
+	# Call first thing in train(). On a hit the model, and the scaler/normaliser fitted
+	# with it, are installed and train() should return without training.
+	#
+	# output:	bool hit
+	##
+	def loadCachedModel(self):
+		if not self.modelCache:
+			return False
+		self.modelCacheKey	= self.modelCache.key(self)
+		entry				= self.modelCache.get(self.modelCacheKey)
+		if entry is None:
+			return False
+		self.model	= entry["model"]
+		if self.streaming:
+			return True
+		# Split with the preprocessors the model was trained behind, rather than refitting them
+		if self.pipeline.isStale:
+			self.pipeline.build((entry["scaler"], entry["normaliser"]))
+		else:
+			self.pipeline.scaler		= entry["scaler"]
+			self.pipeline.normaliser	= entry["normaliser"]
+		return True
+	##
+	# Save the freshly trained model to self.modelCache (Final). Call last thing in train()
+	##
+	def saveCachedModel(self):
+		if not self.modelCache or not self.modelCacheKey:
+			return
+		if self.streaming:
+			self.modelCache.put(self.modelCacheKey, self.model)
+		else:
+			self.modelCache.put(self.modelCacheKey, self.model, self.pipeline.scaler, self.pipeline.normaliser)
+		self.modelCacheKey	= False
+	##
 	# Get model parameters (Abstract)
 	# 
 	# This method should produce an object that defines the model, typically a {}. The
@@ -138,12 +312,17 @@ class EstimatorBase():
 	##
 	# Run test using test data and return RMSE, R2, and MAE scores 
 	#
+	# Streamed data is scored batch by batch over testBatches().
+	#
 	# output:	{"rmse": (root)mean_squared_error, "mae": <mean_absolute_error>, "r2": <r2_score>}
 	##
 	def test(self):
 		if not self.model:
 			self.train()
-		predictions	= self.predict(__class__.DataFrameToInputType(self.preprocessInputs(self.testInputs)))
+		if self.streaming:
+			return self.scoreBatches(self.testBatches())
+		from sklearn.metrics	import r2_score, mean_absolute_error, mean_squared_error
+		predictions	= self.predict(self.testInputs)
 		return {
 			"r2":	r2_score(predictions, self.testTargets),
 			"rmse":	mean_squared_error(predictions, self.testTargets) ** 0.5,
@@ -152,30 +331,167 @@ class EstimatorBase():
 	##
 	# Predict target valeus from 2D feature array
 	#
+	# DataFrames are raw inputs: Their training columns are selected and preprocessed here.
+	# Arrays are model inputs, already preprocessed, like testInputs.
+	#
 	# output:	Array of predictions/estimates
 	##
 	def predict(self, data):
-		return self.model.predict(self.__class__.DataFrameToInputType(data))
+		if isinstance(data, DataFrame):
+			data	= self.predictionInputs(data)
+		with INSTRUMENTATION.span("predict", estimator=type(self).__name__, rows=len(data)):
+			return self.model.predict(self.__class__.DataFrameToInputType(data))
+	##
+	# Input columns the model was trained on, in array column order
+	##
+	@property
+	def featureNames(self):
+		if self.streaming:
+			return self.data.featureNames(self.target)
+		return self.pipeline.refreshData().featureNames
+	##
+	# Raw DataFrame -> model inputs: Select the training columns and apply the fitted preprocessing
+	#
+	# Never refits. Streamed estimators have no preprocessing to apply. Arrays are taken
+	# as model inputs already, as in predict().
+	##
+	def predictionInputs(self, chunk):
+		if not isinstance(chunk, DataFrame):
+			return ascontiguousarray(chunk)
+		chunk	= PreprocessingPipeline.FeatureArray(chunk, self.featureNames)
+		if self.streaming:
+			return chunk
+		return self.preprocessInputs(chunk)
+	##
+	# Predict in chunks on a thread pool
+	#
+	# Chunks are preprocessed and predicted by worker threads, so models that release the
+	# GIL (XGBoost, most of sklearn's numeric code) use several cores. Inputs follow
+	# predict(): DataFrames are raw and preprocessed here, arrays are model inputs. Predictions are
+	# written into output in order as chunks finish, with at most 2 x workers chunks in flight.
+	#
+	# params:
+	#	inputs:		DataFrame, 2D array or iterable of DataFrame/array batches
+	#	chunkSize:	int rows per chunk for DataFrame/array inputs
+	#	workers:	int threads. None for one per core
+	#	output:		1D array to write into, e.g. a numpy.memmap. Allocated when None
+	#
+	# output:	ndarray of predictions: output if given
+	##
+	def predictBatches(self, inputs, chunkSize=100000, workers=None, output=None):
+		if isinstance(inputs, (DataFrame, ndarray)):
+			rows	= len(inputs)
+			slicer	= inputs.iloc if isinstance(inputs, DataFrame) else inputs
+			inputs	= (slicer[start:start + chunkSize] for start in range(0, rows, chunkSize))
+			if output is None:
+				output	= empty(rows)
+		pieces		= []
+		pending		= deque()
+		offset		= 0
+		workers		= workers or cpu_count()
+		# Bring the pipeline up to date before the threads share it
+		if not self.streaming:
+			self.pipeline.refreshData()
+			self.pipeline.refresh()
+		with ThreadPoolExecutor(max_workers=workers) as executor:
+			for chunk in inputs:
+				pending.append((offset, executor.submit(self._predictChunk, chunk)))
+				offset	+= len(chunk)
+				if len(pending) >= 2 * workers:
+					self._writePredictions(pending.popleft(), output, pieces)
+			while pending:
+				self._writePredictions(pending.popleft(), output, pieces)
+		if output is None:
+			return concatenate(pieces) if pieces else empty(0)
+		return output
+	##
+	# Predict a CSV or Parquet file in chunks without loading it
+	#
+	# Only the training input columns are read. Extra columns, like the target, are ignored.
+	#
+	# params:
+	#	path:		string .csv or .parquet input path
+	#	outputPath:	string .npy (written through a memmap) or text file with a prediction column. None to return an array
+	#	chunkSize:	int rows per chunk
+	#	workers:	int threads. None for one per core
+	#	output:		1D array to write into when there's no outputPath. Allocated when None
+	#
+	# output:	ndarray of predictions, or outputPath
+	##
+	def predictFile(self, path, outputPath=None, chunkSize=100000, workers=None, output=None):
+		source	= StreamingDataSource(path, batchSize=chunkSize, columns=self.featureNames, downcast=False)
+		batches	= (batch for _, batch in source.batches())
+		if outputPath is None:
+			return self.predictBatches(batches, workers=workers, output=empty(source.rowCount) if output is None else output)
+		if outputPath.endswith(".npy"):
+			output	= open_memmap(outputPath, mode="w+", dtype=float64, shape=(source.rowCount,))
+			self.predictBatches(batches, workers=workers, output=output)
+			output.flush()
+			return outputPath
+		with open(outputPath, "w") as file:
+			file.write("prediction\n")
+			self.predictBatches(batches, workers=workers, output=TextPredictionWriter(file))
+		return outputPath
+	##
+	# Predict one chunk. Runs on predictBatches' threads
+	##
+	def _predictChunk(self, chunk):
+		return self.predict(chunk)
+	##
+	# Write a finished chunk's predictions at its offset
+	##
+	@staticmethod
+	def _writePredictions(job, output, pieces):
+		offset, future	= job
+		predictions		= future.result()
+		if output is None:
+			pieces.append(predictions)
+		else:
+			output[offset:offset + len(predictions)]	= predictions
+	##
+	# Score (inputs, targets) batches without holding them all: test()'s dict
+	#
+	# params:
+	#	batches:	iterable of (inputs, targets), e.g. testBatches() or a StreamingDataSource
+	##
+	def scoreBatches(self, batches):
+		if isinstance(batches, StreamingDataSource):
+			batches	= batches.splitBatches(self.target, self.trainTestSplit, training=False)
+		scores	= StreamingScores()
+		for inputs, targets in batches:
+			scores.update(self.predict(inputs), targets)
+		return scores.scores
 	##
 	# Get R2 without including it in every script uses an EstimatorBase object
 	#
+	# Without targets, data is streamed as batches. See scoreBatches
+	#
 	# output:	float r2_score
 	##
-	def r2(self, data, targets):
+	def r2(self, data, targets=None):
+		if targets is None:
+			return self.scoreBatches(data)["r2"]
+		from sklearn.metrics	import r2_score
 		return r2_score(self.predict(data), targets)
 	##
 	# Get RMSE without including it in every script uses an EstimatorBase object
 	#
 	# output:	float mean_squared_error ^ 0.5
 	##
-	def rmse(self, data, targets):
+	def rmse(self, data, targets=None):
+		if targets is None:
+			return self.scoreBatches(data)["rmse"]
+		from sklearn.metrics	import mean_squared_error
 		return mean_squared_error(self.predict(data), targets) ** 0.5
 	##
 	# Get mean absolute error without including it in every script uses an EstimatorBase object
 	#
 	# output:	float mean_absolute_error
 	##
-	def mae(self, data, targets):
+	def mae(self, data, targets=None):
+		if targets is None:
+			return self.scoreBatches(data)["mae"]
+		from sklearn.metrics	import mean_absolute_error
 		return mean_absolute_error(self.predict(data), targets)
 	##
 	# Convert DataFrame to native data type (Virtual)
@@ -185,4 +501,29 @@ class EstimatorBase():
 	##
 	@classmethod
 	def DataFrameToInputType(cls, data):
-		return data
\ No newline at end of file
+		return data
+##
+# Hyperopt space: A HYPEROPT_HP_TUNER_PARAMS built on first access
+#
+# Estimator modules don't import hyperopt, so only code that tunes pays for it:
+#	HYPEROPT_HP_TUNER_PARAMS	= HyperoptSpace(lambda hp: {"C": hp.uniform("C", 0, 50)})
+##
+class HyperoptSpace():
+	def __init__(self, build):
+		self.build	= build		# callable(hyperopt.hp module) -> dict of hp.* parameter definitions
+		self.space	= None		# dict built space. None until first access
+	def __get__(self, instance, owner):
+		if self.space is None:
+			from hyperopt	import hp
+			self.space	= self.build(hp)
+		return self.space
+##
+# Text prediction writer: Lets predictBatches write chunks straight to an open text file
+#
+# Slice assignment appends, so it relies on predictBatches writing chunks in order.
+##
+class TextPredictionWriter():
+	def __init__(self, file):
+		self.file	= file		# Open text file
+	def __setitem__(self, rows, predictions):
+		savetxt(self.file, predictions, fmt="%.17g")
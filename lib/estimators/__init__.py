@@ -1,3 +1,22 @@
-from lib.estimators.xgboost_estimator	import XGBoostEstimator
-from lib.estimators.gbdt_estimator		import GBDTEstimator
-from lib.estimators.mlp_estimator		import MLPEstimator
\ No newline at end of file
+##
+# Estimators are loaded on first access, so `from lib.estimators import XGBoostEstimator`
+# doesn't import every estimator module
+##
+from importlib	import import_module
+
+ESTIMATOR_MODULES	= {
+	"XGBoostEstimator":	"lib.estimators.xgboost_estimator",
+	"GBDTEstimator":	"lib.estimators.gbdt_estimator",
+	"MLPEstimator":		"lib.estimators.mlp_estimator"
+}
+__all__	= list(ESTIMATOR_MODULES)
+
+def __getattr__(name):
+	if name not in ESTIMATOR_MODULES:
+		raise AttributeError("module %r has no attribute %r" %(__name__, name))
+	estimator			= getattr(import_module(ESTIMATOR_MODULES[name]), name)
+	globals()[name]		= estimator
+	return estimator
+
+def __dir__():
+	return sorted(list(globals()) + __all__)
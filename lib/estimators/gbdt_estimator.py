@@ -1,24 +1,24 @@
 ### Includes ###
 ## Native
-from sklearn.ensemble	import GradientBoostingRegressor
-from hyperopt.hp		import uniform, uniformint
 ## Project
-from lib.estimator_base	import EstimatorBase
+from lib.estimator_base	import EstimatorBase, HyperoptSpace
+from lib.instrumentation	import INSTRUMENTATION
 ##
 # Gradient-boosting Regressor, curtesy of sklearn.ensemble
 #
 # A wrapper for sklearn's GradientBoostingRegressor
 ##
 class GBDTEstimator(EstimatorBase):
+	BUDGET_PARAMETER	= "nEstimators"
 	##
 	# Hyperparameters definitions for Hyperopt
 	##
-	HYPEROPT_HP_TUNER_PARAMS	= {
-		"nEstimators": 		uniformint("nEstimators", 500, 2000),
-		"learningRate":		uniform("learningRate", 0.01, 0.3),
-		"minSampleSplit":	uniformint("minSampleSplit", 5,40),
-		"minSamplesLeaf":	uniformint("minSamplesLeaf", 5, 40)
-	}
+	HYPEROPT_HP_TUNER_PARAMS	= HyperoptSpace(lambda hp: {
+		"nEstimators": 		hp.uniformint("nEstimators", 500, 2000),
+		"learningRate":		hp.uniform("learningRate", 0.01, 0.3),
+		"minSampleSplit":	hp.uniformint("minSampleSplit", 5,40),
+		"minSamplesLeaf":	hp.uniformint("minSamplesLeaf", 5, 40)
+	})
 	def __init__(self, data, target, trainTestSplit=0.5, nEstimators=100, learningRate=0.1,
 			  minSamplesSplit=30, minSamplesLeaf=24):
 		super().__init__(data, target, trainTestSplit=trainTestSplit)
@@ -41,7 +41,23 @@ class GBDTEstimator(EstimatorBase):
 		}
 	##
 	# Train the model
+	#
+	# With self.warmStart, a model trained with the same params and split gets the extra
+	# estimators added through sklearn's warm_start instead of being trained again.
 	##
 	def train(self):
-		self.model	= GradientBoostingRegressor(**self.allParams)
-		self.model.fit(self.trainingInputs, self.trainingTargets)
\ No newline at end of file
+		params		= self.allParams
+		nEstimators	= params.pop("n_estimators")
+		if self.loadCachedModel():
+			self.trainedState	= self.trainingState(params)
+			return
+		if self.model and self.canWarmStart(params, self.model.n_estimators):
+			self.model.set_params(n_estimators=nEstimators, warm_start=True)
+		else:
+			from sklearn.ensemble	import GradientBoostingRegressor
+			self.model	= GradientBoostingRegressor(n_estimators=nEstimators, **params)
+		inputs, targets	= self.trainingInputs, self.trainingTargets
+		with INSTRUMENTATION.span("model.fit", estimator=type(self).__name__):
+			self.model.fit(inputs, targets)
+		self.trainedState	= self.trainingState(params)
+		self.saveCachedModel()
\ No newline at end of file
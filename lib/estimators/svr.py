@@ -1,15 +1,14 @@
 ### Includes ###
 ## Native
-from sklearn.svm	import SVR
-from hyperopt.hp	import uniform
 ## Project
-from lib.estimator_base	import EstimatorBase
+from lib.estimator_base	import EstimatorBase, HyperoptSpace
+from lib.instrumentation	import INSTRUMENTATION
 
 class SVREstimator(EstimatorBase):
-	HYPEROPT_HP_TUNER_PARAMS = {
-		"C": 		uniform("C", 0, 50),
-		"epsilon":	uniform("epsilon", 0.001, 0.5)
-	}
+	HYPEROPT_HP_TUNER_PARAMS = HyperoptSpace(lambda hp: {
+		"C": 		hp.uniform("C", 0, 50),
+		"epsilon":	hp.uniform("epsilon", 0.001, 0.5)
+	})
 	def __init__(self, data, target, trainTestSplit=0.5, customParams={}, C=1, epsilon=0.1):
 		super().__init__(data, target, trainTestSplit=trainTestSplit, customParams=customParams)
 		self.C					= C
@@ -20,5 +19,11 @@ class SVREstimator(EstimatorBase):
 	def params(self):
 		return {"C": self.C, "epsilon": self.epsilon}
 	def train(self):
+		if self.loadCachedModel():
+			return
+		from sklearn.svm	import SVR
 		self.model	= SVR(**self.allParams)
-		self.model.fit(self.trainingInputs, self.trainingTargets)
+		inputs, targets	= self.trainingInputs, self.trainingTargets
+		with INSTRUMENTATION.span("model.fit", estimator=type(self).__name__):
+			self.model.fit(inputs, targets)
+		self.saveCachedModel()
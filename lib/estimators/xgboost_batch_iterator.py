@@ -0,0 +1,31 @@
+### Includes ###
+## Native 
+from xgboost				import DataIter
+## Project
+
+##
+# XGBoost batch iterator: Feeds (inputs, targets) batches to xgboost's external memory DMatrix
+#
+# xgboost pages each batch out to cachePrefix files, so only one batch is in memory.
+# In its own module because subclassing DataIter imports xgboost: XGBoostEstimator
+# only imports it when it streams.
+##
+class XGBoostBatchIterator(DataIter):
+	##
+	# params:
+	#	batches:		callable returning a fresh iterable of (inputs, targets), e.g. estimator.trainingBatches
+	#	cachePrefix:	string path prefix for xgboost's page files
+	##
+	def __init__(self, batches, cachePrefix):
+		self.batches	= batches				# callable -> iterable of (inputs, targets)
+		self.iterator	= iter(batches())		# Current pass over the batches
+		super().__init__(cache_prefix=cachePrefix)
+	def next(self, input_data):
+		try:
+			inputs, targets	= next(self.iterator)
+		except StopIteration:
+			return False
+		input_data(data=inputs, label=targets)
+		return True
+	def reset(self):
+		self.iterator	= iter(self.batches())
@@ -1,23 +1,35 @@
 ### Includes ###
 ## Native 
-from xgboost				import DMatrix, train
-from hyperopt.hp			import uniform, uniformint
+from os					import getpid
+from os.path				import join
+from tempfile				import gettempdir
+from numpy					import ndarray
+from pandas					import DataFrame
 ## Project
-from lib.estimator_base		import EstimatorBase
+from lib.estimator_base		import EstimatorBase, HyperoptSpace
+from lib.instrumentation		import INSTRUMENTATION
 ##
 # XGBoost estimator: An estimator using XGBoost 2
+#
+# Trains out-of-core from a StreamingDataSource (see EstimatorBase.QuickStream) through
+# XGBoostBatchIterator. Page files go in the temp directory and are deleted with their matrix.
+#
+# xgboost is imported by the methods that use it, so importing the estimator is cheap.
 ##
 class XGBoostEstimator(EstimatorBase):
-	HYPEROPT_HP_TUNER_PARAMS	= {
-		"learningRate":	uniform("learningRate", 0.03, 0.3),
-		"rateDrop":		uniform("rateDrop", 0.01, 0.2),
-		"skipDrop":		uniform("skipDrop", 0.3, 0.7),
-		"maxDepth":		uniformint("maxDepth", 2, 10),
-		"nRounds":		uniformint("nRounds", 700, 1200)
-	}
+	BUDGET_PARAMETER			= "nRounds"
+	HYPEROPT_HP_TUNER_PARAMS	= HyperoptSpace(lambda hp: {
+		"learningRate":	hp.uniform("learningRate", 0.03, 0.3),
+		"rateDrop":		hp.uniform("rateDrop", 0.01, 0.2),
+		"skipDrop":		hp.uniform("skipDrop", 0.3, 0.7),
+		"maxDepth":		hp.uniformint("maxDepth", 2, 10),
+		"nRounds":		hp.uniformint("nRounds", 700, 1200),
+		"treeMethod":	hp.choice("treeMethod", ["hist", "approx"])
+	})
 	def __init__(self, trainData, target, trainTestSplit=0.5, booster="dart", maxDepth=6,
 			  learningRate=0.1, objective="reg:squarederror", sampleType="uniform",
-			  normaliseType="tree", rateDrop=0.1, skipDrop=0.5, nRounds=100, gamma=0):
+			  normaliseType="tree", rateDrop=0.1, skipDrop=0.5, nRounds=100, gamma=0, treeMethod="hist",
+			  nThread=0, maxBin=256):
 		super().__init__(trainData, target, trainTestSplit=trainTestSplit)
 		self.booster		= booster		# string Boosting algorithm
 		self.maxDepth		= maxDepth		# int Max branches
@@ -29,6 +41,10 @@ class XGBoostEstimator(EstimatorBase):
 		self.skipDrop		= skipDrop		# float 0 < x < 1 probability rate drop will be ignored
 		self.nRounds		= nRounds		# int No. of rounds. Basically No. estimators from Random forest or GBDT
 		self.gamma			= gamma			# float min loss reduction required before further paritioning a leaf
+		self.treeMethod		= treeMethod	# string tree construction: hist (trains on a QuantileDMatrix), approx or exact
+		self.nThread		= nThread		# int threads for training, prediction and DMatrix construction. 0 for all cores
+		self.maxBin			= maxBin		# int max histogram bins per feature for hist/approx
+		self.matrixCache	= {}			# {string name: (key, DMatrix)} see trainingMatrix and testMatrix
 	##
 	# Get model parameters (override Abstract)
 	#
@@ -45,20 +61,126 @@ class XGBoostEstimator(EstimatorBase):
 			"normalize_type": 	self.normaliseType,
 			"rate_drop": 		self.rateDrop,
 			"skip_drop": 		self.skipDrop,
-			"gamma":			self.gamma
+			"gamma":			self.gamma,
+			"tree_method":		self.treeMethod,
+			"max_bin":			self.maxBin
 		}
+		if self.nThread:
+			params["nthread"]	= self.nThread
 		if self.booster == "dart":
 			params["skip_drop"]	= self.skipDrop
 		return params
 	##
 	# Train the model (Abstract)
+	#
+	# With self.warmStart, a model trained with the same params and split gets the extra
+	# rounds added to it instead of being trained again from scratch.
 	##
 	def train(self):
 		# WARNING!!! Always do params first! They change inline configs like train_test_split
 		# TODO: Make params use underscore so we don't have to bridge it awkwardly
 		params		= self.allParams
-		data 		= DMatrix(self.trainingInputs, self.trainingTargets)
-		self.model 	= train(params, data, self.nRounds)
+		if self.streaming and (self.applyScaler or self.applyNormaliser):
+			raise ValueError("Scalers and normalisers can't be applied to a StreamingDataSource")
+		if self.loadCachedModel():
+			self.trainedState	= self.trainingState(params)
+			return
+		from xgboost	import train
+		data 		= self.trainingMatrix
+		with INSTRUMENTATION.span("model.fit", estimator=type(self).__name__):
+			if self.model and self.canWarmStart(params, self.model.num_boosted_rounds()):
+				self.model	= train(params, data, self.nRounds - self.model.num_boosted_rounds(), xgb_model=self.model)
+			else:
+				self.model 	= train(params, data, self.nRounds)
+		self.trainedState	= self.trainingState(params)
+		self.saveCachedModel()
+	##
+	# Predict target values (override Virtual)
+	#
+	# NumPy and DataFrame inputs are predicted in place, skipping DMatrix construction.
+	# DMatrix inputs go through Booster.predict.
+	##
+	def predict(self, data):
+		if isinstance(data, DataFrame):
+			data	= self.predictionInputs(data)
+		with INSTRUMENTATION.span("predict", estimator=type(self).__name__, rows=data.shape[0] if isinstance(data, ndarray) else data.num_row()):
+			if isinstance(data, ndarray):
+				return self.model.inplace_predict(data)
+			return self.model.predict(data)
+	##
+	# Training DMatrix: Cached until the split, preprocessing, treeMethod, nThread or maxBin change
+	#
+	# hist trains on a QuantileDMatrix, so its quantile sketch is also built once.
+	# Streamed data is paged to disk through an ExtMemQuantileDMatrix, or an external memory DMatrix.
+	##
+	@property
+	def trainingMatrix(self):
+		key	= self.matrixKey
+		if self.matrixCache.get("training", (False,))[0] != key:
+			from xgboost	import DMatrix, ExtMemQuantileDMatrix, QuantileDMatrix
+			with INSTRUMENTATION.span("xgboost.DMatrix", matrix="training"):
+				if self.streaming:
+					from lib.estimators.xgboost_batch_iterator	import XGBoostBatchIterator
+					iterator	= XGBoostBatchIterator(self.trainingBatches, self.pagePrefix("training"))
+					if self.treeMethod == "hist":
+						matrix	= ExtMemQuantileDMatrix(iterator, max_bin=self.allParams["max_bin"], nthread=self.nThread)
+					else:
+						matrix	= DMatrix(iterator, nthread=self.nThread)
+				elif self.treeMethod == "hist":
+					matrix	= QuantileDMatrix(self.trainingInputs, self.trainingTargets, max_bin=self.allParams["max_bin"], nthread=self.nThread)
+				else:
+					matrix	= DMatrix(self.trainingInputs, self.trainingTargets, nthread=self.nThread)
+			self.matrixCache["training"]	= (key, matrix)
+		return self.matrixCache["training"][1]
+	##
+	# Test DMatrix: Cached like trainingMatrix. For xgboost's own evaluation, e.g. evals=[...]
+	#
+	# Built against trainingMatrix's quantiles when that's a QuantileDMatrix.
+	##
+	@property
+	def testMatrix(self):
+		key	= self.matrixKey
+		if self.matrixCache.get("test", (False,))[0] != key:
+			from xgboost	import DMatrix, ExtMemQuantileDMatrix, QuantileDMatrix
+			with INSTRUMENTATION.span("xgboost.DMatrix", matrix="test"):
+				if self.streaming:
+					from lib.estimators.xgboost_batch_iterator	import XGBoostBatchIterator
+					iterator	= XGBoostBatchIterator(self.testBatches, self.pagePrefix("test"))
+					if self.treeMethod == "hist":
+						matrix	= ExtMemQuantileDMatrix(iterator, ref=self.trainingMatrix, nthread=self.nThread)
+					else:
+						matrix	= DMatrix(iterator, nthread=self.nThread)
+				elif self.treeMethod == "hist":
+					matrix	= QuantileDMatrix(self.testInputs, self.testTargets, ref=self.trainingMatrix, nthread=self.nThread)
+				else:
+					matrix	= DMatrix(self.testInputs, self.testTargets, nthread=self.nThread)
+			self.matrixCache["test"]	= (key, matrix)
+		return self.matrixCache["test"][1]
+	##
+	# What the cached matrices depend on
+	##
+	@property
+	def matrixKey(self):
+		return (self.splitKey, self.treeMethod, self.nThread, self.allParams["max_bin"])
+	##
+	# Page file prefix for a streamed matrix
+	##
+	def pagePrefix(self, name):
+		return join(gettempdir(), "duckula_xgboost_%d_%d_%s" %(getpid(), id(self), name))
+	##
+	# Untrained copy with its own matrix cache (override)
+	##
+	def copy(self):
+		estimator				= super().copy()
+		estimator.matrixCache	= {}
+		return estimator
+	##
+	# Trained copy without the data or cached matrices (override)
+	##
+	def servingCopy(self):
+		estimator				= super().servingCopy()
+		estimator.matrixCache	= {}
+		return estimator
 	##
 	# Extra config params for PrintModelConfig (Virtual)
 	##
@@ -71,5 +193,6 @@ class XGBoostEstimator(EstimatorBase):
 	##
 	@classmethod
 	def DataFrameToInputType(cls, data):
+		from xgboost	import DMatrix
 		return DMatrix(data)
 	
\ No newline at end of file
@@ -0,0 +1,135 @@
+### Includes ###
+## Native
+from collections	import OrderedDict
+from os				import makedirs, replace
+from os.path		import dirname, isfile
+from pickle			import dump, load, HIGHEST_PROTOCOL
+from numpy			import asarray, round as npRound
+## Project
+
+##
+# Fitness cache: Bounded LRU memo of solution -> score for MealPyOptimiserBase
+#
+# Solutions are rounded to decimals places before lookup and scored at the rounded
+# point, so revisits of the same IntegerVar (or coarsely discretised) candidate skip
+# score(). Only use it for
+# deterministic objectives: Set optimiser.fitnessCache = False for stochastic ones.
+#
+# With a path, entries are saved after each solve()/barrage() and reloaded by the
+# next run of the same problem (see problemKey).
+##
+class FitnessCache():
+	##
+	# params:
+	#	maxSize:	int max entries kept. Least recently used are dropped first
+	#	decimals:	int decimal places solutions are rounded to for the key. 0 for IntegerVar
+	#	path:		string pickle file to persist entries to. None for memory only
+	##
+	def __init__(self, maxSize=100000, decimals=6, path=None):
+		self.maxSize	= maxSize		# int max entries
+		self.decimals	= decimals		# int rounding for keys
+		self.path		= path			# string persistence file or None
+		self.entries	= OrderedDict()	# bytes key: score, oldest first
+		self.unsaved	= {}			# bytes key: score added since the last save/drain
+		self.problemKey	= False			# Hashable identifying the problem the entries belong to
+		self.loaded		= False			# bool has path been read
+		self.hits		= 0				# int lookups answered from the cache
+		self.misses		= 0				# int lookups that needed a real score
+	##
+	# Round a solution to the cache's resolution. Misses are scored at this point, so
+	# every cached score is exact for its key
+	##
+	def round(self, solution):
+		# + 0.0 folds -0.0 into 0.0 so they share a key
+		return npRound(asarray(solution, dtype=float), self.decimals) + 0.0
+	##
+	# Lookup key for a rounded solution
+	##
+	def key(self, rounded):
+		return rounded.tobytes()
+	##
+	# Get a cached score
+	#
+	# output:	(bool found, score or None)
+	##
+	def get(self, key):
+		if key in self.entries:
+			self.entries.move_to_end(key)
+			self.hits	+= 1
+			return True, self.entries[key]
+		self.misses	+= 1
+		return False, None
+	##
+	# Store a score
+	##
+	def put(self, key, score):
+		self.entries[key]	= score
+		self.entries.move_to_end(key)
+		self.unsaved[key]	= score
+		while len(self.entries) > self.maxSize:
+			self.entries.popitem(last=False)
+	##
+	# Add entries scored elsewhere, e.g. in a barrage() worker
+	##
+	def update(self, entries):
+		for key, score in entries.items():
+			self.put(key, score)
+	##
+	# Entries added since the last call. Used to ship a worker's new scores to its parent
+	##
+	def drain(self):
+		entries, self.unsaved	= self.unsaved, {}
+		return entries
+	##
+	# Hit and miss counters
+	##
+	@property
+	def stats(self):
+		return {"hits": self.hits, "misses": self.misses}
+	##
+	# Empty the cache and reset the counters. Doesn't touch path
+	##
+	def clear(self):
+		self.entries	= OrderedDict()
+		self.unsaved	= {}
+		self.hits		= 0
+		self.misses		= 0
+	##
+	# Bind the cache to a problem and load any persisted entries for it
+	#
+	# Entries for a different problemKey are discarded rather than reused.
+	##
+	def attach(self, problemKey):
+		if self.problemKey != problemKey:
+			if self.problemKey is not False:
+				self.clear()
+			self.problemKey	= problemKey
+			self.loaded		= False
+		if self.path and not self.loaded and isfile(self.path):
+			try:
+				with open(self.path, "rb") as file:
+					saved	= load(file)
+				if saved["problem"] == problemKey:
+					for key, score in saved["entries"].items():
+						if key not in self.entries:
+							self.entries[key]	= score
+							self.entries.move_to_end(key, last=False)
+				while len(self.entries) > self.maxSize:
+					self.entries.popitem(last=False)
+			except (OSError, EOFError, KeyError, ValueError):
+				pass
+		self.loaded	= True
+		return self
+	##
+	# Write entries to path. No-op without a path
+	##
+	def save(self):
+		if not self.path:
+			return
+		if dirname(self.path):
+			makedirs(dirname(self.path), exist_ok=True)
+		temporaryPath	= self.path + ".tmp"
+		with open(temporaryPath, "wb") as file:
+			dump({"problem": self.problemKey, "entries": self.entries}, file, protocol=HIGHEST_PROTOCOL)
+		replace(temporaryPath, self.path)
+		self.unsaved	= {}
\ No newline at end of file
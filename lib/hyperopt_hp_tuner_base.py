@@ -1,32 +1,68 @@
 ### Includes ###
 ## Native 
 from hyperopt.hp	import choice, uniform, uniformint
-from hyperopt		import fmin, tpe, Trials
+from hyperopt		import fmin, tpe, Trials, STATUS_OK, space_eval
+from hyperopt.base	import Domain, JOB_STATE_DONE, JOB_STATE_ERROR, JOB_STATE_RUNNING
+from hyperopt.utils	import coarse_utcnow
+from concurrent.futures	import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from copy			import copy as shallowCopy
+from functools		import partial
 from numbers		import Number
-from numpy			import average
+from numpy			import arange, average, sort
+from numpy.random	import default_rng
+from os				import cpu_count, replace
+from pickle			import dump, load, HIGHEST_PROTOCOL
+from time			import perf_counter
+from threadpoolctl	import threadpool_limits
 ## Project
+from lib.instrumentation		import INSTRUMENTATION
 class HyperoptHpTunerBase():
 	def __init__(self, model, iterations=20, parameters={}, 
-			  algorithm=tpe.suggest, trials=Trials(), cvSteps=1):
+			  algorithm=tpe.suggest, trials=None, cvSteps=1, workers=1, threadsPerWorker=None,
+			  cvStrategy=False, cvWorkers=None, pruning=False, minBudget=False, reductionFactor=3, budgetParameter=False,
+			  checkpointPath=None, checkpointEvery=10, trialStore=False):
 		self.model		= model				# Anything we can tune using setattr to modify params
 		self.iterations	= iterations		# int number of stages in the tuning process
 		self.parameters	= parameters.copy()	# Dict of hp.* parameter definitions
 		self.algorithm	= algorithm			# Hyperopt tuning algorithm
-		self.trials		= trials			# Hyperopt Trials result tracking object
+		self.trials		= trials if trials is not None else Trials()	# Hyperopt Trials result tracking object. tune() adds to it
 		self.optimiser	= False				# Hyperopt fmin or similar
 		self.cvSteps	= cvSteps			# int number of cross-validation steps
+		self.workers	= workers			# int trials evaluated at once. > 1 tunes on a process pool
+		self.threadsPerWorker	= threadsPerWorker	# int BLAS/OpenMP threads per worker. None for cpus / workers
+		self.cvStrategy	= cvStrategy		# sklearn splitter (KFold, ShuffleSplit, ...) over row indices. Replaces cvSteps
+		self.cvWorkers	= cvWorkers			# int folds scored at once. None for all of them
+		self.folds		= False				# [(trainRows, testRows)] index arrays precomputed from cvStrategy
+		self.foldRows	= 0					# int number of data rows self.folds were computed for
+		self.pruning			= pruning			# bool successive-halving: stop trials that fall behind at low budgets
+		self.minBudget			= minBudget			# int first rung's budget. False for the first trial's budget / reductionFactor ^ 3
+		self.reductionFactor	= reductionFactor	# int budget growth per rung. The best 1 / reductionFactor continue
+		self.budgetParameter	= budgetParameter	# string model attribute to use as the budget. False for model.BUDGET_PARAMETER
+		self.rungScores			= {}				# {int budget: float[] losses} seen at each rung
+		self.checkpointPath		= checkpointPath	# string file tune() saves finished trials to every checkpointEvery trials. None for never
+		self.checkpointEvery	= checkpointEvery	# int trials between checkpoints
+		self.trialStore			= trialStore		# TrialStore to warm-start from, answer repeats from and append to. False for none
+		self.study				= False				# string TrialStore study key, fixed when tuning first starts
+		self.trialStoreIds		= set()				# int TrialStore row ids already in the trials
+		self.trialStoreCursor	= 0					# int highest TrialStore row id read
+		self.warmStartTrials	= 0					# int trials loaded from the TrialStore. self.iterations are run on top
+		self.trialStoreStats	= False				# {"warmStarted", "hits", "stored"} for the last tune()
 	##
 	# Calcualte the model fitness (Intenral)
 	#
-	# Run the evaluate(Abstract) method self.cvSteps times and return the average score. Where
-	# self.cvSteps defines cross-validation rounds.
+	# Run the evaluate(Abstract) method for each cross-validation fold and return the average 
+	# score, with every fold's score and duration in the trial result.
 	#
-	# Process:
+	# Index-based folds (self.cvStrategy):
+	#	- Apply parameters defined by hyperopt for the iteration
+	#	- Score each of self.folds on a thread pool. Each fold gets a copy of the model
+	#	  with model.fold set to its (trainRows, testRows), so the data is never reshuffled
+	#
+	# Sequential steps (no self.cvStrategy):
 	#	- Apply parameters defined by hyperopt for the iteration
 	#	- For self.cvSteps
 	#	-- Score the model. Add to results set
 	#	-- Apply intermediary model (see below on self.intermediaryModelChanges)
-	#	- Return average
 	#
 	# Intermediary model changes self.intermediaryModelChanges (Virtual)
 	#
@@ -34,6 +70,7 @@ class HyperoptHpTunerBase():
 	#	to the model. For example, the standard method here is shuffle split. To
 	#	accommodate the shuffle split, we use self.intermediaryModelChanges to call
 	# 
+	# output:	dict hyperopt result {"loss", "status", "foldScores", "foldDurations"}
 	##
 	def _score(self, params):
 		# Update the model
@@ -42,13 +79,153 @@ class HyperoptHpTunerBase():
 				self.model.updateHyperparameters(key, value)
 			else:
 				setattr(self.model, key, __class__.CastValueToExpceted(value))
-		results = []
 		# Do score with cross-validation
+		foldTuners	= self._foldTuners()
+		if self.pruning:
+			return self._scoreWithPruning(foldTuners)
+		return __class__.FoldsResult(self._scoreFolds(foldTuners))
+	##
+	# A copy of the tuner and model per fold when using self.cvStrategy (Internal)
+	#
+	# output:	tuner[] with model.fold set, or False for sequential cvSteps
+	##
+	def _foldTuners(self):
+		if not self.cvStrategy:
+			return False
+		tuners	= []
+		for fold in self.prepareFolds():
+			tuner				= shallowCopy(self)
+			tuner.model			= self.model.copy()
+			tuner.model.fold	= fold
+			tuners.append(tuner)
+		return tuners
+	##
+	# Evaluate every fold once (Internal)
+	#
+	# output:	[(score, float seconds)] per fold
+	##
+	def _scoreFolds(self, foldTuners):
+		if foldTuners:
+			with ThreadPoolExecutor(self.cvWorkers or len(foldTuners)) as executor:
+				return list(executor.map(__class__._TimedEvaluate, foldTuners))
+		scored	= []
 		for i in range(self.cvSteps):
 			if i > 0:
 				self.intermediaryModelChanges()
-			results.append(self.evaluate())
-		return average(results)
+			scored.append(__class__._TimedEvaluate(self))
+		return scored
+	##
+	# Successive halving: Train with growing budgets, stop when out of the running (Internal)
+	#
+	# The model's budget (model.BUDGET_PARAMETER, e.g. nRounds) is raised rung by rung
+	# from self.minBudget by self.reductionFactor up to the trial's own budget. The
+	# models warm start, so each rung only trains the extra rounds. After each rung the
+	# loss is compared with every loss seen at that rung: Unless it's in the best
+	# 1 / reductionFactor of them, the trial stops there and is reported as pruned.
+	#
+	# output:	dict hyperopt result, plus "budget", "rungLosses" and "pruned"
+	##
+	def _scoreWithPruning(self, foldTuners):
+		models		= [tuner.model for tuner in foldTuners] if foldTuners else [self.model]
+		parameter	= self.budgetParameter or self.model.BUDGET_PARAMETER
+		maxBudget	= getattr(self.model, parameter)
+		self.initialiseMinBudget(maxBudget)
+		budgets		= __class__.PruningBudgets(self.minBudget, maxBudget, self.reductionFactor)
+		rungLosses	= {}
+		for model in models:
+			model.warmStart	= True
+		try:
+			for budget in budgets:
+				for model in models:
+					setattr(model, parameter, budget)
+				result				= __class__.FoldsResult(self._scoreFolds(foldTuners))
+				rungLosses[budget]	= result["loss"]
+				result["budget"]		= budget
+				result["rungLosses"]	= rungLosses
+				result["pruned"]		= budget != budgets[-1] and not self.promote(budget, result["loss"])
+				if result["pruned"]:
+					break
+		finally:
+			for model in models:
+				model.warmStart	= False
+			setattr(self.model, parameter, maxBudget)
+		return result
+	##
+	# Fix self.minBudget from the first trial's budget, unless it was set explicitly
+	##
+	def initialiseMinBudget(self, maxBudget):
+		if not self.minBudget:
+			self.minBudget	= max(1, int(maxBudget / self.reductionFactor ** 3))
+	##
+	# Record a rung loss and decide whether the trial continues (ASHA promotion rule)
+	#
+	# Trials continue while the rung has fewer than reductionFactor losses, then only
+	# if the loss ranks in the best 1 / reductionFactor.
+	##
+	def promote(self, budget, loss):
+		losses	= self.rungScores.setdefault(budget, [])
+		losses.append(loss)
+		better	= sum(1 for other in losses if other < loss)
+		return len(losses) < self.reductionFactor or better < len(losses) / self.reductionFactor
+	##
+	# Rung budgets: minBudget * reductionFactor ^ n below maxBudget, then maxBudget
+	##
+	@staticmethod
+	def PruningBudgets(minBudget, maxBudget, reductionFactor):
+		budgets	= []
+		budget	= minBudget
+		while budget < maxBudget:
+			budgets.append(int(budget))
+			budget	*= reductionFactor
+		return budgets + [maxBudget]
+	##
+	# Evaluate a tuner, timed (Internal)
+	#
+	# output:	(score, float seconds)
+	##
+	@staticmethod
+	def _TimedEvaluate(tuner):
+		started	= perf_counter()
+		return tuner.evaluate(), perf_counter() - started
+	##
+	# Hyperopt result document for a list of (score, seconds) folds
+	##
+	@staticmethod
+	def FoldsResult(scored):
+		results	= [float(score) for score, _ in scored]
+		return {
+			"loss":				average(results),
+			"status":			STATUS_OK,
+			"foldScores":		results,
+			"foldDurations":	[duration for _, duration in scored]
+		}
+	##
+	# Precompute self.folds' row indices from self.cvStrategy, once per data length
+	#
+	# Indices are sorted so each fold reads the data in order.
+	#
+	# output:	[(trainRows, testRows)]
+	##
+	def prepareFolds(self):
+		rows	= len(self.model.data)
+		if self.folds is False or self.foldRows != rows:
+			self.folds		= [(sort(train), sort(test)) for train, test in self.cvStrategy.split(arange(rows))]
+			self.foldRows	= rows
+		return self.folds
+	##
+	# Use k-fold cross-validation: Every row is tested once
+	##
+	def useKFold(self, nSplits=5, shuffle=True, randomState=1):
+		from sklearn.model_selection	import KFold
+		self.cvStrategy	= KFold(n_splits=nSplits, shuffle=shuffle, random_state=randomState if shuffle else None)
+		self.folds		= False
+	##
+	# Use shuffle-split cross-validation: nSplits random train/test splits
+	##
+	def useShuffleSplit(self, nSplits=5, testSize=0.5, randomState=1):
+		from sklearn.model_selection	import ShuffleSplit
+		self.cvStrategy	= ShuffleSplit(n_splits=nSplits, test_size=testSize, random_state=randomState)
+		self.folds		= False
 	##
 	# Intermediary actions between cross-validation steps (Virtual)
 	#
@@ -59,15 +236,328 @@ class HyperoptHpTunerBase():
 		pass
 	##
 	# Tune the model: Find the best hyperparameters (Final)
+	#
+	# Trials are added to self.trials, which counts towards self.iterations: Call again
+	# after raising self.iterations to tune for longer.
 	##
 	def tune(self):
-		self.best = fmin(
-			self._score, 
-			self.parameters, 
-			algo=tpe.suggest,
-			max_evals=self.iterations, 
-			trials=Trials()
-		)
+		self._tune(self.trials)
+	##
+	# Continue an interrupted tune() from its checkpoint (Final)
+	#
+	# Finished trials are kept and count towards self.iterations: Only the rest are run.
+	# Trials that were still running when the checkpoint was saved are run again.
+	#
+	# params:
+	#	path:	string checkpoint file. None for self.checkpointPath
+	##
+	def resume(self, path=None):
+		path	= path or self.checkpointPath
+		with open(path, "rb") as file:
+			checkpoint	= load(file)
+		if checkpoint["parameters"] != sorted(self.parameters):
+			raise ValueError("%s is a checkpoint of different parameters: %s" %(path, ", ".join(checkpoint["parameters"])))
+		self.checkpointPath	= path
+		self.rungScores		= checkpoint["rungScores"]
+		self.minBudget		= checkpoint["minBudget"]
+		self.study				= checkpoint.get("study", False)
+		self.trialStoreIds		= checkpoint.get("trialStoreIds", set())
+		self.trialStoreCursor	= checkpoint.get("trialStoreCursor", 0)
+		self.warmStartTrials	= checkpoint.get("warmStartTrials", 0)
+		self._tune(checkpoint["trials"])
+	##
+	# Tune until trials has self.iterations trials on top of those from the trialStore (Internal)
+	#
+	# Serial runs call fmin checkpointEvery trials at a time, saving a checkpoint after each.
+	# With a trialStore, its trials for this study are loaded first, then again between checkpoints.
+	##
+	def _tune(self, trials):
+		# Folds are computed once, before any workers are forked
+		if self.cvStrategy:
+			self.prepareFolds()
+		if self.trialStore:
+			self.study				= self.study or self.trialStore.key(self)
+			self.trialStoreStats	= {"warmStarted": 0, "hits": 0, "stored": 0}
+			self.syncTrialStore(trials)
+		if self.workers > 1:
+			return self._tuneParallel(trials)
+		objective	= partial(self._storedScore, trials) if self.trialStore else self._score
+		algorithm	= self.algorithm
+		if INSTRUMENTATION.enabled:
+			objective	= partial(self._tracedScore, trials, objective)
+			algorithm	= partial(__class__._TracedSuggest, algorithm)
+		while True:
+			started		= len(trials.trials)
+			total		= self.warmStartTrials + self.iterations
+			maxEvals	= min(total, started + self.checkpointEvery) if self.checkpointPath else total
+			self.best = fmin(
+				objective, 
+				self.parameters, 
+				algo=algorithm,
+				max_evals=maxEvals, 
+				trials=trials
+			)
+			self.trials	= trials
+			if self.checkpointPath:
+				self.saveCheckpoint()
+			# Done, or the algorithm has nothing left to suggest
+			if maxEvals >= total or len(trials.trials) == started:
+				break
+			if self.trialStore:
+				self.syncTrialStore(trials)
+	##
+	# Save finished trials and pruning state (Final)
+	#
+	# params:
+	#	path:	string checkpoint file. None for self.checkpointPath
+	#	trials:	hyperopt Trials to save. None for self.trials
+	##
+	def saveCheckpoint(self, path=None, trials=None):
+		path		= path or self.checkpointPath
+		trials		= trials or self.trials
+		finished	= Trials()
+		finished.insert_trial_docs([trial for trial in trials._dynamic_trials if trial["state"] in (JOB_STATE_DONE, JOB_STATE_ERROR)])
+		finished.refresh()
+		# Trial ids carry on after every id handed out, finished or not
+		finished._ids.update(trials._ids)
+		temporaryPath	= path + ".tmp"
+		with open(temporaryPath, "wb") as file:
+			dump({"parameters": sorted(self.parameters), "trials": finished, "rungScores": self.rungScores,
+				"minBudget": self.minBudget, "study": self.study, "trialStoreIds": self.trialStoreIds,
+				"trialStoreCursor": self.trialStoreCursor, "warmStartTrials": self.warmStartTrials}, file, protocol=HIGHEST_PROTOCOL)
+		replace(temporaryPath, path)
+	##
+	# Everything a trial's loss depends on apart from its hyperparameters, for the TrialStore study key (Virtual)
+	#
+	# The model is keyed by its modelCacheState (class, data fingerprint, split, preprocessing
+	# and params) with the tuned attributes blanked. Their values are whatever the last
+	# trial or the caller left, so they'd give every run its own study. Override to add
+	# anything evaluate() reads.
+	##
+	@property
+	def trialStoreState(self):
+		model	= self.model
+		if not hasattr(type(model), "modelCacheState"):
+			state	= (type(model).__module__, type(model).__qualname__)
+		else:
+			tuned	= {code: getattr(model, code) for code in self.parameters if hasattr(model, code)}
+			try:
+				for code in tuned:
+					setattr(model, code, None)
+				state	= model.modelCacheState
+			finally:
+				for code, value in tuned.items():
+					setattr(model, code, value)
+		space	= sorted((code, str(parameter)) for code, parameter in self.parameters.items())
+		pruning	= (self.reductionFactor, self.minBudget, self.budgetParameter) if self.pruning else False
+		return (type(self).__module__, type(self).__qualname__, state, space, self.cvSteps,
+			repr(self.cvStrategy) if self.cvStrategy else False, pruning)
+	##
+	# Load the study's trials that aren't in trials yet from self.trialStore (Final)
+	#
+	# They're added as finished trials, so the algorithm's next suggestions use them,
+	# and don't count towards self.iterations.
+	#
+	# output:	int trials loaded
+	##
+	def syncTrialStore(self, trials):
+		rows	= self.trialStore.rows(self.study, after=self.trialStoreCursor)
+		if rows:
+			self.trialStoreCursor	= rows[-1][0]
+		rows	= [row for row in rows if row[0] not in self.trialStoreIds]
+		if not rows:
+			return 0
+		tids	= trials.new_trial_ids(len(rows))
+		miscs	= [{"tid": tid, "cmd": ("domain_attachment", "FMinIter_Domain"), "workdir": None, "vals": vals,
+			"idxs": {label: [tid] if values else [] for label, values in vals.items()}} for tid, (_, vals, _) in zip(tids, rows)]
+		docs	= trials.new_trial_docs(tids, [None] * len(rows), [result for _, _, result in rows], miscs)
+		now		= coarse_utcnow()
+		for doc in docs:
+			doc["state"]		= JOB_STATE_DONE
+			doc["book_time"]	= now
+			doc["refresh_time"]	= now
+		trials.insert_trial_docs(docs)
+		trials.refresh()
+		self.trialStoreIds.update(id for id, _, _ in rows)
+		self.warmStartTrials					+= len(rows)
+		self.trialStoreStats["warmStarted"]	+= len(rows)
+		return len(rows)
+	##
+	# Stored result of params from self.trialStore (Final)
+	#
+	# output:	dict hyperopt result document with "trialStore": True, or None
+	##
+	def storedResult(self, params):
+		result	= self.trialStore.lookup(self.study, __class__.PointKey(params))
+		if result is None:
+			return None
+		result["trialStore"]	= True
+		self.trialStoreStats["hits"]	+= 1
+		INSTRUMENTATION.count("trialStoreHits")
+		return result
+	##
+	# Append a finished trial to self.trialStore (Final)
+	##
+	def storeTrial(self, vals, params, result):
+		if result.get("status") != STATUS_OK or result.get("trialStore"):
+			return
+		id	= self.trialStore.add(self.study, __class__.PointKey(params), vals, result, reusable=not result.get("pruned"))
+		self.trialStoreIds.add(id)
+		self.trialStoreStats["stored"]	+= 1
+	##
+	# _score answered from, or added to, self.trialStore (Internal)
+	##
+	def _storedScore(self, trials, params):
+		result	= self.storedResult(params)
+		if result is not None:
+			return result
+		result	= __class__.ResultDocument(self._score(params))
+		# fmin marks the trial it's evaluating as running
+		trial	= next(trial for trial in reversed(trials._dynamic_trials) if trial["state"] == JOB_STATE_RUNNING)
+		self.storeTrial(trial["misc"]["vals"], params, result)
+		return result
+	##
+	# Canonical text of a point's hyperparameters, for exact repeat lookups
+	##
+	@staticmethod
+	def PointKey(params):
+		values	= []
+		for key, value in params.items():
+			value	= value.item() if hasattr(value, "item") and not hasattr(value, "__len__") else value
+			values.append((key, __class__.CastValueToExpceted(value)))
+		return repr(sorted(values))
+	##
+	# _score in a tuner.trial span (Internal)
+	##
+	def _tracedScore(self, trials, score, params):
+		with INSTRUMENTATION.span("tuner.trial", tid=len(trials.trials) - 1) as span:
+			result			= score(params)
+			span["loss"]	= __class__.ResultDocument(result)["loss"]
+		return result
+	##
+	# A hyperopt algorithm call in a hyperopt.suggest span (Internal)
+	##
+	@staticmethod
+	def _TracedSuggest(algorithm, *args, **kwargs):
+		with INSTRUMENTATION.span("hyperopt.suggest"):
+			return algorithm(*args, **kwargs)
+	##
+	# Tune with self.workers trials in flight on a process pool (Internal)
+	#
+	# Each worker process has its own copy of the tuner and model, so _score's setattr
+	# calls never touch self.model. Whenever workers free up, self.algorithm is asked
+	# for that many new points in one batch, using every trial finished so far.
+	##
+	def _tuneParallel(self, trials):
+		domain	= Domain(self._score, self.parameters)
+		rstate	= default_rng()
+		threads	= self.threadsPerWorker or max(1, (cpu_count() or 1) // self.workers)
+		running	= {}	# Future: trial document
+		queued	= len(trials.trials)
+		finished	= 0		# int trials finished since the last checkpoint
+		with ProcessPoolExecutor(self.workers, initializer=__class__._InitWorker, initargs=(self, threads)) as executor:
+			while queued < self.warmStartTrials + self.iterations or running:
+				# Trials other tuners have stored since
+				if self.trialStore:
+					queued	+= self.syncTrialStore(trials)
+				# Suggest a batch of points for the free workers
+				free	= min(self.workers - len(running), self.warmStartTrials + self.iterations - queued)
+				if free > 0:
+					ids		= trials.new_trial_ids(free)
+					trials.refresh()
+					with INSTRUMENTATION.span("hyperopt.suggest"):
+						docs	= self.algorithm(ids, domain, trials, rstate.integers(2 ** 31 - 1))
+					# The algorithm has nothing left to suggest
+					queued	= queued + len(docs) if docs else self.warmStartTrials + self.iterations
+					trials.insert_trial_docs(docs)
+					trials.refresh()
+					for trial in trials._dynamic_trials:
+						if trial["tid"] in ids:
+							trial["state"]		= JOB_STATE_RUNNING
+							trial["book_time"]	= coarse_utcnow()
+							params				= space_eval(self.parameters, __class__.TrialValues(trial))
+							stored				= self.storedResult(params) if self.trialStore else None
+							if stored is not None:
+								trial["result"]			= stored
+								trial["state"]			= JOB_STATE_DONE
+								trial["refresh_time"]	= coarse_utcnow()
+								continue
+							# Every worker has to prune on the same rung budgets
+							if self.pruning:
+								parameter	= self.budgetParameter or self.model.BUDGET_PARAMETER
+								self.initialiseMinBudget(__class__.CastValueToExpceted(params.get(parameter, getattr(self.model, parameter))))
+							running[executor.submit(__class__._WorkerScore, params, self.rungScores, self.minBudget)]	= trial
+				if not running:
+					# Every point was answered from the trialStore: Suggest more
+					if queued < self.warmStartTrials + self.iterations:
+						trials.refresh()
+						continue
+					break
+				# Record whichever trials finished
+				done, _	= wait(running, return_when=FIRST_COMPLETED)
+				for future in done:
+					trial	= running.pop(future)
+					try:
+						trial["result"]	= future.result()
+						trial["state"]	= JOB_STATE_DONE
+						if self.trialStore:
+							self.storeTrial(trial["misc"]["vals"], space_eval(self.parameters, __class__.TrialValues(trial)), trial["result"])
+						# Timed in the worker: The span ends as the trial is collected
+						duration		= trial["result"]["duration"]
+						INSTRUMENTATION.record("tuner.trial", perf_counter() - duration, duration,
+							tid=trial["tid"], loss=trial["result"]["loss"])
+						# Rung losses, except a completed trial's full-budget loss, feed later pruning decisions
+						for budget, loss in trial["result"].get("rungLosses", {}).items():
+							if trial["result"]["pruned"] or budget != trial["result"]["budget"]:
+								self.rungScores.setdefault(budget, []).append(loss)
+					except Exception as e:
+						trial["state"]			= JOB_STATE_ERROR
+						trial["misc"]["error"]	= (str(type(e)), str(e))
+					trial["refresh_time"]	= coarse_utcnow()
+					finished	+= 1
+				trials.refresh()
+				if self.checkpointPath and finished >= self.checkpointEvery:
+					self.saveCheckpoint(trials=trials)
+					finished	= 0
+		self.trials	= trials
+		if self.checkpointPath:
+			self.saveCheckpoint()
+		self.best	= trials.argmin
+	##
+	# Set up a pool worker's copy of the tuner (Internal)
+	##
+	@staticmethod
+	def _InitWorker(tuner, threads):
+		threadpool_limits(limits=threads)
+		__class__.WORKER_TUNER	= tuner
+	##
+	# Score params with the pool worker's copy of the tuner (Internal)
+	#
+	# output:	dict hyperopt result document with the trial's duration in seconds
+	##
+	@staticmethod
+	def _WorkerScore(params, rungScores, minBudget):
+		# Pruning decisions use the rung losses of every trial finished so far
+		__class__.WORKER_TUNER.rungScores	= {budget: list(losses) for budget, losses in rungScores.items()}
+		__class__.WORKER_TUNER.minBudget	= minBudget
+		started	= perf_counter()
+		result	= __class__.ResultDocument(__class__.WORKER_TUNER._score(params))
+		result["duration"]	= perf_counter() - started
+		return result
+	##
+	# Normalise a _score return value to a hyperopt result document
+	##
+	@staticmethod
+	def ResultDocument(result):
+		if isinstance(result, dict):
+			return dict(result)
+		return {"loss": float(result), "status": STATUS_OK}
+	##
+	# Hyperopt point of a trial: {label: value}, as fmin's best is reported
+	##
+	@staticmethod
+	def TrialValues(trial):
+		return {key: values[0] for key, values in trial["misc"]["vals"].items() if values}
 	##
 	# Model fitness function (Abstract)
 	#
@@ -0,0 +1,176 @@
+### Includes ###
+## Native
+from cProfile	import Profile
+from contextlib	import contextmanager
+from json		import dump
+from os			import getpid
+from pstats		import Stats
+from threading	import get_ident
+from time		import perf_counter
+## Project
+
+##
+# Instrumentation: Phase timings and counters for the estimator, tuner and optimiser hot paths
+#
+# Off by default. While disabled, span() hands back a shared no-op context manager
+# and count() returns straight away, so the hooks cost a method call. Hot loops like
+# fitness evaluation are only wrapped when instrumentation is enabled before solve().
+#
+# Spans recorded by the library:
+#	pipeline.build			fit preprocessing and build the train/test split
+#	preprocessInputs		transform inputs with the fitted scaler/normaliser
+#	xgboost.DMatrix			DMatrix/QuantileDMatrix construction (args: matrix)
+#	model.fit				training the underlying model (args: estimator)
+#	predict					model prediction (args: estimator, rows)
+#	hyperopt.suggest		the tuning algorithm choosing the next points
+#	tuner.trial				one trial (args: tid, loss). Parallel trials are recorded as they finish
+#	mealpy.epoch			one optimiser epoch, fitness included (args: epoch)
+#	mealpy.fitness			score()/scoreBatch() calls (args: agents)
+# Counters: fitnessEvaluations
+#
+# Spans from worker processes (barrage(), parallel tune()) stay in those processes.
+##
+class Instrumentation():
+	def __init__(self):
+		self.enabled	= False		# bool record spans and counters
+		self.events		= []		# dict spans: name, start, duration (seconds), args, pid, tid
+		self.counters	= {}		# string name: int count
+		self.callbacks	= []		# callable(event) called for every span as it ends
+		self.origin		= perf_counter()	# float perf_counter() event starts are relative to
+	def enable(self):
+		self.enabled	= True
+		return self
+	def disable(self):
+		self.enabled	= False
+		return self
+	##
+	# Drop recorded spans and counters
+	##
+	def reset(self):
+		self.events		= []
+		self.counters	= {}
+		self.origin		= perf_counter()
+		return self
+	##
+	# Enable for a with block: with INSTRUMENTATION.recording(): tuner.tune()
+	##
+	@contextmanager
+	def recording(self, reset=True):
+		if reset:
+			self.reset()
+		self.enable()
+		try:
+			yield self
+		finally:
+			self.disable()
+	##
+	# Time a with block
+	##
+	def span(self, name, **args):
+		if not self.enabled:
+			return NULL_SPAN
+		return Span(self, name, args)
+	##
+	# Add to a counter
+	##
+	def count(self, name, amount=1):
+		if self.enabled:
+			self.counters[name]	= self.counters.get(name, 0) + amount
+	##
+	# Record a span timed elsewhere, e.g. a trial timed in a worker process
+	##
+	def record(self, name, started, duration, **args):
+		if not self.enabled:
+			return
+		event	= {"name": name, "start": started - self.origin, "duration": duration, "args": args,
+			"pid": getpid(), "tid": get_ident()}
+		self.events.append(event)
+		for callback in self.callbacks:
+			callback(event)
+	def addCallback(self, callback):
+		self.callbacks.append(callback)
+	def removeCallback(self, callback):
+		self.callbacks.remove(callback)
+	##
+	# Totals per span name
+	#
+	# output:	{string name: {"count", "total", "mean", "max"}} seconds
+	##
+	@property
+	def summary(self):
+		summary	= {}
+		for event in self.events:
+			entry	= summary.setdefault(event["name"], {"count": 0, "total": 0.0, "mean": 0.0, "max": 0.0})
+			entry["count"]	+= 1
+			entry["total"]	+= event["duration"]
+			entry["max"]	= max(entry["max"], event["duration"])
+		for entry in summary.values():
+			entry["mean"]	= entry["total"] / entry["count"]
+		return summary
+	##
+	# Write spans, counters and the summary as JSON
+	##
+	def exportJson(self, path):
+		with open(path, "w") as file:
+			dump({"events": self.events, "counters": self.counters, "summary": self.summary}, file, indent=1, default=str)
+	##
+	# Write spans in Chrome's trace event format, for chrome://tracing or Perfetto
+	##
+	def exportChromeTrace(self, path):
+		events	= [{"name": event["name"], "ph": "X", "ts": event["start"] * 1e6, "dur": event["duration"] * 1e6,
+			"pid": event["pid"], "tid": event["tid"], "args": event["args"]} for event in self.events]
+		end		= max((event["start"] + event["duration"] for event in self.events), default=0)
+		for name, value in self.counters.items():
+			events.append({"name": name, "ph": "C", "ts": end * 1e6, "pid": getpid(), "args": {name: value}})
+		with open(path, "w") as file:
+			dump({"traceEvents": events, "displayTimeUnit": "ms"}, file, default=str)
+	##
+	# Run one call under cProfile, e.g. INSTRUMENTATION.profile(optimiser.solve)
+	#
+	# params:
+	#	function:	callable, e.g. optimiser.solve, estimator.train or tuner.tune
+	#	path:		string .prof file for snakeviz/pstats. None to skip
+	#	sortBy:		string pstats sort key
+	#
+	# output:	(function's return value, pstats.Stats)
+	##
+	@staticmethod
+	def profile(function, *args, path=None, sortBy="cumulative", **kwargs):
+		profiler	= Profile()
+		result		= profiler.runcall(function, *args, **kwargs)
+		if path:
+			profiler.dump_stats(path)
+		return result, Stats(profiler).sort_stats(sortBy)
+##
+# Span: Records its with block's duration on exit
+##
+class Span():
+	def __init__(self, instrumentation, name, args):
+		self.instrumentation	= instrumentation	# Instrumentation to record to
+		self.name				= name				# string span name
+		self.args				= args				# dict extra event fields
+		self.started			= 0					# float perf_counter() at entry
+	def __enter__(self):
+		self.started	= perf_counter()
+		return self
+	def __exit__(self, *exception):
+		self.instrumentation.record(self.name, self.started, perf_counter() - self.started, **self.args)
+		return False
+	##
+	# Add an event field known only inside the block: span["loss"] = loss
+	##
+	def __setitem__(self, key, value):
+		self.args[key]	= value
+##
+# Null span: What span() returns while disabled
+##
+class NullSpan():
+	def __enter__(self):
+		return self
+	def __exit__(self, *exception):
+		return False
+	def __setitem__(self, key, value):
+		pass
+
+NULL_SPAN		= NullSpan()
+INSTRUMENTATION	= Instrumentation()		# The process-wide instance the library records to
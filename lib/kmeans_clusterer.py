@@ -1,34 +1,58 @@
 ### Includes ###
 ## Native
-from argparse			import ArgumentParser 
+from concurrent.futures	import ProcessPoolExecutor
+from multiprocessing	import cpu_count
 from os.path			import isfile
-from sklearn.cluster	import KMeans
-from pandas				import read_csv
+from time				import perf_counter
+from numpy				import asarray, concatenate, empty, int32, ndarray, sort
+from numpy.random		import default_rng
+from pandas				import DataFrame
+from sklearn.cluster	import KMeans, MiniBatchKMeans, kmeans_plusplus
+from sklearn.metrics	import calinski_harabasz_score, davies_bouldin_score, silhouette_score
+from threadpoolctl		import threadpool_limits
 ## Project
+from lib.csv_loader				import CsvLoader
+from lib.streaming_data_source	import StreamingDataSource
 
 ##
 # KMeans clustering: In case that's your thing. 
 #
-# A simple wrapper for KMeans in case we want to use it at some point.
+# A simple wrapper for KMeans in case we want to use it at some point. For big
+# tables use MINI_BATCH_MODE or SAMPLE_MODE, or clusterFile() to stream from disk.
 ##
 class KMeansClusterer():
 	CLUSTER_ID_COLUMN_NAME	= "cluster_id"
+	FULL_MODE				= "full"
+	MINI_BATCH_MODE			= "minibatch"
+	SAMPLE_MODE				= "sample"
+	SWEEP_COLUMNS			= ["nClusters", "inertia", "silhouette", "calinskiHarabasz", "daviesBouldin", "meanRank", "runtime"]
+	SWEEP_INPUTS			= False		# (fit inputs, metric inputs) in a sweep() worker process
 	##
 	# Quick load: Spare the referencing script importing read_csv
+	#
+	# Parsed with CsvLoader, so repeat loads come from the binary copy next to the CSV.
+	#
+	# params:
+	#	columns:		string[] columns to load. None for all
+	#	loaderOptions:	CsvLoader options: downcast, engine, chunkSize, cache
 	##
 	@classmethod
-	def QuickLoad(cls, path, labels):
+	def QuickLoad(cls, path, labels, columns=None, **loaderOptions):
 		if isfile(path):
-			return cls(read_csv(path), labels)
+			return cls(CsvLoader(path, columns=columns, **loaderOptions).load(), labels)
 	##
 	# params:
 	#
-	# data:			pandas.DataFrame
-	# labels:		array string column labels
+	# data:			pandas.DataFrame. None if you'll only clusterFile()
+	# labels:		array string column labels to cluster on. None/empty for every column
 	# nCluster:		int number of clusters
 	# randomState:	int random state seed
+	# mode:			string FULL_MODE (KMeans), MINI_BATCH_MODE (MiniBatchKMeans) or SAMPLE_MODE (KMeans on a sample)
+	# batchSize:	int MiniBatchKMeans batch size and rows per chunk when predicting
+	# sampleSize:	int rows SAMPLE_MODE fits on
 	##
-	def __init__(self, data, labels, nClusters=4, randomState=1, maxIterations=50, nInit="auto", algorithm="lloyd"):
+	def __init__(self, data, labels, nClusters=4, randomState=1, maxIterations=50, nInit="auto", algorithm="lloyd",
+			  mode="full", batchSize=10000, sampleSize=100000):
 		self.data			= data			# DataFrame
 		self.labels			= labels		# String[] of column labels
 		self.nClusters		= nClusters		# int number of clusters
@@ -36,27 +60,182 @@ class KMeansClusterer():
 		self.maxIterations	= maxIterations	# int number of iterations during fitting
 		self.nInit			= nInit			# string, callable,
 		self.algorithm		= algorithm		# string algorithm name lloyd or elkan
+		self.mode			= mode			# string FULL_MODE, MINI_BATCH_MODE or SAMPLE_MODE
+		self.batchSize		= batchSize		# int mini-batch and chunk rows
+		self.sampleSize		= sampleSize	# int SAMPLE_MODE rows
 		self.kmeans			= False			# KMeans placeholder
+		self.clusterIds		= False			# np.array of self.data's cluster IDs after cluster()
+		self.sweepResults	= False			# DataFrame of the last sweep(), best first
 	##
 	# Fit a model to self.data.
 	#
+	# FULL_MODE and MINI_BATCH_MODE fit every row. SAMPLE_MODE fits the centroids on
+	# sampleSize random rows, then assigns every row in chunks.
 	##
 	def cluster(self):
-		data									= self.data.copy()
-		self.kmeans								= KMeans(
+		if self.mode == __class__.SAMPLE_MODE and len(self.data) > self.sampleSize:
+			sample			= self.data.sample(n=self.sampleSize, random_state=self.randomState)
+			self.kmeans		= self.makeModel().fit(self.inputs(sample))
+			self.clusterIds	= self.predict(self.data)
+		else:
+			self.kmeans		= self.makeModel().fit(self.inputs(self.data))
+			self.clusterIds	= self.kmeans.labels_
+	##
+	# Fit every k in nClustersRange in parallel and rank them on sampled quality metrics
+	#
+	# Models are fitted like cluster() does for self.mode (SAMPLE_MODE fits its sample).
+	# Silhouette, Calinski-Harabasz and Davies-Bouldin are computed on the same
+	# metricSampleSize random rows for every k, so silhouette's O(n^2) stays bounded.
+	# inertia is the fitted model's and only comparable within one mode.
+	#
+	# With reuseSeeding, one k-means++ seeding for the largest k is drawn and each k
+	# starts from its first k centres. k-means++ picks centres one at a time, so that is
+	# a k-means++ seeding for every k, and neighbouring k share their first centres.
+	#
+	# The best model is kept: nClusters, kmeans and clusterIds are set from it.
+	#
+	# params:
+	#	nClustersRange:		iterable of int k values
+	#	workers:			int processes. None for one per CPU
+	#	metricSampleSize:	int rows the quality metrics are computed on
+	#	rankBy:				string SWEEP_COLUMNS metric to sort by. meanRank averages the three quality ranks
+	#	reuseSeeding:		bool share one k-means++ seeding across k values
+	#
+	# output:	DataFrame with SWEEP_COLUMNS, best first. Also self.sweepResults
+	##
+	def sweep(self, nClustersRange, workers=None, metricSampleSize=10000, rankBy="silhouette", reuseSeeding=True):
+		nClustersRange	= sorted(set(nClustersRange))
+		rng				= default_rng(self.randomState)
+		# Sample and metric rows by position, for DataFrames and arrays alike
+		rows			= self.data.iloc if isinstance(self.data, DataFrame) else self.data
+		if self.mode == __class__.SAMPLE_MODE and len(self.data) > self.sampleSize:
+			fitInputs	= self.inputs(rows[sort(rng.choice(len(self.data), self.sampleSize, replace=False))])
+		else:
+			fitInputs	= self.inputs(self.data)
+		metricRows		= sort(rng.choice(len(self.data), min(metricSampleSize, len(self.data)), replace=False))
+		metricInputs	= self.inputs(rows[metricRows])
+		seeds			= False
+		if reuseSeeding:
+			# kmeans_plusplus doesn't convert DataFrames
+			seeds, _	= kmeans_plusplus(asarray(fitInputs), n_clusters=nClustersRange[-1], random_state=self.randomState)
+		workers		= min(workers or cpu_count() or 1, len(nClustersRange))
+		threads		= max(1, (cpu_count() or 1) // workers)
+		with ProcessPoolExecutor(workers, initializer=__class__._InitSweepWorker, initargs=(fitInputs, metricInputs, threads)) as executor:
+			futures	= [executor.submit(__class__._SweepWorker, self.sweepModel(nClusters, seeds)) for nClusters in nClustersRange]
+			fitted	= [future.result() for future in futures]
+		results		= DataFrame([row for row, _ in fitted], columns=__class__.SWEEP_COLUMNS)
+		results["meanRank"]	= (results["silhouette"].rank(ascending=False) + results["calinskiHarabasz"].rank(ascending=False)
+			+ results["daviesBouldin"].rank()) / 3
+		ascending	= rankBy in ("inertia", "daviesBouldin", "meanRank", "runtime")
+		order		= results.sort_values(rankBy, ascending=ascending, kind="stable", na_position="last").index
+		best		= order[0]
+		self.sweepResults	= results.loc[order].reset_index(drop=True)
+		self.nClusters		= int(results.loc[best, "nClusters"])
+		self.kmeans			= fitted[best][1]
+		self.clusterIds		= self.kmeans.labels_ if len(fitInputs) == len(self.data) else self.predict(self.data)
+		return self.sweepResults
+	##
+	# Unfitted model for one k of a sweep, started from the shared seeding if there is one
+	##
+	def sweepModel(self, nClusters, seeds):
+		nClustersBefore	= self.nClusters
+		self.nClusters	= nClusters
+		model			= self.makeModel()
+		self.nClusters	= nClustersBefore
+		if seeds is not False:
+			model.set_params(init=seeds[:nClusters], n_init=1)
+		return model
+	##
+	# Set up a sweep() worker process (Internal)
+	##
+	@staticmethod
+	def _InitSweepWorker(fitInputs, metricInputs, threads):
+		threadpool_limits(limits=threads)
+		__class__.SWEEP_INPUTS	= (fitInputs, metricInputs)
+	##
+	# Fit and score one k in a sweep() worker (Internal)
+	#
+	# output:	(list SWEEP_COLUMNS row, fitted model)
+	##
+	@staticmethod
+	def _SweepWorker(model):
+		fitInputs, metricInputs	= __class__.SWEEP_INPUTS
+		started		= perf_counter()
+		model.fit(fitInputs)
+		runtime		= perf_counter() - started
+		labels		= model.predict(metricInputs)
+		if len(set(labels)) > 1:
+			scores	= [silhouette_score(metricInputs, labels), calinski_harabasz_score(metricInputs, labels), davies_bouldin_score(metricInputs, labels)]
+		else:
+			scores	= [float("nan")] * 3
+		return [model.n_clusters, model.inertia_] + scores + [float("nan"), runtime], model
+	##
+	# Fit MiniBatchKMeans with partial_fit over chunks, so the data never has to fit in memory
+	#
+	# params:
+	#	chunks:	iterable of DataFrame/array chunks, each with at least nClusters rows.
+	#			Or a callable returning one, to make several passes
+	#	epochs:	int passes over the chunks. Needs a callable for more than one
+	##
+	def clusterStream(self, chunks, epochs=1):
+		self.kmeans		= self.makeModel(miniBatch=True)
+		self.clusterIds	= False
+		for _ in range(epochs):
+			for chunk in (chunks() if callable(chunks) else chunks):
+				self.kmeans.partial_fit(self.inputs(chunk))
+		return self
+	##
+	# clusterStream() over a CSV or Parquet file read in batchSize chunks. Only the labels columns are read
+	##
+	def clusterFile(self, path, epochs=1):
+		source	= StreamingDataSource(path, batchSize=self.batchSize, columns=self.labels or None, downcast=False)
+		return self.clusterStream(lambda: (chunk for _, chunk in source.batches()), epochs=epochs)
+	##
+	# Unfitted KMeans or MiniBatchKMeans for the current settings
+	##
+	def makeModel(self, miniBatch=False):
+		if miniBatch or self.mode == __class__.MINI_BATCH_MODE:
+			return MiniBatchKMeans(
+				n_clusters=		self.nClusters,
+				n_init=			self.nInit,
+				max_iter=		self.maxIterations,
+				batch_size=		self.batchSize,
+				random_state=	self.randomState
+			)
+		return KMeans(
 			n_clusters=		self.nClusters, 
 			n_init=			self.nInit,
 			algorithm=		self.algorithm,
 			max_iter=		self.maxIterations,
 			random_state=	self.randomState
-		).fit(self.data)
+		)
+	##
+	# Model inputs: The labels columns, or everything when labels is empty. Arrays are used as they are
+	#
+	# Selecting columns copies only the rows passed in, so pass chunks for big frames.
+	##
+	def inputs(self, data):
+		if isinstance(data, DataFrame) and self.labels and list(data.columns) != list(self.labels):
+			return data[self.labels]
+		return data
 	##
 	# Get cluster IDs
 	#
+	# DataFrames and arrays are predicted batchSize rows at a time into one array.
+	# Any other iterable is treated as chunks.
+	#
 	# params:
-	#	data:	pandas.DataFrame
+	#	data:		pandas.DataFrame, 2D array or iterable of chunks
+	#	chunkSize:	int rows per chunk. None for batchSize
 	#
 	# output:	np.array of cluster IDs
 	##
-	def predict(self, data):
-			return self.kmeans.predict(data)
\ No newline at end of file
+	def predict(self, data, chunkSize=None):
+		chunkSize	= chunkSize or self.batchSize
+		if isinstance(data, (DataFrame, ndarray)):
+			clusterIds	= empty(len(data), dtype=int32)
+			rows		= data.iloc if isinstance(data, DataFrame) else data
+			for start in range(0, len(data), chunkSize):
+				clusterIds[start:start + chunkSize]	= self.kmeans.predict(self.inputs(rows[start:start + chunkSize]))
+			return clusterIds
+		return concatenate([self.kmeans.predict(self.inputs(chunk)) for chunk in data])
@@ -0,0 +1,125 @@
+### Includes ###
+## Native
+from ast					import parse, ClassDef
+from collections.abc		import Mapping
+from importlib				import import_module
+from importlib.metadata		import version
+from importlib.util			import find_spec
+from json					import dump, load
+from os						import listdir, makedirs, replace
+from os.path				import expanduser, isfile, join
+## Project
+
+##
+# MealPy algorithm registry: Lazily-imported name -> constructor mapping
+#
+# Indexes algorithm class name -> module path by parsing the source of mealpy's
+# *_based packages, so nothing is imported to build it. The index is cached as
+# JSON in cacheDirectory, keyed by the installed mealpy version. A class is only
+# imported the first time it's looked up.
+#
+# Blacklisted algorithms are left out of iteration (e.g. barrage() over every
+# algorithm) but can still be looked up explicitly by name.
+##
+class MealPyAlgorithmRegistry(Mapping):
+	DEFAULT_CACHE_DIRECTORY	= join(expanduser("~"), ".cache", "duckula")
+	DEFAULT_BLACKLIST		= {
+		"WMQIMRFO":		"Never worked with anything I've tested",
+		"OriginalICA":	"Suuuuuppppppeeerrr slow or doesn't converge. Either way",
+		"QTable":		"Not an algorithm"
+	}
+	##
+	# params:
+	#	blacklist:		dict or iterable of algorithm names to leave out of iteration. None for DEFAULT_BLACKLIST
+	#	cacheDirectory:	string directory for the on-disk index. False to never touch disk
+	##
+	def __init__(self, blacklist=None, cacheDirectory=DEFAULT_CACHE_DIRECTORY):
+		self.blacklist		= set(__class__.DEFAULT_BLACKLIST if blacklist is None else blacklist)
+		self.cacheDirectory	= cacheDirectory	# string directory for index files
+		self.index			= False				# dict name: module path. False until loaded
+		self.constructors	= {}				# dict name: class. Filled as they're looked up
+	##
+	# Installed mealpy version. Read from package metadata so mealpy isn't imported
+	##
+	@property
+	def mealpyVersion(self):
+		return version("mealpy")
+	##
+	# Path of the cached index for the installed mealpy version
+	##
+	@property
+	def cachePath(self):
+		return join(self.cacheDirectory, "mealpy_algorithms_%s.json" %(self.mealpyVersion))
+	##
+	# Load the index from disk, or build and save it if there's no cache for this mealpy version
+	##
+	def load(self):
+		if self.index is not False:
+			return self
+		if self.cacheDirectory and isfile(self.cachePath):
+			try:
+				with open(self.cachePath) as file:
+					self.index	= load(file)
+				return self
+			except (OSError, ValueError):
+				pass
+		self.index	= __class__.BuildIndex()
+		if self.cacheDirectory:
+			self.save()
+		return self
+	##
+	# Write the index to cachePath. A read-only cache location isn't an error
+	##
+	def save(self):
+		try:
+			makedirs(self.cacheDirectory, exist_ok=True)
+			temporaryPath	= self.cachePath + ".tmp"
+			with open(temporaryPath, "w") as file:
+				dump(self.index, file, indent=1, sort_keys=True)
+			replace(temporaryPath, self.cachePath)
+		except OSError:
+			pass
+	############
+	# Blacklisting
+	############
+	def exclude(self, name):
+		self.blacklist.add(name)
+	def include(self, name):
+		self.blacklist.discard(name)
+	##
+	# Module path of an algorithm without importing it
+	##
+	def modulePath(self, name):
+		return self.load().index[name]
+	############
+	# Mapping
+	############
+	def __getitem__(self, name):
+		if name not in self.constructors:
+			self.constructors[name]	= getattr(import_module(self.modulePath(name)), name)
+		return self.constructors[name]
+	def __iter__(self):
+		return (name for name in self.load().index if name not in self.blacklist)
+	def __len__(self):
+		return sum(1 for _ in self)
+	def __contains__(self, name):
+		return name in self.load().index
+	##
+	# Build the index by parsing the *_based packages' source: Class name -> module path
+	##
+	@staticmethod
+	def BuildIndex():
+		index	= {}
+		root	= find_spec("mealpy").submodule_search_locations[0]
+		for package in sorted(listdir(root)):
+			if not package.endswith("_based"):
+				continue
+			for fileName in sorted(listdir(join(root, package))):
+				if not fileName.endswith(".py") or fileName == "__init__.py":
+					continue
+				with open(join(root, package, fileName)) as file:
+					tree	= parse(file.read())
+				for node in tree.body:
+					if isinstance(node, ClassDef):
+						index[node.name]	= "mealpy.%s.%s" %(package, fileName[:-3])
+		return dict(sorted(index.items()))
\ No newline at end of file
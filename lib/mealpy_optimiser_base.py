@@ -1,20 +1,45 @@
 ### Includes ###
 ## Native 
-from typing 	import Any
-from mealpy		import IntegerVar, FloatVar
-from importlib	import import_module
-from pkgutil	import walk_packages
-from argparse	import ArgumentParser
+from functools	import partial
+from math		import ceil, floor
+from numpy		import arange, argsort, array
+from multiprocessing			import Pipe, Process, cpu_count
+from multiprocessing.connection	import wait
+from os			import replace
+from pickle		import dump, load, HIGHEST_PROTOCOL
+from time		import perf_counter
+from zlib		import crc32
+from pandas		import DataFrame
+## Project
+from lib.instrumentation			import INSTRUMENTATION
+from lib.mealpy_algorithm_registry	import MealPyAlgorithmRegistry
+##
+# MealPy variable type: A mealpy variable class (IntegerVar, FloatVar, ...) resolved on first access
+#
+# Keeps mealpy out of the import: It's imported when an optimiser is constructed or
+# FLOAT_VAR/INTEGER_VAR are first read.
+##
+class MealPyVariableType():
+	def __init__(self, name):
+		self.name	= name		# string mealpy class name, e.g. FloatVar
+	def __get__(self, instance, owner):
+		import mealpy
+		return getattr(mealpy, self.name)
 class MealPyOptimiserBase():
-	CONSTRCUTORS = {}
-	FLOAT_VAR	= FloatVar
-	INTEGER_VAR	= IntegerVar
-	def __init__(self, data=False, epochs=100, minMax="min", varType=IntegerVar, algorithm=False, 
-			  customParams={}, inequality=-1, population=50, logPath=None):
+	CONSTRCUTORS 	= MealPyAlgorithmRegistry()
+	BARRAGE_COLUMNS	= ["algorithm", "fitness", "runtime", "evaluations", "failure", "cacheHits", "cacheMisses"]
+	RACE_COLUMNS	= ["algorithm", "fitness", "eliminated", "epochs", "evaluations", "runtime", "failure", "curve"]
+	ISLAND_COLUMNS	= ["island", "fitness", "epochs", "evaluations", "immigrants", "runtime", "failure", "curve"]
+	SOLVER_HOOKS	= ["evolve", "update_target_for_population", "generate_population"]	# Instance attributes beginSolve sets on the solver
+	FLOAT_VAR	= MealPyVariableType("FloatVar")
+	INTEGER_VAR	= MealPyVariableType("IntegerVar")
+	def __init__(self, data=False, epochs=100, minMax="min", varType=None, algorithm=False, 
+			  customParams={}, inequality=-1, population=50, logPath=None, fitnessCache=False,
+			  checkpointPath=None, checkpointEvery=10, surrogate=False):
 		self.data			= data				# DatasetBase 
 		self.epochs			= epochs			# int number of epoch	
 		self.minMax			= minMax			# string [min]imise or [max]imise
-		self.varType		= varType			# MealPy variable type. Typically IntegerVar or FloatVar
+		self.varType		= varType if varType is not None else __class__.INTEGER_VAR	# MealPy variable type. Typically IntegerVar or FloatVar
 		self.logPath		= logPath			# string path for log file
 		self.lastResult		= False				# Agent or whatever comes from the solver
 		self.inequality		= inequality		# int/float penalty objective
@@ -22,6 +47,15 @@ class MealPyOptimiserBase():
 		self.customParams	= customParams		# Dict of extra problem parameters. E.g obj_weights for multi-objective
 		self.lastResult		= False				# Last result from optimisation
 		self.algorithm		= algorithm			# The MealPy "magic" alogrithm of your choice. MUST DEFINE
+		self.fitnessCache	= fitnessCache		# FitnessCache memo of solution scores. False for stochastic objectives
+		self.fitnessCacheStats	= False			# {"hits": int, "misses": int} for the last solve()
+		self.solver			= False				# MealPy Optimizer of the current/last solve()
+		self.solverEpoch	= 0					# int epochs self.solver has run
+		self.solveCacheBaseline	= (0, 0)		# (hits, misses) of fitnessCache when the solve began
+		self.checkpointPath		= checkpointPath	# string file solve() saves the solver to every checkpointEvery epochs. None for never
+		self.checkpointEvery	= checkpointEvery	# int epochs between checkpoints
+		self.surrogate			= surrogate			# Surrogate pre-screening each generation so only the promising get score(). False for off
+		self.surrogateStats		= False				# Surrogate.stats for the last solve(): real vs surrogate evaluations and accuracy
 	##
 	# Lower bound of all variables (Virtual)
 	##
@@ -40,7 +74,7 @@ class MealPyOptimiserBase():
 	@property
 	def problem(self):
 		return {
-			"obj_func": self.score,
+			"obj_func": self.cachedScore if self.fitnessCache else self.score,
 			"bounds":	self.varType(lb=self.lowerBounds, ub=self.upperBounds),
 			"minmax":	self.minMax,
 			"log_to":	self.logPath
@@ -62,71 +96,913 @@ class MealPyOptimiserBase():
 	def score(self, solution):
 		raise Exception("%s doesn't override score()" %(__class__.__name__))
 	##
+	# Score through self.fitnessCache: Only calls score() on a miss (Final)
+	##
+	def cachedScore(self, solution):
+		rounded			= self.fitnessCache.round(solution)
+		key				= self.fitnessCache.key(rounded)
+		found, score	= self.fitnessCache.get(key)
+		if not found:
+			score	= self.score(rounded)
+			self.fitnessCache.put(key, score)
+		return score
+	##
+	# Identifies the problem for fitnessCache persistence: Entries for other problems aren't reused
+	##
+	@property
+	def problemKey(self):
+		return (
+			type(self).__qualname__,
+			tuple(self.lowerBounds),
+			tuple(self.upperBounds),
+			self.varType.__name__,
+			self.minMax
+		)
+	##
+	# Population score / fitness function (Virtual)
+	#
+	# Override with a vectorised fitness function to score a whole generation in one
+	# call. When overridden, solve() runs MealPy in "swarm" mode so each generation is
+	# evaluated together rather than agent by agent.
+	#
+	# solutions:	2D array [population, dimensions] from MealPy
+	#
+	# output:	array [population] of fitness values, or [population, objectives]
+	##
+	def scoreBatch(self, solutions):
+		return array([self.score(solution) for solution in solutions])
+	##
+	# Does the subclass provide a vectorised scoreBatch?
+	##
+	@property
+	def hasScoreBatch(self):
+		return type(self).scoreBatch is not __class__.scoreBatch
+	##
 	# Solve the problem (Final [ideally])
+	#
+	# params:
+	#	seed:	int random seed passed to the MealPy solver. None for unseeded
+	##
+	def solve(self, seed=None):
+		self.beginSolve(seed)
+		self._solveCheckpointed()
+	##
+	# Continue an interrupted solve() from its checkpoint (Final)
+	#
+	# The solver is restored as it was after the checkpoint's epoch, population, random
+	# state and history included, so no finished epoch is evaluated again. Algorithms that
+	# draw from NumPy's global random state (e.g. SHADE's Cauchy draws) aren't seeded by
+	# MealPy, so they don't repeat exactly either way.
+	#
+	# params:
+	#	path:	string checkpoint file. None for self.checkpointPath
 	##
-	def solve(self):
+	def resume(self, path=None):
+		path	= path or self.checkpointPath
+		with open(path, "rb") as file:
+			checkpoint	= load(file)
+		if checkpoint["problem"] != self.problemKey:
+			raise ValueError("%s is a checkpoint of a different problem" %(path))
+		self.checkpointPath	= path
+		self.solver			= checkpoint["solver"]
+		self.solverEpoch	= checkpoint["epoch"]
+		self.algorithm		= type(self.solver)
+		if self.surrogate and checkpoint.get("surrogate"):
+			self.surrogate	= checkpoint["surrogate"]
+		self._beginCacheStats()
+		self._beginSurrogate()
+		self.solver.problem.obj_func	= self.objective
+		self._hookSolver()
+		self._solveCheckpointed()
+	##
+	# Run the rest of the epochs, saving a checkpoint every checkpointEvery (Internal)
+	##
+	def _solveCheckpointed(self):
+		while self.solverEpoch < self.epochs:
+			self.continueSolve(self.checkpointEvery if self.checkpointPath else self.epochs)
+			if self.checkpointPath:
+				self.saveCheckpoint()
+		self.endSolve()
+	##
+	# Save the solver's state between epochs (Final)
+	#
+	# The solver is pickled without the objective and hooks, which resume() reattaches,
+	# so the optimiser and its data aren't saved with it.
+	#
+	# params:
+	#	path:	string checkpoint file. None for self.checkpointPath
+	##
+	def saveCheckpoint(self, path=None):
+		path	= path or self.checkpointPath
+		solver	= self.solver
+		hooks	= {name: solver.__dict__.pop(name) for name in __class__.SOLVER_HOOKS if name in solver.__dict__}
+		objective, solver.problem.obj_func	= solver.problem.obj_func, None
+		try:
+			temporaryPath	= path + ".tmp"
+			with open(temporaryPath, "wb") as file:
+				dump({"problem": self.problemKey, "epoch": self.solverEpoch, "solver": solver, "surrogate": self.surrogate},
+					file, protocol=HIGHEST_PROTOCOL)
+			replace(temporaryPath, path)
+		finally:
+			solver.problem.obj_func	= objective
+			solver.__dict__.update(hooks)
+		if self.fitnessCache:
+			self.fitnessCache.save()
+	##
+	# Set up self.solver and score its first population: solve() in steps (Final)
+	#
+	# beginSolve(), continueSolve() as often as needed, then endSolve() does what solve()
+	# does, but the solver can be paused between epochs, e.g. for race().
+	#
+	# params:
+	#	seed:				int random seed passed to the MealPy solver. None for unseeded
+	#	startingSolutions:	2D array [population, dimensions] first population. None for random
+	##
+	def beginSolve(self, seed=None, startingSolutions=None):
+		self._beginCacheStats()
 		self.solver			= self.algorithm(epoch=self.epochs, pop_size=self.population)
-		self.lastResult 	= self.solver.solve(self.completeProblem)
+		problem				= self.completeProblem
+		problem["obj_func"]	= self.objective
+		mode				= self._hookSolver()
+		# As Optimizer.solve, up to its epoch loop
+		solver	= self.solver
+		solver.check_problem(problem, seed)
+		self._beginSurrogate()
+		solver.check_mode_and_workers(mode, None)
+		solver.check_termination("start", None, None)
+		solver.initialize_variables()
+		solver.before_initialization(startingSolutions)
+		solver.initialization()
+		solver.after_initialization()
+		solver.before_main_loop()
+		self.solverEpoch	= 0
+	##
+	# The problem's obj_func: score(), through the fitness cache and instrumentation when on
+	##
+	@property
+	def objective(self):
+		objective	= self.completeProblem["obj_func"]
+		# Agents scored one at a time, e.g. PSO's first population, still train the surrogate
+		if self.surrogate:
+			objective	= partial(__class__._SurrogateFitness, self.surrogate, objective)
+		# Hooks only go in while instrumentation is enabled: Fitness is the hottest loop
+		if INSTRUMENTATION.enabled:
+			return partial(__class__._TracedFitness, objective)
+		return objective
+	##
+	# Put scoreBatch and instrumentation hooks on self.solver (Internal)
+	#
+	# output:	string MealPy mode: swarm when scoreBatch scores whole populations, or to screen them with the surrogate
+	##
+	def _hookSolver(self):
+		solver	= self.solver
+		if INSTRUMENTATION.enabled:
+			solver.evolve	= partial(__class__._TracedEpoch, type(solver).evolve.__get__(solver))
+		if not self.hasScoreBatch and not self.surrogate:
+			return "single"
+		solver.update_target_for_population	= partial(self._updateTargetForPopulation, solver)
+		# Algorithms that add state in generate_agent (e.g. PSO's local best) keep their own
+		from mealpy.optimizer	import Optimizer
+		if type(solver).generate_agent is Optimizer.generate_agent:
+			solver.generate_population		= partial(self._generatePopulation, solver)
+		return "swarm"
+	##
+	# Fitness cache counters at the start of a solve (Internal)
+	##
+	def _beginCacheStats(self):
+		if self.fitnessCache:
+			self.fitnessCache.attach(self.problemKey)
+			self.solveCacheBaseline	= (self.fitnessCache.hits, self.fitnessCache.misses)
+	##
+	# Point the surrogate at this problem and reset its counters (Internal)
+	##
+	def _beginSurrogate(self):
+		if not self.surrogate:
+			return
+		if self.solver.problem.obj_weights is not None and len(self.solver.problem.obj_weights) > 1:
+			raise ValueError("Surrogate screening needs a single objective problem")
+		self.surrogate.attach(self.problemKey, self.minMax, self.population)
+	##
+	# Run more of the solver's epochs (Final)
+	#
+	# Stops early at self.epochs in total, after the epoch that reaches maxEvaluations
+	# or passes deadline.
+	#
+	# params:
+	#	epochs:				int epochs to run
+	#	deadline:			float perf_counter() time to stop at. None for no limit
+	#	maxEvaluations:		int solver.nfe_counter to stop at. None for no limit
+	#
+	# output:	int epochs run
+	##
+	def continueSolve(self, epochs, deadline=None, maxEvaluations=None):
+		solver	= self.solver
+		first	= self.solverEpoch + 1
+		for epoch in range(first, min(first + epochs, self.epochs + 1)):
+			# As an iteration of Optimizer.solve's epoch loop
+			started	= perf_counter()
+			solver.evolve(epoch)
+			population, solver.g_best	= solver.update_global_best_agent(solver.pop)
+			if solver.sort_flag:
+				solver.pop	= population
+			solver.track_optimize_step(solver.pop, epoch, perf_counter() - started)
+			self.solverEpoch	= epoch
+			if solver.check_termination("end", None, epoch):
+				self.solverEpoch	= self.epochs
+				break
+			if (deadline is not None and perf_counter() >= deadline) or (maxEvaluations is not None and solver.nfe_counter >= maxEvaluations):
+				break
+		self.lastResult	= solver.g_best
+		return self.solverEpoch - first + 1
+	##
+	# Finish a beginSolve(): Set lastResult and save the fitness cache (Final)
+	##
+	def endSolve(self):
+		self.solver.track_optimize_process()
+		self.lastResult 	= self.solver.g_best
+		if self.fitnessCache:
+			hits, misses			= self.solveCacheBaseline
+			self.fitnessCacheStats	= {"hits": self.fitnessCache.hits - hits, "misses": self.fitnessCache.misses - misses}
+			self.fitnessCache.save()
+		if self.surrogate:
+			self.surrogateStats	= self.surrogate.stats
+	##
+	# An obj_func call in a mealpy.fitness span (Internal)
+	##
+	@staticmethod
+	def _TracedFitness(function, solution):
+		INSTRUMENTATION.count("fitnessEvaluations")
+		with INSTRUMENTATION.span("mealpy.fitness", agents=1):
+			return function(solution)
+	##
+	# An obj_func call added to the surrogate's archive (Internal)
+	##
+	@staticmethod
+	def _SurrogateFitness(surrogate, function, solution):
+		score	= function(solution)
+		surrogate.add([solution], [score])
+		return score
+	##
+	# A solver.evolve call in a mealpy.epoch span (Internal)
+	##
+	@staticmethod
+	def _TracedEpoch(evolve, epoch):
+		with INSTRUMENTATION.span("mealpy.epoch", epoch=epoch):
+			return evolve(epoch)
+	##
+	# Score a MealPy population with one scoreBatch call (Internal)
+	#
+	# Replaces the solver's update_target_for_population when scoreBatch is defined, or
+	# there's a surrogate. Once the surrogate is fitted, and the first population has a
+	# global best, only the candidates it screens in are scored. The rest get a pessimistic
+	# prediction (see Surrogate.screenedOut). solver.nfe_counter counts real evaluations.
+	##
+	def _updateTargetForPopulation(self, solver, pop=None):
+		if not pop:
+			return pop
+		solutions	= array([agent.solution for agent in pop])
+		scored		= arange(len(pop))
+		predicted	= None
+		scores		= [None] * len(pop)
+		if self.surrogate and solver.g_best is not None and solver.g_best.target is not None and self.surrogate.refresh():
+			predicted	= self.surrogate.predict(solutions)
+			scored		= self.surrogate.screen(predicted, solver.generator.random(len(pop)))
+			scores		= list(self.surrogate.screenedOut(predicted))
+			self.surrogate.surrogateEvaluations	+= len(pop) - len(scored)
+			INSTRUMENTATION.count("surrogateEvaluations", len(pop) - len(scored))
+		INSTRUMENTATION.count("fitnessEvaluations", len(scored))
+		with INSTRUMENTATION.span("mealpy.fitness", agents=len(scored)):
+			if self.fitnessCache:
+				real	= self._cachedScoreBatch(solutions[scored])
+			else:
+				real	= self.scoreBatch(solutions[scored])
+		for index, score in zip(scored, real):
+			scores[index]	= score
+		if self.surrogate:
+			self.surrogate.add(solutions[scored], real, None if predicted is None else predicted[scored])
+		from mealpy.utils.target	import Target
+		for agent, objectives in zip(pop, scores):
+			agent.target	= Target(objectives=objectives, weights=solver.problem.obj_weights)
+		solver.nfe_counter	+= len(scored)
+		return pop
+	##
+	# Score a population through self.fitnessCache: One scoreBatch call for the misses (Internal)
+	##
+	def _cachedScoreBatch(self, solutions):
+		rounded	= self.fitnessCache.round(solutions)
+		keys	= [self.fitnessCache.key(solution) for solution in rounded]
+		scores	= [None] * len(solutions)
+		missing	= []
+		for index, key in enumerate(keys):
+			found, scores[index]	= self.fitnessCache.get(key)
+			if not found:
+				missing.append(index)
+		if missing:
+			for index, score in zip(missing, self.scoreBatch(rounded[missing])):
+				scores[index]	= score
+				self.fitnessCache.put(keys[index], score)
+		return scores
+	##
+	# Generate and score a MealPy population with one scoreBatch call (Internal)
+	#
+	# Replaces the solver's generate_population when scoreBatch is defined.
+	##
+	def _generatePopulation(self, solver, pop_size=None):
+		pop	= [solver.generate_empty_agent() for _ in range(solver.pop_size if pop_size is None else pop_size)]
+		return self._updateTargetForPopulation(solver, pop)
 	#####################
 	### Magic methods ###
 	#####################
 	##
 	# Barrage: Try all the models
 	#
-	# output: MealPy metaheuristic
+	# Each algorithm is solved in its own process, at most workers at a time. Algorithms
+	# that run past timeout seconds are terminated and reported as failures.
 	#
+	# params:
+	#	models:		string[] CONSTRCUTORS keys to try. False for all of them
+	#	workers:	int number of concurrent processes. None for one per CPU
+	#	timeout:	float wall-clock seconds allowed per algorithm. None for no limit
+	#	seed:		int base seed. Each algorithm gets a seed derived from it and its name
+	#	verbose:	bool print each result as it arrives
+	#
+	# output: DataFrame of BARRAGE_COLUMNS, best first. self.algorithm is set to the best
 	## 
-	def barrage(self, models=False):
-		print("WARNING! This dumps results for effect. Doesn't affect anything, just looks cool") 
+	def barrage(self, models=False, workers=None, timeout=None, seed=None, verbose=False):
+		__class__.MapConstructors()
+		if not models:
+			models	= list(__class__.CONSTRCUTORS)
+		# Load persisted scores before forking so every worker starts with them
+		if self.fitnessCache:
+			self.fitnessCache.attach(self.problemKey)
+		workers		= max(1, workers or cpu_count())
+		pending		= list(models)
+		running		= {}	# model: (Process, Connection, float start time)
+		results		= []
+		while pending or running:
+			# Keep the pool full
+			while pending and len(running) < workers:
+				model					= pending.pop(0)
+				receiver, sender		= Pipe(duplex=False)
+				process					= Process(
+					target=	__class__._BarrageWorker,
+					args=	(self, model, __class__.BarrageSeed(seed, model), sender),
+					daemon=	True
+				)
+				process.start()
+				sender.close()
+				running[model]	= (process, receiver, perf_counter())
+			# Wait for a result, a dead worker or the nearest deadline
+			waitFor	= None
+			if timeout is not None:
+				waitFor	= max(0, min(started + timeout for _, _, started in running.values()) - perf_counter())
+			wait([receiver for _, receiver, _ in running.values()] +
+				[process.sentinel for process, _, _ in running.values()], waitFor)
+			for model, (process, receiver, started) in list(running.items()):
+				result	= False
+				if receiver.poll():
+					try:
+						result, scores	= receiver.recv()
+						if self.fitnessCache:
+							self.fitnessCache.update(scores)
+					except EOFError:
+						result	= False
+				if not result and process.is_alive():
+					if timeout is None or perf_counter() - started < timeout:
+						continue
+					process.terminate()
+					result	= __class__.BarrageRow(model, runtime=perf_counter() - started, failure="timeout after %ss" %(timeout))
+				elif not result:
+					result	= __class__.BarrageRow(model, runtime=perf_counter() - started, failure="worker exited with code %s" %(process.exitcode))
+				process.join()
+				receiver.close()
+				del running[model]
+				results.append(result)
+				if verbose:
+					self.printBarrageRow(result, results)
+		table	= DataFrame(results, columns=__class__.BARRAGE_COLUMNS).sort_values(
+			"fitness", ascending=self.minMax == "min", na_position="last", kind="stable").reset_index(drop=True)
+		self.barrageResults	= table
+		if self.fitnessCache:
+			self.fitnessCache.save()
+		if len(table) and table["failure"].isna().iloc[0]:
+			self.algorithm	= __class__.CONSTRCUTORS[table["algorithm"].iloc[0]]
+		return table
+	##
+	# Barrage worker: Solve with one algorithm and send its BarrageRow (Internal)
+	#
+	# Runs in a child process so the parent can terminate it on timeout.
+	##
+	@staticmethod
+	def _BarrageWorker(optimiser, model, seed, connection):
+		started	= perf_counter()
+		# The parent merges and saves new scores, so workers never write the cache file
+		if optimiser.fitnessCache:
+			optimiser.fitnessCache.path	= None
+			optimiser.fitnessCache.drain()
+		try:
+			optimiser.algorithm	= __class__.CONSTRCUTORS[model]
+			optimiser.solve(seed=seed)
+			row	= __class__.BarrageRow(
+				model,
+				fitness=		optimiser.lastResult.target.fitness,
+				runtime=		perf_counter() - started,
+				evaluations=	optimiser.solver.nfe_counter,
+				cacheStats=		optimiser.fitnessCacheStats
+			)
+		except Exception as e:
+			row	= __class__.BarrageRow(model, runtime=perf_counter() - started, failure=repr(e))
+		try:
+			connection.send((row, optimiser.fitnessCache.drain() if optimiser.fitnessCache else {}))
+		finally:
+			connection.close()
+	##
+	# Make a barrage results row
+	##
+	@staticmethod
+	def BarrageRow(model, fitness=None, runtime=None, evaluations=None, failure=None, cacheStats=False):
+		return {
+			"algorithm":	model,
+			"fitness":		fitness,
+			"runtime":		runtime,
+			"evaluations":	evaluations,
+			"failure":		failure,
+			"cacheHits":	cacheStats["hits"] if cacheStats else None,
+			"cacheMisses":	cacheStats["misses"] if cacheStats else None
+		}
+	##
+	# Per-algorithm seed: Stable for a given base seed and algorithm name
+	##
+	@staticmethod
+	def BarrageSeed(seed, model):
+		return None if seed is None else (seed + crc32(model.encode())) % 2 ** 32
+	##
+	# Print a barrage row as it arrives. Green for a new best, just looks cool
+	##
+	def printBarrageRow(self, row, results):
 		from colorama	import init, Fore, Style
 		init()
+		name	= row["algorithm"].ljust(18)
+		if row["failure"]:
+			print("%s: No solution (%s)" %(name, row["failure"]))
+			return
+		fitnesses	= [result["fitness"] for result in results if not result["failure"]]
+		best		= min(fitnesses) if self.minMax == "min" else max(fitnesses)
+		if row["fitness"] == best:
+			print("%s%s: %s%s" %(Fore.GREEN, name, row["fitness"], Style.RESET_ALL))
+		else:
+			print("%s: %s" %(name, row["fitness"]))
+	##
+	# Race: Successive elimination of algorithms under a shared budget
+	#
+	# Every algorithm runs initialEpochs, then the worst (1 - keepFraction) of them are
+	# dropped. Survivors resume where they stopped, each round running growth times as
+	# many epochs as the last, until one is left, they reach self.epochs or the budget
+	# runs out. Each algorithm keeps its solver in its own process between rounds, at
+	# most workers of them running at once.
+	#
+	# Rounds are shortened to fit what's left of maxEvaluations and timeBudget, going by
+	# each algorithm's evaluations and seconds per epoch so far, and workers stop at
+	# their share of the budget mid-round. The race overshoots by an epoch per algorithm at most.
+	#
+	# params:
+	#	models:			string[] CONSTRCUTORS keys to race. False for all of them
+	#	workers:		int algorithms running at once. None for one per CPU
+	#	initialEpochs:	int epochs in the first round. None for self.epochs / 10
+	#	growth:			float each round's epochs over the last's
+	#	keepFraction:	float share of the algorithms kept after each round
+	#	maxEvaluations:	int fitness evaluations for the whole race. None for no limit
+	#	timeBudget:		float wall-clock seconds for the whole race. None for no limit
+	#	seed:			int base seed. Each algorithm gets a seed derived from it and its name
+	#	verbose:		bool print each round's survivors
+	#
+	# output:	DataFrame of RACE_COLUMNS, finalists first, then by elimination round and fitness.
+	#			eliminated is the round an algorithm was dropped in, None for finalists. curve
+	#			is its best fitness after each epoch. self.algorithm is set to the best
+	##
+	def race(self, models=False, workers=None, initialEpochs=None, growth=2, keepFraction=0.5,
+			maxEvaluations=None, timeBudget=None, seed=None, verbose=False):
 		__class__.MapConstructors()
 		if not models:
 			models	= list(__class__.CONSTRCUTORS)
-		results		= {}
-		best		= 99999999999
-		bestModel	= False
-		for model in models:
-			self.algorithm	= __class__.CONSTRCUTORS[model]
-			while len(model) < 18:
-				model += " "
-			try:
-				self.solve()
-				result	= self.lastResult.target.objectives[0]
-				results[model]	= result
-				if result <= best:		
-					if result == best:
-						print("%s%s: %s%s" %(Fore.YELLOW, model, result, Style.RESET_ALL))
-					else:
-						print("%s%s: %s%s" %(Fore.GREEN, model, result, Style.RESET_ALL))
-					best 		= result
-					bestModel	= model
+		if self.fitnessCache:
+			self.fitnessCache.attach(self.problemKey)
+		workers			= max(1, workers or cpu_count())
+		roundEpochs		= initialEpochs or max(1, self.epochs // 10)
+		started			= perf_counter()
+		rows			= {model: __class__.RaceRow(model, epochs=0, evaluations=0, runtime=0.0) for model in models}
+		processes		= {}	# model: (Process, Connection)
+		contenders		= list(models)
+		roundNumber		= 0
+		try:
+			while contenders:
+				roundNumber	+= 1
+				# Fit the round and each algorithm's share to what's left of the budget
+				epochs		= min(roundEpochs, self.epochs - min(rows[model]["epochs"] for model in contenders))
+				evaluations	= None
+				seconds		= None
+				if maxEvaluations is not None:
+					evaluations	= (maxEvaluations - sum(row["evaluations"] for row in rows.values())) // len(contenders)
+					perEpoch	= max(__class__.RaceRate(rows[model], "evaluations", self.population) for model in contenders)
+					epochs		= min(epochs, floor(evaluations / perEpoch))
+				if timeBudget is not None:
+					seconds		= (timeBudget - (perf_counter() - started)) * min(workers, len(contenders)) / len(contenders)
+					perEpoch	= max(__class__.RaceRate(rows[model], "runtime", 0.0) for model in contenders)
+					if perEpoch:
+						epochs	= min(epochs, floor(seconds / perEpoch))
+				# The first round always runs, so every algorithm has a fitness
+				if roundNumber == 1:
+					epochs	= max(epochs, 1)
+				elif epochs < 1 or (evaluations is not None and evaluations <= 0) or (seconds is not None and seconds <= 0):
+					break
+				self._raceRound(contenders, processes, rows, workers, (epochs, seconds, evaluations), seed)
+				# Failed algorithms are out straight away
+				for model in contenders:
+					if rows[model]["failure"]:
+						rows[model]["eliminated"]	= roundNumber
+						__class__._StopRaceWorker(processes.pop(model, None))
+				ranked		= sorted([model for model in contenders if not rows[model]["failure"]],
+					key=lambda model: rows[model]["fitness"], reverse=self.minMax != "min")
+				finished	= all(rows[model]["epochs"] >= self.epochs for model in ranked)
+				keep		= len(ranked) if finished else max(1, ceil(len(ranked) * keepFraction))
+				for model in ranked[keep:]:
+					rows[model]["eliminated"]	= roundNumber
+					__class__._StopRaceWorker(processes.pop(model, None))
+				contenders	= ranked[:keep]
+				if verbose:
+					print("Round %d (%d epochs): %s" %(roundNumber, epochs, ", ".join("%s %s" %(model, rows[model]["fitness"]) for model in contenders)))
+				if finished or len(contenders) <= 1:
+					break
+				roundEpochs	= max(roundEpochs + 1, ceil(roundEpochs * growth))
+		finally:
+			for process in processes.values():
+				__class__._StopRaceWorker(process)
+		table	= DataFrame(list(rows.values()), columns=__class__.RACE_COLUMNS)
+		table	= table.assign(_order=table["eliminated"].fillna(roundNumber + 1)).sort_values(
+			["_order", "fitness"], ascending=[False, self.minMax == "min"], na_position="last", kind="stable").drop(columns="_order").reset_index(drop=True)
+		self.raceResults	= table
+		if self.fitnessCache:
+			self.fitnessCache.save()
+		if len(table) and table["failure"].isna().iloc[0] and table["fitness"].notna().iloc[0]:
+			self.algorithm	= __class__.CONSTRCUTORS[table["algorithm"].iloc[0]]
+		return table
+	##
+	# Run one race round: Each contender's worker continues for the round's epochs (Internal)
+	#
+	# Workers are started on their first round. At most workers run at once.
+	#
+	# params:
+	#	command:	(int epochs, float seconds or None, int evaluations or None) each contender gets
+	##
+	def _raceRound(self, contenders, processes, rows, workers, command, seed):
+		pending	= list(contenders)
+		running	= {}	# model: Connection
+		while pending or running:
+			while pending and len(running) < workers:
+				model	= pending.pop(0)
+				if model not in processes:
+					connection, workerConnection	= Pipe()
+					process							= Process(
+						target=	__class__._RaceWorker,
+						args=	(self, model, __class__.BarrageSeed(seed, model), workerConnection),
+						daemon=	True
+					)
+					process.start()
+					workerConnection.close()
+					processes[model]	= (process, connection)
+				processes[model][1].send(command)
+				running[model]	= processes[model][1]
+			wait(list(running.values()) + [processes[model][0].sentinel for model in running])
+			for model, connection in list(running.items()):
+				process	= processes[model][0]
+				if connection.poll():
+					try:
+						row, scores	= connection.recv()
+						if self.fitnessCache:
+							self.fitnessCache.update(scores)
+					except EOFError:
+						row	= dict(rows[model], failure="worker exited with code %s" %(process.exitcode))
+				elif not process.is_alive():
+					row	= dict(rows[model], failure="worker exited with code %s" %(process.exitcode))
 				else:
-					print("%s: %s" %(model, result))
-			except Exception as e:
-				print(e)
-				print("%s: No solution " %(model))
-		return bestModel
+					continue
+				rows[model]	= row
+				del running[model]
+	##
+	# Race worker: Keeps one algorithm's solver between rounds (Internal)
+	#
+	# Receives (epochs, seconds, evaluations) per round and replies with its RaceRow and
+	# new fitness cache scores. None ends it. A failure row keeps the last round's epochs
+	# and fitness, with the evaluations and runtime spent up to the failure, so they still
+	# count against the race's budget.
+	##
+	@staticmethod
+	def _RaceWorker(optimiser, model, seed, connection):
+		# The parent merges and saves new scores, so workers never write the cache file
+		if optimiser.fitnessCache:
+			optimiser.fitnessCache.path	= None
+			optimiser.fitnessCache.drain()
+		optimiser.solver	= False
+		runtime	= 0.0
+		begun	= False
+		row		= __class__.RaceRow(model, epochs=0, evaluations=0, runtime=0.0)
+		try:
+			while True:
+				command	= connection.recv()
+				if command is None:
+					break
+				epochs, seconds, evaluations	= command
+				started	= perf_counter()
+				try:
+					before	= optimiser.solver.nfe_counter if begun else 0
+					if not begun:
+						optimiser.algorithm	= __class__.CONSTRCUTORS[model]
+						optimiser.beginSolve(seed)
+						begun				= True
+					optimiser.continueSolve(epochs,
+						deadline=		None if seconds is None else started + seconds,
+						maxEvaluations=	None if evaluations is None else before + evaluations)
+					runtime	+= perf_counter() - started
+					row		= __class__.RaceRow(
+						model,
+						fitness=		optimiser.lastResult.target.fitness,
+						epochs=			optimiser.solverEpoch,
+						evaluations=	optimiser.solver.nfe_counter,
+						runtime=		runtime,
+						curve=			list(optimiser.solver.history.list_global_best_fit)
+					)
+				except Exception as e:
+					row	= dict(row,
+						evaluations=	optimiser.solver.nfe_counter if optimiser.solver else row["evaluations"],
+						runtime=		runtime + perf_counter() - started,
+						failure=		repr(e)
+					)
+				connection.send((row, optimiser.fitnessCache.drain() if optimiser.fitnessCache else {}))
+				if row["failure"]:
+					break
+		except EOFError:
+			pass
+		finally:
+			connection.close()
+	##
+	# End a race worker
+	##
+	@staticmethod
+	def _StopRaceWorker(worker):
+		if not worker:
+			return
+		process, connection	= worker
+		try:
+			connection.send(None)
+		except (OSError, ValueError):
+			pass
+		process.join(5)
+		if process.is_alive():
+			process.terminate()
+			process.join()
+		connection.close()
+	##
+	# Make a race results row
+	##
+	@staticmethod
+	def RaceRow(model, fitness=None, eliminated=None, epochs=None, evaluations=None, runtime=None, failure=None, curve=None):
+		return {
+			"algorithm":	model,
+			"fitness":		fitness,
+			"eliminated":	eliminated,
+			"epochs":		epochs,
+			"evaluations":	evaluations,
+			"runtime":		runtime,
+			"failure":		failure,
+			"curve":		curve or []
+		}
+	##
+	# An algorithm's evaluations or seconds per epoch so far, or default before it's run
+	##
+	@staticmethod
+	def RaceRate(row, column, default):
+		if not row["epochs"]:
+			return default
+		return row[column] / row["epochs"]
+	##
+	# Solve with several independent populations of self.algorithm at once (Final)
+	#
+	# Each island is a full self.population solver with its own seed, in its own process,
+	# for self.epochs. Every migrateEvery epochs the islands pause, and each one's best
+	# migrants agents replace the worst of the next island's population (a ring). With
+	# migrateEvery None, the islands never meet: A parallel multi-start.
+	#
+	# params:
+	#	islands:		int populations. None for one per CPU
+	#	migrateEvery:	int epochs between migrations. None for none
+	#	migrants:		int agents each island sends per migration
+	#	workers:		int islands running at once. None for all of them
+	#	seed:			int base seed. Each island gets a seed derived from it and its number
+	#	verbose:		bool print each migration's island fitnesses
+	#
+	# output:	(Agent global best or False if every island failed, DataFrame of ISLAND_COLUMNS
+	#			by island). curve is the island's best fitness after each epoch, immigrants the
+	#			agents it took in. self.lastResult is set to the global best
+	##
+	def islands(self, islands=None, migrateEvery=10, migrants=1, workers=None, seed=None, verbose=False):
+		islands		= max(1, islands or cpu_count())
+		workers		= max(1, workers or islands)
+		if self.fitnessCache:
+			self.fitnessCache.attach(self.problemKey)
+		rows		= [__class__.IslandRow(island, epochs=0, evaluations=0, immigrants=0, runtime=0.0) for island in range(islands)]
+		processes	= {}	# island: (Process, Connection)
+		best		= {}	# island: Agent
+		emigrants	= {}	# island: [(solution, Target)] from its last leg
+		try:
+			while True:
+				alive	= [island for island in range(islands) if not rows[island]["failure"] and rows[island]["epochs"] < self.epochs]
+				if not alive:
+					break
+				epochs	= min(migrateEvery or self.epochs, self.epochs - min(rows[island]["epochs"] for island in alive))
+				# Ring: Each island takes the last leg's emigrants of the nearest live island before it
+				sources	= [island for island in range(islands) if island in emigrants]
+				commands	= {}
+				for island in alive:
+					source	= max([source for source in sources if source < island] or sources or [None])
+					commands[island]	= (epochs, emigrants.get(source, []) if source != island else [])
+				emigrants	= self._islandLeg(commands, processes, rows, best, workers, migrants, seed)
+				for island in range(islands):
+					if rows[island]["failure"]:
+						__class__._StopRaceWorker(processes.pop(island, None))
+				if verbose:
+					print("Epoch %d: %s" %(max(row["epochs"] for row in rows), ", ".join("%d %s" %(row["island"], row["fitness"]) for row in rows)))
+		finally:
+			for process in processes.values():
+				__class__._StopRaceWorker(process)
+		if self.fitnessCache:
+			self.fitnessCache.save()
+		table				= DataFrame(rows, columns=__class__.ISLAND_COLUMNS)
+		self.islandResults	= table
+		ranked				= sorted(best.values(), key=lambda agent: agent.target.fitness, reverse=self.minMax != "min")
+		self.lastResult		= ranked[0] if ranked else False
+		return self.lastResult, table
+	##
+	# Run every live island to its next migration (Internal)
+	#
+	# Workers are started on their first leg. At most workers run at once.
+	#
+	# params:
+	#	commands:	{int island: (int epochs, [(solution, Target)] immigrants)}
+	#	migrants:	int emigrants each island replies with
+	#
+	# output:	{int island: [(solution, Target)]} emigrants of the islands that ran
+	##
+	def _islandLeg(self, commands, processes, rows, best, workers, migrants, seed):
+		pending		= list(commands)
+		running		= {}	# island: Connection
+		emigrants	= {}
+		while pending or running:
+			while pending and len(running) < workers:
+				island	= pending.pop(0)
+				if island not in processes:
+					connection, workerConnection	= Pipe()
+					process							= Process(
+						target=	__class__._IslandWorker,
+						args=	(self, island, __class__.BarrageSeed(seed, "island%d" %(island)), migrants, workerConnection),
+						daemon=	True
+					)
+					process.start()
+					workerConnection.close()
+					processes[island]	= (process, connection)
+				processes[island][1].send(commands[island])
+				running[island]	= processes[island][1]
+			wait(list(running.values()) + [processes[island][0].sentinel for island in running])
+			for island, connection in list(running.items()):
+				process	= processes[island][0]
+				if connection.poll():
+					try:
+						row, agent, leaving, scores	= connection.recv()
+						if self.fitnessCache:
+							self.fitnessCache.update(scores)
+						if agent is not None:
+							best[island]		= agent
+							emigrants[island]	= leaving
+					except EOFError:
+						row	= dict(rows[island], failure="worker exited with code %s" %(process.exitcode))
+				elif not process.is_alive():
+					row	= dict(rows[island], failure="worker exited with code %s" %(process.exitcode))
+				else:
+					continue
+				rows[island]	= row
+				del running[island]
+		return emigrants
+	##
+	# Island worker: Keeps one island's solver between migrations (Internal)
+	#
+	# Receives (epochs, immigrants) per leg and replies with its IslandRow, global best
+	# Agent, emigrants and new fitness cache scores. None ends it.
+	##
+	@staticmethod
+	def _IslandWorker(optimiser, island, seed, migrants, connection):
+		if optimiser.fitnessCache:
+			optimiser.fitnessCache.path	= None
+			optimiser.fitnessCache.drain()
+		optimiser.checkpointPath	= None
+		runtime		= 0.0
+		immigrants	= 0
+		begun		= False
+		try:
+			while True:
+				command	= connection.recv()
+				if command is None:
+					break
+				epochs, arrivals	= command
+				started	= perf_counter()
+				agent, leaving		= None, []
+				try:
+					if not begun:
+						optimiser.beginSolve(seed)
+						begun	= True
+					immigrants	+= __class__.Immigrate(optimiser.solver, arrivals)
+					optimiser.continueSolve(epochs)
+					solver		= optimiser.solver
+					runtime		+= perf_counter() - started
+					agent		= solver.g_best
+					leaving		= [(emigrant.solution, emigrant.target) for emigrant in
+						solver.get_sorted_population(solver.pop, solver.problem.minmax)[:migrants]]
+					row			= __class__.IslandRow(
+						island,
+						fitness=		agent.target.fitness,
+						epochs=			optimiser.solverEpoch,
+						evaluations=	solver.nfe_counter,
+						immigrants=		immigrants,
+						runtime=		runtime,
+						curve=			list(solver.history.list_global_best_fit)
+					)
+				except Exception as e:
+					row	= __class__.IslandRow(island, immigrants=immigrants, runtime=runtime + perf_counter() - started, failure=repr(e))
+				connection.send((row, agent, leaving, optimiser.fitnessCache.drain() if optimiser.fitnessCache else {}))
+				if row["failure"]:
+					break
+		except EOFError:
+			pass
+		finally:
+			connection.close()
+	##
+	# Put immigrants in place of a solver's worst agents, keeping their known targets
+	#
+	# Agents are made with the algorithm's generate_agent, so per-agent state like PSO's
+	# local best starts from the immigrant. get_target answers with the known target
+	# meanwhile: Immigrants aren't scored or counted again.
+	#
+	# params:
+	#	immigrants:	[(solution, Target)]
+	#
+	# output:	int agents replaced
+	##
+	@staticmethod
+	def Immigrate(solver, immigrants):
+		immigrants	= immigrants[:len(solver.pop)]
+		if not immigrants:
+			return 0
+		fitness	= array([agent.target.fitness for agent in solver.pop])
+		worst	= argsort(fitness)[::-1] if solver.problem.minmax == "min" else argsort(fitness)
+		for index, (solution, target) in zip(worst, immigrants):
+			solver.get_target	= partial(__class__._KnownTarget, target)
+			try:
+				solver.pop[index]	= solver.generate_agent(solution.copy())
+			finally:
+				del solver.get_target
+		population, solver.g_best	= solver.update_global_best_agent(solver.pop, save=False)
+		if solver.sort_flag:
+			solver.pop	= population
+		return len(immigrants)
+	##
+	# get_target stand-in for an agent whose target is already known (Internal)
+	##
+	@staticmethod
+	def _KnownTarget(target, solution, counted=True):
+		return target.copy()
+	##
+	# Make an islands results row
+	##
+	@staticmethod
+	def IslandRow(island, fitness=None, epochs=None, evaluations=None, immigrants=None, runtime=None, failure=None, curve=None):
+		return {
+			"island":		island,
+			"fitness":		fitness,
+			"epochs":		epochs,
+			"evaluations":	evaluations,
+			"immigrants":	immigrants,
+			"runtime":		runtime,
+			"failure":		failure,
+			"curve":		curve or []
+		}
 	################################################
 	# Class and static stuff
 	################################################
+	##
+	# Load the algorithm index (Final)
+	#
+	# CONSTRCUTORS is a MealPyAlgorithmRegistry: The name -> module index is cached on disk
+	# per mealpy version and classes are imported on first lookup. Configure skipped
+	# algorithms with CONSTRCUTORS.exclude(name) / CONSTRCUTORS.include(name).
+	##
 	@staticmethod
 	def MapConstructors():
-		# Only load once
-		if not __class__.CONSTRCUTORS:
-			# Dynamically import the target package
-			package = import_module("mealpy")
-			# Walk through all modules and submodules in the package
-			for _, module_name, _ in walk_packages(package.__path__, "mealpy" + '.'):
-				# Import the module
-				module = import_module(module_name)
-				# Inspect the module for classes
-				for attribute_name in dir(module):
-					attribute = getattr(module, attribute_name)
-					if isinstance(attribute, type) and "_based" in str(attribute.__module__):
-						__class__.CONSTRCUTORS[attribute.__name__] = attribute
-			# Remvoe QTable and broken algorithms
-			del __class__.CONSTRCUTORS["WMQIMRFO"]		# Never worked with anything I've tested
-			del __class__.CONSTRCUTORS["OriginalICA"]	# Suuuuuppppppeeerrr slow or doesn't converge. Either way
-			del __class__.CONSTRCUTORS["QTable"]		# Not an algorithm
-		
\ No newline at end of file
+		__class__.CONSTRCUTORS.load()
\ No newline at end of file
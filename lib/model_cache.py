@@ -0,0 +1,134 @@
+### Includes ###
+## Native
+from hashlib		import blake2b
+from os				import getpid, listdir, makedirs, remove, replace, stat, utime
+from os.path		import expanduser, isfile, join
+from pickle			import dump, load, HIGHEST_PROTOCOL
+from numpy			import asarray
+## Project
+
+##
+# Model cache: Content-addressed store of trained estimators' models on disk
+#
+# An entry is keyed by a hash of everything training depends on: The estimator class,
+# a fingerprint of the data's content, the train/test split, the preprocessing
+# flags and settings, and allParams plus the training budget (see EstimatorBase.modelCacheState).
+# It holds the trained model with the scaler and normaliser fitted alongside it.
+#
+# Estimators with estimator.modelCache set load a hit in train() instead of training,
+# so the same configuration on the same data is trained once, across runs and tuning
+# revisits. Entries are pickles: Only point it at a directory you trust.
+#
+# When the entries outgrow maxBytes, the least recently used are deleted.
+##
+class ModelCache():
+	SUFFIX	= ".model"
+	##
+	# params:
+	#	path:		string cache directory. Created if missing
+	#	maxBytes:	int total entry size kept. Least recently used are deleted first
+	##
+	def __init__(self, path, maxBytes=2 * 1024 ** 3):
+		self.path		= expanduser(path)	# string cache directory
+		self.maxBytes	= maxBytes		# int max total size of entries
+		self.hits		= 0				# int train() calls answered from the cache
+		self.misses		= 0				# int train() calls that trained and saved
+	##
+	# Cache key of an estimator's current configuration
+	#
+	# output:	string hex digest
+	##
+	def key(self, estimator):
+		digest	= blake2b(digest_size=20)
+		digest.update(repr(estimator.modelCacheState).encode())
+		return digest.hexdigest()
+	##
+	# Entry path for a key
+	##
+	def entryPath(self, key):
+		return join(self.path, key + self.SUFFIX)
+	##
+	# Get an entry
+	#
+	# output:	dict {"model", "scaler", "normaliser"} or None
+	##
+	def get(self, key):
+		path	= self.entryPath(key)
+		try:
+			with open(path, "rb") as file:
+				entry	= load(file)
+			# mtime is the LRU clock
+			utime(path)
+		except (OSError, EOFError, ValueError, AttributeError, ImportError):
+			self.misses	+= 1
+			return None
+		self.hits	+= 1
+		return entry
+	##
+	# Store an entry and evict down to maxBytes
+	##
+	def put(self, key, model, scaler=False, normaliser=False):
+		makedirs(self.path, exist_ok=True)
+		path			= self.entryPath(key)
+		temporaryPath	= "%s.%d.tmp" %(path, getpid())
+		with open(temporaryPath, "wb") as file:
+			dump({"model": model, "scaler": scaler, "normaliser": normaliser}, file, protocol=HIGHEST_PROTOCOL)
+		replace(temporaryPath, path)
+		self.evict()
+	##
+	# Delete least recently used entries until the total is within maxBytes
+	##
+	def evict(self):
+		entries	= self.entries
+		total	= sum(size for _, size, _ in entries)
+		for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+			if total <= self.maxBytes:
+				break
+			try:
+				remove(path)
+			except OSError:
+				pass
+			total	-= size
+	##
+	# Every entry: [(string path, int bytes, int mtime ns)]
+	##
+	@property
+	def entries(self):
+		entries	= []
+		try:
+			names	= listdir(self.path)
+		except OSError:
+			return entries
+		for name in names:
+			path	= join(self.path, name)
+			if name.endswith(self.SUFFIX) and isfile(path):
+				status	= stat(path)
+				entries.append((path, status.st_size, status.st_mtime_ns))
+		return entries
+	##
+	# Total size of the entries in bytes
+	##
+	@property
+	def size(self):
+		return sum(size for _, size, _ in self.entries)
+	##
+	# Hit and miss counters
+	##
+	@property
+	def stats(self):
+		return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries), "bytes": self.size}
+	##
+	# Delete every entry and reset the counters
+	##
+	def clear(self):
+		for path, _, _ in self.entries:
+			remove(path)
+		self.hits	= 0
+		self.misses	= 0
+	##
+	# Content hash of a fold's index arrays, for the split part of a key
+	##
+	@staticmethod
+	def ArrayFingerprint(array):
+		array	= asarray(array)
+		return blake2b(memoryview(array.astype("int64")).cast("B"), digest_size=20).hexdigest()
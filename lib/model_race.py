@@ -0,0 +1,286 @@
+### Includes ###
+## Native
+from multiprocessing				import Pipe, Process, cpu_count
+from multiprocessing.connection		import wait
+from multiprocessing.shared_memory	import SharedMemory
+from statistics						import median
+from time							import perf_counter
+from hyperopt						import space_eval
+from numpy							import ndarray
+from pandas							import DataFrame
+from threadpoolctl					import threadpool_limits
+## Project
+from lib.hyperopt_hp_tuner_base		import HyperoptHpTunerBase
+from lib.preprocessing_pipeline		import FixedPipeline
+
+##
+# Model race: Train and score several estimator classes on one dataset at once
+#
+# The train/test split is made once, and preprocessed once per distinct scaler/normaliser
+# setup (e.g. MLPEstimator and SVREstimator share theirs). The arrays go into shared
+# memory, so each worker process maps them instead of receiving a pickled copy.
+#
+# Each estimator trains in its own process, at most workers at a time. Estimators with
+# a tuning budget are tuned over their HYPEROPT_HP_TUNER_PARAMS first, then trained with
+# the best parameters. Workers still running when timeBudget is up are terminated.
+#
+# Usage:	race	= ModelRace(data, "target", [XGBoostEstimator, (GBDTEstimator, 20), MLPEstimator], timeBudget=600)
+#			race.run()	-> leaderboard DataFrame of LEADERBOARD_COLUMNS, best first
+##
+class ModelRace():
+	LEADERBOARD_COLUMNS	= ["estimator", "score", "r2", "rmse", "mae", "trainTime", "predictLatencyMs",
+		"predictRowsPerSecond", "trials", "runtime", "failure"]
+	LATENCY_CALLS		= 50		# int single-row predict() calls timed for predictLatencyMs
+	##
+	# params:
+	#	data:				DataFrame with the features and target
+	#	target:				string target column
+	#	estimators:			EstimatorBase classes, or (class, int tuning trials) tuples
+	#	trainTestSplit:		float 0 < x < 1 training share of the rows
+	#	metric:				string test() score to rank on: rmse, mae or r2
+	#	timeBudget:			float wall-clock seconds for the whole race. None for no limit
+	#	workers:			int estimators training at once. None for one per CPU
+	#	threadsPerWorker:	int BLAS/OpenMP threads per worker. None for CPUs / workers
+	#	keepModels:			bool bring each trained estimator's servingCopy() back to self.models
+	##
+	def __init__(self, data, target, estimators, trainTestSplit=0.5, metric="rmse", timeBudget=None,
+			workers=None, threadsPerWorker=None, keepModels=True):
+		self.data				= data				# DataFrame features and target
+		self.target				= target			# string target column
+		self.estimators			= [estimator if isinstance(estimator, tuple) else (estimator, 0) for estimator in estimators]	# [(class, int trials)]
+		self.trainTestSplit		= trainTestSplit	# float training share
+		self.metric				= metric			# string rmse, mae or r2
+		self.timeBudget			= timeBudget		# float seconds or None
+		self.workers			= workers			# int concurrent processes or None
+		self.threadsPerWorker	= threadsPerWorker	# int threads per worker or None
+		self.keepModels			= keepModels		# bool keep servingCopy()s
+		self.leaderboard		= False				# DataFrame of the last run()
+		self.models				= {}				# string class name: trained servingCopy()
+	##
+	# Race the estimators
+	#
+	# output:	DataFrame of LEADERBOARD_COLUMNS, best score first. Failures last
+	##
+	def run(self):
+		started		= perf_counter()
+		blocks		= []
+		rows		= []
+		workers		= max(1, min(self.workers or cpu_count(), len(self.estimators)))
+		threads		= self.threadsPerWorker or max(1, (cpu_count() or 1) // workers)
+		try:
+			jobs	= self.sharedSplits(blocks)
+			pending	= list(range(len(self.estimators)))
+			running	= {}	# index: (Process, Connection, float start time)
+			while pending or running:
+				remaining	= None if self.timeBudget is None else self.timeBudget - (perf_counter() - started)
+				while pending and len(running) < workers:
+					index				= pending.pop(0)
+					name				= self.estimators[index][0].__name__
+					if remaining is not None and remaining <= 0:
+						rows.append(__class__.LeaderboardRow(name, failure="time budget spent before it started"))
+						continue
+					receiver, sender	= Pipe(duplex=False)
+					process				= Process(
+						target=	__class__._RaceWorker,
+						args=	(jobs[index], self.metric, remaining, threads, self.keepModels, sender),
+						daemon=	True
+					)
+					process.start()
+					sender.close()
+					running[index]	= (process, receiver, perf_counter())
+				if not running:
+					break
+				# Workers get a little grace to send their results after the budget
+				timeout	= None if remaining is None else max(0, remaining) + max(1.0, 0.05 * self.timeBudget)
+				wait([receiver for _, receiver, _ in running.values()] + [process.sentinel for process, _, _ in running.values()], timeout)
+				for index, (process, receiver, workerStarted) in list(running.items()):
+					name	= self.estimators[index][0].__name__
+					row		= False
+					if receiver.poll():
+						try:
+							row, model	= receiver.recv()
+							if model is not None:
+								self.models[name]	= model
+						except EOFError:
+							row	= False
+					if not row and process.is_alive():
+						if self.timeBudget is None or perf_counter() - started < self.timeBudget + max(1.0, 0.05 * self.timeBudget):
+							continue
+						process.terminate()
+						row	= __class__.LeaderboardRow(name, runtime=perf_counter() - workerStarted, failure="terminated at the time budget")
+					elif not row:
+						row	= __class__.LeaderboardRow(name, runtime=perf_counter() - workerStarted,
+							failure="worker exited with code %s" %(process.exitcode))
+					process.join()
+					receiver.close()
+					del running[index]
+					rows.append(row)
+		finally:
+			for block in blocks:
+				block.close()
+				block.unlink()
+		self.leaderboard	= DataFrame(rows, columns=__class__.LEADERBOARD_COLUMNS).sort_values(
+			"score", ascending=self.metric != "r2", na_position="last", kind="stable").reset_index(drop=True)
+		return self.leaderboard
+	##
+	# Split and preprocess once per preprocessing setup, into shared memory
+	#
+	# params:
+	#	blocks:	list the SharedMemory blocks are added to, for run() to unlink
+	#
+	# output:	per estimator, the job its worker needs: (class, int trials, dict shared split)
+	##
+	def sharedSplits(self, blocks):
+		splits	= {}	# preprocessing key: dict shared split
+		targets	= False
+		jobs	= []
+		for estimatorClass, trials in self.estimators:
+			estimator	= estimatorClass(self.data, self.target, trainTestSplit=self.trainTestSplit)
+			key			= __class__.PreprocessingKey(estimator)
+			if key not in splits:
+				pipeline	= estimator.pipeline.refresh()
+				if targets is False:
+					targets	= [__class__.Share(array, blocks) for array in (pipeline.trainingTargets, pipeline.testTargets)]
+				splits[key]	= {
+					"featureNames":	pipeline.featureNames,
+					"target":		self.target,
+					"arrays":		[__class__.Share(pipeline.trainingInputs, blocks), targets[0], __class__.Share(pipeline.testInputs, blocks), targets[1]],
+					"scaler":		pipeline.scaler,
+					"normaliser":	pipeline.normaliser,
+					"fingerprint":	pipeline.fingerprint
+				}
+			jobs.append((estimatorClass, trials, self.trainTestSplit, splits[key]))
+		return jobs
+	##
+	# What an estimator's preprocessed inputs depend on
+	##
+	@staticmethod
+	def PreprocessingKey(estimator):
+		return repr([(type(preprocessor).__name__, sorted(preprocessor.get_params().items())) if apply and preprocessor else None
+			for apply, preprocessor in ((estimator.applyScaler, estimator.scaler), (estimator.applyNormaliser, estimator.normaliser))])
+	##
+	# Copy an array into a new SharedMemory block
+	#
+	# output:	(string block name, tuple shape, string dtype) for Attach()
+	##
+	@staticmethod
+	def Share(array, blocks):
+		block	= SharedMemory(create=True, size=max(1, array.nbytes))
+		blocks.append(block)
+		ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...]	= array
+		return (block.name, array.shape, array.dtype.str)
+	##
+	# Map a Share()d array. Keep the returned block open while the array is used
+	#
+	# output:	(SharedMemory, ndarray)
+	##
+	@staticmethod
+	def Attach(shared):
+		name, shape, dtype	= shared
+		block				= SharedMemory(name=name)
+		return block, ndarray(shape, dtype=dtype, buffer=block.buf)
+	##
+	# Train, tune and score one estimator in a worker process (Internal)
+	##
+	@staticmethod
+	def _RaceWorker(job, metric, seconds, threads, keepModel, connection):
+		started								= perf_counter()
+		estimatorClass, trials, split, shared	= job
+		name								= estimatorClass.__name__
+		blocks								= []
+		model								= None
+		try:
+			threadpool_limits(limits=threads)
+			arrays		= []
+			for array in shared["arrays"]:
+				block, array	= __class__.Attach(array)
+				blocks.append(block)
+				arrays.append(array)
+			estimator	= estimatorClass(DataFrame(columns=shared["featureNames"] + [shared["target"]]), shared["target"], trainTestSplit=split)
+			estimator.pipeline	= FixedPipeline(estimator, shared["featureNames"], arrays, shared["scaler"], shared["normaliser"], shared["fingerprint"])
+			deadline	= None if seconds is None else started + seconds
+			tuner		= False
+			if trials and estimatorClass.HYPEROPT_HP_TUNER_PARAMS:
+				tuner			= RaceTuner(estimator, iterations=trials, parameters=dict(estimatorClass.HYPEROPT_HP_TUNER_PARAMS))
+				tuner.metric	= metric
+				tuner.deadline	= deadline
+				tuner.tune()
+			if tuner and tuner.bestModel:
+				# The best trial's model was trained on this split: Keep it rather than train again
+				for key, value in space_eval(tuner.parameters, tuner.best).items():
+					setattr(estimator, key, HyperoptHpTunerBase.CastValueToExpceted(value))
+				estimator.model	= tuner.bestModel
+				trainTime		= tuner.bestTrainTime
+				trials			= len(tuner.trials.trials) - tuner.skipped
+			else:
+				trainStarted	= perf_counter()
+				estimator.train()
+				trainTime		= perf_counter() - trainStarted
+				trials			= 0
+			scores			= estimator.test()
+			predictStarted	= perf_counter()
+			estimator.predict(estimator.testInputs)
+			rowsPerSecond	= len(estimator.testInputs) / max(perf_counter() - predictStarted, 1e-9)
+			latencies		= []
+			row				= estimator.testInputs[:1]
+			for _ in range(__class__.LATENCY_CALLS):
+				callStarted	= perf_counter()
+				estimator.predict(row)
+				latencies.append(perf_counter() - callStarted)
+			result	= __class__.LeaderboardRow(name, scores[metric], scores, trainTime, median(latencies) * 1000, rowsPerSecond,
+				trials, perf_counter() - started)
+			if keepModel:
+				model	= estimator.servingCopy()
+		except Exception as e:
+			result	= __class__.LeaderboardRow(name, runtime=perf_counter() - started, failure=repr(e))
+		try:
+			connection.send((result, model))
+		finally:
+			connection.close()
+			for block in blocks:
+				block.close()
+	##
+	# Make a leaderboard row
+	##
+	@staticmethod
+	def LeaderboardRow(name, score=None, scores=False, trainTime=None, predictLatencyMs=None, predictRowsPerSecond=None,
+			trials=None, runtime=None, failure=None):
+		return {
+			"estimator":			name,
+			"score":				score,
+			"r2":					scores["r2"] if scores else None,
+			"rmse":					scores["rmse"] if scores else None,
+			"mae":					scores["mae"] if scores else None,
+			"trainTime":			trainTime,
+			"predictLatencyMs":		predictLatencyMs,
+			"predictRowsPerSecond":	predictRowsPerSecond,
+			"trials":				trials,
+			"runtime":				runtime,
+			"failure":				failure
+		}
+##
+# Race tuner: Scores trials on the race metric and keeps the best trial's model
+#
+# Trials that likely wouldn't finish before the deadline get an infinite loss without training.
+##
+class RaceTuner(HyperoptHpTunerBase):
+	metric			= "rmse"	# string test() score to minimise. r2 is maximised
+	deadline		= None		# float perf_counter() time the race worker has to finish by
+	longest			= 0.0		# float seconds of the slowest trial so far
+	skipped			= 0			# int trials skipped for time
+	bestLoss		= float("inf")	# float loss of the best trial so far
+	bestModel		= False		# Trained model of the best trial so far
+	bestTrainTime	= None		# float train() seconds of the best trial
+	def evaluate(self):
+		started	= perf_counter()
+		if self.deadline is not None and started + self.longest > self.deadline:
+			self.skipped	+= 1
+			return float("inf")
+		self.model.train()
+		trainTime		= perf_counter() - started
+		score			= self.model.test()[self.metric]
+		loss			= -score if self.metric == "r2" else score
+		self.longest	= max(self.longest, perf_counter() - started)
+		if loss < self.bestLoss:
+			self.bestLoss, self.bestModel, self.bestTrainTime	= loss, self.model.model, trainTime
+		return loss
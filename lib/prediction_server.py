@@ -0,0 +1,254 @@
+### Includes ###
+## Native
+from argparse		import ArgumentParser
+from asyncio		import IncompleteReadError, Queue, QueueEmpty, TimeoutError as AsyncTimeoutError
+from asyncio		import get_running_loop, run, start_server, start_unix_server, wait_for
+from collections	import deque
+from json			import dumps, loads
+from os				import replace
+from pickle			import dump, load, HIGHEST_PROTOCOL
+from time			import perf_counter
+from numpy			import array, float64, percentile, vstack
+## Project
+
+##
+# Prediction server: asyncio micro-batching HTTP front end for a trained estimator
+#
+# Concurrent requests are queued and coalesced into one predict() per batch: A batch
+# closes after latencyWindow seconds or maxBatchSize rows, whichever comes first.
+# Batches are predicted on a worker thread, so the event loop keeps accepting and
+# parsing requests meanwhile, and the next batch fills up while the model runs.
+# Rows go straight from JSON to a NumPy array and through the estimator's fitted
+# scaler/normaliser, skipping pandas and DataFrameToInputType.
+#
+# Serves on host:port, or on a Unix socket when socketPath is set. Endpoints:
+#	POST /predict	{"inputs": row, [row, ...]} rows are value lists in feature order or {feature: value} dicts
+#					-> {"predictions": [...]}. 400 for malformed inputs, 500 if the model raises
+#	GET /stats		-> throughput and latency percentiles, see stats
+#
+# Usage:	PredictionServer.Save(estimator, "model.pkl")
+#			python -m lib.prediction_server model.pkl --port 8080
+#
+# Model files are pickles: Only load ones you made.
+##
+class PredictionServer():
+	##
+	# params:
+	#	estimator:		EstimatorBase servingCopy() (or a trained estimator, which gets copied)
+	#	maxBatchSize:	int max rows per predict()
+	#	latencyWindow:	float seconds a batch waits for more requests after its first. 0 to never wait
+	#	host:			string TCP host
+	#	port:			int TCP port
+	#	socketPath:		string Unix socket path. Overrides host/port
+	#	statsWindow:	int latest requests the latency percentiles cover
+	##
+	def __init__(self, estimator, maxBatchSize=256, latencyWindow=0.001, host="127.0.0.1", port=8080,
+			  socketPath=None, statsWindow=10000):
+		if estimator.data is not None:
+			estimator	= estimator.servingCopy()
+		self.estimator		= estimator						# EstimatorBase without data
+		self.featureNames	= estimator.pipeline.featureNames	# string[] input columns in model order
+		self.maxBatchSize	= maxBatchSize					# int max rows per batch
+		self.latencyWindow	= latencyWindow					# float seconds a batch stays open
+		self.host			= host							# string TCP host
+		self.port			= port							# int TCP port
+		self.socketPath		= socketPath					# string Unix socket path or None
+		self.queue			= False							# asyncio.Queue of (inputs, future). Created by serve()
+		self.latencies		= deque(maxlen=statsWindow)		# float seconds, latest requests
+		self.requests		= 0								# int requests answered
+		self.rows			= 0								# int rows predicted
+		self.batches		= 0								# int predict() calls
+		self.started		= False							# float perf_counter() serving started at
+	##
+	# Pickle an estimator's servingCopy() for Load()
+	##
+	@staticmethod
+	def Save(estimator, path):
+		temporaryPath	= path + ".tmp"
+		with open(temporaryPath, "wb") as file:
+			dump(estimator.servingCopy(), file, protocol=HIGHEST_PROTOCOL)
+		replace(temporaryPath, path)
+	##
+	# Server for a Save()d estimator
+	##
+	@classmethod
+	def Load(cls, path, **options):
+		with open(path, "rb") as file:
+			return cls(load(file), **options)
+	##
+	# JSON rows -> 2D float array in feature order
+	##
+	def parseRows(self, rows):
+		if isinstance(rows, dict) or (rows and not isinstance(rows[0], (list, dict))):
+			rows	= [rows]
+		if not rows:
+			raise ValueError("No inputs")
+		if isinstance(rows[0], dict):
+			rows	= [[row[name] for name in self.featureNames] for row in rows]
+		inputs	= array(rows, dtype=float64)
+		if inputs.ndim != 2 or inputs.shape[1] != len(self.featureNames):
+			raise ValueError("Expected rows of %d features: %s" %(len(self.featureNames), ", ".join(self.featureNames)))
+		return inputs
+	##
+	# Model inputs -> predictions through the fitted scaler/normaliser. Never refits
+	##
+	def predictInputs(self, inputs):
+		return self.estimator.predict(self.estimator.pipeline.transform(inputs))
+	##
+	# Predict rows with the next batch. Use from the server's event loop
+	#
+	# output:	list of predictions
+	##
+	async def predict(self, rows):
+		return await self.predictArray(self.parseRows(rows))
+	##
+	# Predict a parseRows() array with the next batch
+	##
+	async def predictArray(self, inputs):
+		started	= perf_counter()
+		future	= get_running_loop().create_future()
+		self.queue.put_nowait((inputs, future))
+		predictions	= await future
+		self.latencies.append(perf_counter() - started)
+		self.requests	+= 1
+		return predictions
+	##
+	# Collect queued requests into batches and predict them
+	##
+	async def batchLoop(self):
+		loop	= get_running_loop()
+		while True:
+			batch		= [await self.queue.get()]
+			rows		= len(batch[0][0])
+			deadline	= loop.time() + self.latencyWindow
+			while rows < self.maxBatchSize:
+				try:
+					job	= self.queue.get_nowait()
+				except QueueEmpty:
+					remaining	= deadline - loop.time()
+					if remaining <= 0:
+						break
+					try:
+						job	= await wait_for(self.queue.get(), remaining)
+					except AsyncTimeoutError:
+						break
+				batch.append(job)
+				rows	+= len(job[0])
+			await self.predictBatch(batch)
+	##
+	# Predict a batch on the loop's default executor and resolve its requests' futures
+	##
+	async def predictBatch(self, batch):
+		inputs	= vstack([inputs for inputs, _ in batch]) if len(batch) > 1 else batch[0][0]
+		try:
+			predictions	= await get_running_loop().run_in_executor(None, self.predictInputs, inputs)
+		except Exception as error:
+			for _, future in batch:
+				if not future.done():
+					future.set_exception(error)
+			return
+		self.batches	+= 1
+		self.rows		+= len(predictions)
+		offset			= 0
+		for inputs, future in batch:
+			if not future.done():
+				future.set_result(predictions[offset:offset + len(inputs)].tolist())
+			offset	+= len(inputs)
+	##
+	# Throughput and latency percentiles in milliseconds over the last statsWindow requests
+	##
+	@property
+	def stats(self):
+		elapsed		= perf_counter() - self.started if self.started else 0
+		latencies	= array(self.latencies) * 1000
+		return {
+			"requests":			self.requests,
+			"rows":				self.rows,
+			"batches":			self.batches,
+			"meanBatchSize":	self.rows / self.batches if self.batches else 0,
+			"requestsPerSecond":	self.requests / elapsed if elapsed else 0,
+			"latencyMs":		{
+				"p50":	float(percentile(latencies, 50)) if len(latencies) else None,
+				"p90":	float(percentile(latencies, 90)) if len(latencies) else None,
+				"p99":	float(percentile(latencies, 99)) if len(latencies) else None,
+				"max":	float(latencies.max()) if len(latencies) else None
+			}
+		}
+	##
+	# Handle a request: (int status, dict response)
+	##
+	async def route(self, method, path, body):
+		if method == "POST" and path == "/predict":
+			try:
+				inputs	= self.parseRows(loads(body)["inputs"])
+			except (ValueError, KeyError, TypeError) as error:
+				return 400, {"error": str(error)}
+			try:
+				return 200, {"predictions": await self.predictArray(inputs)}
+			except Exception as error:
+				return 500, {"error": "%s: %s" %(type(error).__name__, error)}
+		if method == "GET" and path == "/stats":
+			return 200, self.stats
+		return 404, {"error": "Not found: %s %s" %(method, path)}
+	##
+	# Minimal HTTP/1.1 with keep-alive: One request at a time per connection
+	##
+	async def handleConnection(self, reader, writer):
+		try:
+			while True:
+				requestLine	= await reader.readline()
+				if not requestLine.strip():
+					break
+				method, path	= requestLine.decode("latin-1").split(" ")[:2]
+				headers			= {}
+				while True:
+					line	= await reader.readline()
+					if line in (b"\r\n", b"\n", b""):
+						break
+					name, _, value			= line.decode("latin-1").partition(":")
+					headers[name.strip().lower()]	= value.strip()
+				body			= await reader.readexactly(int(headers.get("content-length", 0)))
+				status, payload	= await self.route(method, path, body)
+				content			= dumps(payload).encode()
+				writer.write(b"HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s" %(
+					status, b"OK" if status == 200 else b"Error", len(content), content))
+				await writer.drain()
+				if headers.get("connection", "").lower() == "close":
+					break
+		except (ConnectionError, IncompleteReadError, ValueError):
+			pass
+		finally:
+			writer.close()
+	##
+	# Start the batcher and the HTTP server, and serve until cancelled
+	##
+	async def serve(self):
+		self.queue		= Queue()
+		self.started	= perf_counter()
+		batcher			= get_running_loop().create_task(self.batchLoop())
+		if self.socketPath:
+			server	= await start_unix_server(self.handleConnection, path=self.socketPath)
+		else:
+			server	= await start_server(self.handleConnection, self.host, self.port)
+		try:
+			async with server:
+				await server.serve_forever()
+		finally:
+			batcher.cancel()
+	##
+	# Serve from a blocking call
+	##
+	def run(self):
+		run(self.serve())
+
+if __name__ == "__main__":
+	parser	= ArgumentParser(description="Serve a PredictionServer.Save()d estimator over HTTP")
+	parser.add_argument("model", help="Pickled servingCopy() from PredictionServer.Save")
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=8080)
+	parser.add_argument("--socket", default=None, help="Unix socket path instead of host/port")
+	parser.add_argument("--max-batch", type=int, default=256)
+	parser.add_argument("--window-ms", type=float, default=1.0, help="Micro-batch latency window")
+	args	= parser.parse_args()
+	PredictionServer.Load(args.model, maxBatchSize=args.max_batch, latencyWindow=args.window_ms / 1000,
+		host=args.host, port=args.port, socketPath=args.socket).run()
@@ -0,0 +1,270 @@
+### Includes ###
+## Native
+from hashlib		import blake2b
+from numpy			import ascontiguousarray
+from pandas			import DataFrame
+## Project
+from lib.instrumentation	import INSTRUMENTATION
+
+##
+# Preprocessing pipeline: Materialised train/test split with fit-once preprocessing
+#
+# Converts the estimator's data to contiguous NumPy arrays once, splits them into
+# train/test rows, fits the scaler and normaliser on the training inputs only and
+# transforms the test inputs with them. Everything is cached until the estimator's
+# data, target, trainTestSplit, fold, scaler, normaliser or apply* flags change.
+#
+# The split is the first trainTestSplit of the rows, or estimator.fold's
+# (trainRows, testRows) index arrays when set, e.g. by cross-validation.
+#
+# The data is tracked by identity and shape, so call invalidate() after editing
+# the DataFrame in place.
+##
+class PreprocessingPipeline():
+	##
+	# params:
+	#	estimator:	EstimatorBase that owns the data and preprocessing settings
+	##
+	def __init__(self, estimator):
+		self.estimator			= estimator		# EstimatorBase the split belongs to
+		self.key				= False			# tuple of estimator state the split was built from
+		self.dataKey			= False			# tuple of estimator state inputs/targets were built from
+		self.data				= None			# DataFrame the cache was built from. Held so its id() isn't recycled
+		self.featureNames		= []			# string[] input column names in array column order
+		self._fingerprint		= False			# string content hash of inputs/targets. False until asked for
+		self.inputs				= None			# ndarray all raw inputs, every row
+		self.targets			= None			# ndarray all targets, every row
+		self.scaler				= False			# Fitted copy of estimator.scaler or False
+		self.normaliser			= False			# Fitted copy of estimator.normaliser or False
+		self._trainingInputs	= None			# ndarray preprocessed training inputs
+		self._testInputs		= None			# ndarray preprocessed test inputs
+		self._trainingTargets	= None			# ndarray training targets
+		self._testTargets		= None			# ndarray test targets
+	##
+	# Estimator state that the cached arrays depend on
+	##
+	@property
+	def stateKey(self):
+		estimator	= self.estimator
+		return self.dataStateKey + (
+			estimator.trainTestSplit,
+			id(estimator.fold),
+			bool(estimator.applyScaler and estimator.scaler),
+			bool(estimator.applyNormaliser and estimator.normaliser),
+			id(estimator.scaler),
+			id(estimator.normaliser)
+		)
+	##
+	# Estimator state the raw inputs/targets depend on
+	##
+	@property
+	def dataStateKey(self):
+		estimator	= self.estimator
+		return (id(estimator.data), estimator.data.shape, estimator.target)
+	##
+	# Is the cache out of date with the estimator?
+	##
+	@property
+	def isStale(self):
+		return self.key != self.stateKey
+	##
+	# Drop the cached arrays and fitted preprocessors. The next access rebuilds them
+	##
+	def invalidate(self):
+		self.dataKey			= False
+		self.data				= None
+		self._fingerprint		= False
+		self.inputs				= None
+		self.targets			= None
+		self.invalidateSplit()
+	##
+	# Drop the split and fitted preprocessors but keep the raw inputs/targets
+	##
+	def invalidateSplit(self):
+		self.key				= False
+		self.scaler				= False
+		self.normaliser			= False
+		self._trainingInputs	= None
+		self._testInputs		= None
+		self._trainingTargets	= None
+		self._testTargets		= None
+	##
+	# Rebuild the split and refit the preprocessors if the estimator changed
+	##
+	def refresh(self):
+		if self.isStale:
+			self.build()
+		return self
+	##
+	# Convert the data to raw input/target arrays, once per DataFrame
+	##
+	def refreshData(self):
+		if self.dataKey != self.dataStateKey:
+			estimator			= self.estimator
+			data				= estimator.data
+			self.featureNames	= [column for column in data.columns if column != estimator.target]
+			self.inputs			= ascontiguousarray(data[self.featureNames].to_numpy())
+			self.targets		= ascontiguousarray(data[estimator.target].to_numpy())
+			self.data			= data
+			self.dataKey		= self.dataStateKey
+			self._fingerprint	= False
+		return self
+	##
+	# Content hash of the raw inputs and targets, column names and dtypes included
+	#
+	# Identifies the data across runs and copies, unlike dataKey. Computed once per DataFrame.
+	##
+	@property
+	def fingerprint(self):
+		self.refreshData()
+		if self._fingerprint is False:
+			digest	= blake2b(digest_size=20)
+			digest.update(repr((self.featureNames, self.estimator.target, self.inputs.shape,
+				str(self.inputs.dtype), str(self.targets.dtype))).encode())
+			digest.update(memoryview(self.inputs).cast("B"))
+			digest.update(memoryview(self.targets).cast("B"))
+			self._fingerprint	= digest.hexdigest()
+		return self._fingerprint
+	##
+	# Training and test rows: estimator.fold's index arrays, or slices for trainTestSplit
+	#
+	# output:	(trainRows, testRows) slices or index arrays
+	##
+	@property
+	def rows(self):
+		if self.estimator.fold is not False:
+			return self.estimator.fold
+		splitIndex	= int(len(self.refreshData().inputs) * self.estimator.trainTestSplit)
+		return slice(0, splitIndex), slice(splitIndex, None)
+	##
+	# Build the split: Select rows once, fit on training inputs, transform test inputs
+	#
+	# Slices of the C-contiguous raw arrays are views, so trainTestSplit splits don't copy.
+	#
+	# params:
+	#	fitted:	(scaler, normaliser) already fitted on this split, e.g. from a ModelCache hit,
+	#			to transform with instead of fitting. False for either if unused. None to fit
+	##
+	def build(self, fitted=None):
+		with INSTRUMENTATION.span("pipeline.build"):
+			self.invalidateSplit()
+			self.refreshData()
+			trainRows, testRows		= self.rows
+			self._trainingTargets	= ascontiguousarray(self.targets[trainRows])
+			self._testTargets		= ascontiguousarray(self.targets[testRows])
+			if fitted is None:
+				self._trainingInputs	= self.fit(ascontiguousarray(self.inputs[trainRows]))
+			else:
+				self.scaler, self.normaliser	= fitted
+				self._trainingInputs			= ascontiguousarray(self.transform(ascontiguousarray(self.inputs[trainRows])))
+			self._testInputs		= self.transform(ascontiguousarray(self.inputs[testRows]))
+			self.key				= self.stateKey
+	##
+	# Pipeline for a copy of the estimator: Shares the raw arrays, not the split
+	##
+	def copyFor(self, estimator):
+		pipeline				= __class__(estimator)
+		pipeline.dataKey		= self.dataKey
+		pipeline.data			= self.data
+		pipeline.featureNames	= self.featureNames
+		pipeline._fingerprint	= self._fingerprint
+		pipeline.inputs			= self.inputs
+		pipeline.targets		= self.targets
+		return pipeline
+	##
+	# Fit copies of the estimator's scaler and normaliser
+	#
+	# Copies are fitted so the (often shared default) instances passed to the
+	# estimator are never mutated.
+	#
+	# output:	ndarray of the transformed training inputs
+	##
+	def fit(self, inputs):
+		from sklearn.base	import clone
+		estimator	= self.estimator
+		if estimator.applyScaler and estimator.scaler:
+			self.scaler		= clone(estimator.scaler)
+			inputs			= self.scaler.fit_transform(inputs)
+		if estimator.applyNormaliser and estimator.normaliser:
+			self.normaliser	= clone(estimator.normaliser)
+			inputs			= self.normaliser.fit_transform(inputs)
+		return ascontiguousarray(inputs)
+	##
+	# Apply the fitted scaler and normaliser. Never refits
+	#
+	# params:
+	#	inputs:	DataFrame or 2D array of input features
+	#
+	# output:	ndarray of transformed inputs
+	##
+	def transform(self, inputs):
+		inputs	= self.toArray(inputs)
+		if self.scaler:
+			inputs	= self.scaler.transform(inputs)
+		if self.normaliser:
+			inputs	= self.normaliser.transform(inputs)
+		return inputs
+	##
+	# Convert a DataFrame to a contiguous input array of the training columns, in training order
+	##
+	def toArray(self, inputs):
+		if isinstance(inputs, DataFrame):
+			return __class__.FeatureArray(inputs, self.refreshData().featureNames)
+		return ascontiguousarray(inputs)
+	##
+	# A DataFrame's featureNames columns as a contiguous array. Extra columns, like the target, are ignored
+	#
+	# Columns are picked by name, so a frame with its columns in another order predicts the same.
+	# Raises ValueError if one is missing.
+	##
+	@staticmethod
+	def FeatureArray(inputs, featureNames):
+		missing	= [name for name in featureNames if name not in inputs.columns]
+		if missing:
+			raise ValueError("Inputs are missing training column(s): %s" %(", ".join(map(str, missing))))
+		return ascontiguousarray(inputs[featureNames].to_numpy())
+	#################
+	# Cached arrays #
+	#################
+	@property
+	def trainingInputs(self):
+		return self.refresh()._trainingInputs
+	@property
+	def testInputs(self):
+		return self.refresh()._testInputs
+	@property
+	def trainingTargets(self):
+		return self.refresh()._trainingTargets
+	@property
+	def testTargets(self):
+		return self.refresh()._testTargets
+##
+# Fixed pipeline: A split and fitted preprocessing built elsewhere, e.g. arrays in shared memory
+#
+# Never rebuilt from the estimator, so the estimator needs no data. Used by ModelRace
+# workers to train on arrays the parent process preprocessed once, and by servingCopy()s,
+# whose split is empty.
+##
+class FixedPipeline(PreprocessingPipeline):
+	##
+	# params:
+	#	estimator:		EstimatorBase the split belongs to
+	#	featureNames:	string[] input column names in array column order
+	#	split:			(trainingInputs, trainingTargets, testInputs, testTargets) preprocessed arrays
+	#	scaler:			fitted scaler the inputs went through, or False
+	#	normaliser:		fitted normaliser the inputs went through, or False
+	#	fingerprint:	string the source data's fingerprint, so ModelCache keys match. False for none
+	##
+	def __init__(self, estimator, featureNames, split, scaler=False, normaliser=False, fingerprint=False):
+		super().__init__(estimator)
+		self.featureNames		= featureNames
+		self.scaler				= scaler
+		self.normaliser			= normaliser
+		self._trainingInputs, self._trainingTargets, self._testInputs, self._testTargets	= split
+		self.key				= ("fixed", id(self))
+		self._fingerprint		= fingerprint or "fixed%d" %(id(self))
+	@property
+	def isStale(self):
+		return False
+	def refreshData(self):
+		return self
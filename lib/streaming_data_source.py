@@ -0,0 +1,195 @@
+### Includes ###
+## Native
+from os				import stat
+from os.path		import abspath
+from numpy			import arange, ascontiguousarray, float64
+from pandas			import read_csv
+from pandas.util	import hash_pandas_object
+## Project
+from lib.csv_loader	import CsvLoader
+
+##
+# Streaming data source: A CSV or Parquet file read in batches, for data that doesn't fit in RAM
+#
+# Pass one to an estimator in place of the DataFrame (see EstimatorBase.QuickStream).
+# Estimators read it batch by batch and only the current batch is in memory.
+#
+# The train/test split is a rule on rows, so it needs no index of the file:
+#	range:	the first trainTestSplit of the rows train, the rest test. Matches in-memory estimators
+#	hash:	a row trains when its content hash falls below trainTestSplit. Independent of row order
+#
+# Scalers and normalisers aren't applied to streamed inputs.
+##
+class StreamingDataSource():
+	RANGE_SPLIT		= "range"
+	HASH_SPLIT		= "hash"
+	HASH_BUCKETS	= 1000000
+	##
+	# params:
+	#	path:		string .csv or .parquet path
+	#	batchSize:	int rows per batch
+	#	columns:	string[] columns to read. None for all. Must include the target
+	#	splitRule:	string RANGE_SPLIT or HASH_SPLIT
+	#	hashSeed:	int seed for HASH_SPLIT. Change it for a different split
+	#	downcast:	bool float -> float32, int -> smallest int per batch
+	##
+	def __init__(self, path, batchSize=100000, columns=None, splitRule=RANGE_SPLIT, hashSeed=0, downcast=True):
+		self.path		= path			# string file path
+		self.batchSize	= batchSize		# int rows per batch
+		self.columns	= columns		# string[] or None
+		self.splitRule	= splitRule		# string range or hash
+		self.hashSeed	= hashSeed		# int HASH_SPLIT seed
+		self.downcast	= downcast		# bool downcast batches
+		self._rowCount	= False			# int rows in the file. False until counted
+		self._header	= False			# string[] column names. False until read
+	##
+	# Is the file Parquet rather than CSV?
+	##
+	@property
+	def isParquet(self):
+		return self.path.endswith((".parquet", ".pq"))
+	##
+	# Column names in file order, restricted to columns if set
+	##
+	@property
+	def header(self):
+		if self._header is False:
+			if self.isParquet:
+				from pyarrow.parquet import ParquetFile
+				names	= ParquetFile(self.path).schema_arrow.names
+			else:
+				names	= list(read_csv(self.path, nrows=0).columns)
+			self._header	= [name for name in names if self.columns is None or name in self.columns]
+		return self._header
+	##
+	# Input column names for a target, in array column order
+	##
+	def featureNames(self, target):
+		return [column for column in self.header if column != target]
+	##
+	# Rows in the file. Counted with one pass over a single column, then remembered
+	##
+	@property
+	def rowCount(self):
+		if self._rowCount is False:
+			if self.isParquet:
+				from pyarrow.parquet import ParquetFile
+				self._rowCount	= ParquetFile(self.path).metadata.num_rows
+			else:
+				self._rowCount	= sum(len(chunk) for chunk in read_csv(self.path, usecols=[0], chunksize=self.batchSize))
+		return self._rowCount
+	##
+	# Identifies the file's content across runs: Path, size, mtime and how it's read
+	##
+	@property
+	def fingerprint(self):
+		status	= stat(self.path)
+		return (abspath(self.path), status.st_size, status.st_mtime_ns, tuple(self.header), self.batchSize, self.downcast)
+	##
+	# What a split of this source depends on. Used as the split key by estimators
+	##
+	def key(self, target, trainTestSplit):
+		return (id(self), self.path, tuple(self.header), target, trainTestSplit, self.splitRule, self.hashSeed)
+	##
+	# Raw batches
+	#
+	# output:	generator of (int first row number, DataFrame)
+	##
+	def batches(self):
+		loader		= CsvLoader(self.path, columns=self.columns, downcast=self.downcast, cache=False)
+		startRow	= 0
+		if self.isParquet:
+			from pyarrow.parquet import ParquetFile
+			reader	= (batch.to_pandas() for batch in ParquetFile(self.path).iter_batches(batch_size=self.batchSize, columns=self.columns))
+		else:
+			reader	= read_csv(self.path, usecols=self.columns, chunksize=self.batchSize)
+		for batch in reader:
+			yield startRow, loader.downcastFrame(batch)
+			startRow	+= len(batch)
+	##
+	# Which rows of a batch are training rows under splitRule
+	#
+	# output:	bool ndarray
+	##
+	def trainingMask(self, startRow, batch, trainTestSplit):
+		if self.splitRule == __class__.HASH_SPLIT:
+			# Hash numbers as float64 so a row hashes the same whatever its batch was downcast to
+			numeric	= batch.select_dtypes("number").columns
+			hashes	= hash_pandas_object(batch.astype(dict.fromkeys(numeric, float64)), index=False,
+				hash_key="duckula%09d" %(self.hashSeed % 10 ** 9)).to_numpy()
+			return hashes % __class__.HASH_BUCKETS < trainTestSplit * __class__.HASH_BUCKETS
+		if self.splitRule == __class__.RANGE_SPLIT:
+			splitRow	= int(self.rowCount * trainTestSplit)
+			rowNumbers	= arange(startRow, startRow + len(batch))
+			return rowNumbers < splitRow
+		raise ValueError("Unknown splitRule %s. Use %s or %s" %(self.splitRule, __class__.RANGE_SPLIT, __class__.HASH_SPLIT))
+	##
+	# Input and target arrays of the training or test rows, batch by batch
+	#
+	# With RANGE_SPLIT, reading training rows stops at the first batch past the split.
+	#
+	# params:
+	#	target:			string target column
+	#	trainTestSplit:	float 0 < x < 1 training share
+	#	training:		bool training rows if True, else test rows
+	#
+	# output:	generator of (ndarray inputs, ndarray targets). Empty batches are skipped
+	##
+	def splitBatches(self, target, trainTestSplit, training=True):
+		featureNames	= self.featureNames(target)
+		for startRow, batch in self.batches():
+			mask	= self.trainingMask(startRow, batch, trainTestSplit)
+			if not training:
+				mask	= ~mask
+			if not mask.any():
+				if training and self.splitRule == __class__.RANGE_SPLIT:
+					return
+				continue
+			batch	= batch[mask]
+			yield ascontiguousarray(batch[featureNames].to_numpy()), ascontiguousarray(batch[target].to_numpy())
+##
+# Streaming scores: rmse, mae and r2 accumulated over batches
+#
+# Argument order matches EstimatorBase.test(): sklearn's scores are called as
+# (predictions, targets), so r2 is relative to the variance of the predictions.
+# Sums are float64 and the variance is merged per batch (Chan et al.) to stay exact.
+##
+class StreamingScores():
+	def __init__(self):
+		self.count			= 0		# int rows seen
+		self.squaredError	= 0.0	# float sum (prediction - target) ^ 2
+		self.absoluteError	= 0.0	# float sum |prediction - target|
+		self.mean			= 0.0	# float running mean of predictions
+		self.sumOfSquares	= 0.0	# float running sum of squared deviations of predictions
+	##
+	# Add a batch
+	##
+	def update(self, predictions, targets):
+		predictions	= ascontiguousarray(predictions, dtype=float64).ravel()
+		errors		= predictions - ascontiguousarray(targets, dtype=float64).ravel()
+		count		= len(predictions)
+		if not count:
+			return self
+		self.squaredError	+= float((errors ** 2).sum())
+		self.absoluteError	+= float(abs(errors).sum())
+		batchMean			= float(predictions.mean())
+		batchSumOfSquares	= float(((predictions - batchMean) ** 2).sum())
+		total				= self.count + count
+		delta				= batchMean - self.mean
+		self.sumOfSquares	+= batchSumOfSquares + delta ** 2 * self.count * count / total
+		self.mean			+= delta * count / total
+		self.count			= total
+		return self
+	##
+	# Same dict as EstimatorBase.test()
+	##
+	@property
+	def scores(self):
+		if not self.count:
+			raise ValueError("No rows were scored")
+		return {
+			# sklearn's r2_score convention for constant predictions
+			"r2":	1 - self.squaredError / self.sumOfSquares if self.sumOfSquares else float(not self.squaredError),
+			"rmse":	(self.squaredError / self.count) ** 0.5,
+			"mae":	self.absoluteError / self.count
+		}
\ No newline at end of file
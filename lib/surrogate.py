@@ -0,0 +1,171 @@
+### Includes ###
+## Native
+from math			import ceil
+from numpy			import abs as npAbs, argsort, asarray, corrcoef, lexsort, maximum, minimum, sqrt, vstack
+from pandas			import DataFrame
+## Project
+
+##
+# Surrogate: A regression model of the fitness, for pre-screening MealPyOptimiserBase candidates
+#
+# Every real score() result is added to an archive of (solution, fitness) samples.
+# Once it has minSamples, each generation is screened. One of the project's estimators
+# (GBDTEstimator by default) is refitted on the archive first, whenever refitEvery new
+# samples have arrived since the last fit. The surrogate predicts every candidate, only
+# the best predicted keepFraction get a real score() and the rest are given a fitness no
+# better than the worst real one. Greedy algorithms then keep the agents they'd have
+# replaced, so unscored candidates never displace real ones or become the global best.
+# The first population is always scored for real.
+#
+# Accuracy is measured on the screened-in candidates: Predicted before their real score
+# was known, so it's out-of-sample. Single objective problems only.
+##
+class Surrogate():
+	DEFAULT_PARAMS	= {"nEstimators": 200, "minSamplesSplit": 4, "minSamplesLeaf": 2}	# GBDTEstimator settings for small archives
+	##
+	# params:
+	#	estimator:			EstimatorBase class to fit. None for GBDTEstimator
+	#	keepFraction:		float share of each generation's candidates that get a real score
+	#	minSamples:			int real evaluations before screening starts. None for the population size
+	#	refitEvery:			int new real evaluations between refits. None for every screened generation
+	#	maxSamples:			int most recent real evaluations kept in the archive
+	#	estimatorParams:	dict estimator attributes to set, e.g. {"nEstimators": 300}. None for DEFAULT_PARAMS with GBDTEstimator
+	##
+	def __init__(self, estimator=None, keepFraction=0.25, minSamples=None, refitEvery=None, maxSamples=5000,
+			  estimatorParams=None):
+		self.estimatorClass		= estimator			# EstimatorBase class. None for GBDTEstimator
+		self.keepFraction		= keepFraction		# float share of candidates scored for real
+		self.minSamples			= minSamples		# int archive size screening starts at. None for the population size
+		self.refitEvery			= refitEvery		# int new samples between refits. None for every generation
+		self.maxSamples			= maxSamples		# int archive size limit. Oldest samples go first
+		self.estimatorParams	= estimatorParams	# dict estimator attributes
+		self.estimator			= False				# Fitted EstimatorBase, or False before the first fit
+		self.problemKey			= False				# Hashable problem the archive belongs to
+		self.minMax				= "min"				# string min or max, from the problem
+		self.population			= 0					# int solver population, the minSamples default
+		self.inputs				= []				# 1D arrays of real evaluated solutions
+		self.targets			= []				# float real fitness per solution
+		self.pending			= 0					# int samples added since the last fit
+		self.clearStats()
+	##
+	# Start a solve: Keep the archive for the same problem, otherwise start over, and reset the counters
+	##
+	def attach(self, problemKey, minMax, population):
+		if self.problemKey != problemKey:
+			self.inputs, self.targets	= [], []
+			self.estimator				= False
+			self.pending				= 0
+			self.problemKey				= problemKey
+		self.minMax			= minMax
+		self.population		= population
+		self.clearStats()
+		return self
+	def clearStats(self):
+		self.realEvaluations		= 0		# int score() calls since attach()
+		self.surrogateEvaluations	= 0		# int candidates given a predicted fitness instead
+		self.refits					= 0		# int surrogate fits since attach()
+		self.predicted				= []	# float predictions of screened-in candidates
+		self.actual					= []	# float their real fitness
+	##
+	# Refit when refitEvery new samples have arrived, before screening a generation
+	#
+	# output:	bool there's a fitted surrogate to screen with
+	##
+	def refresh(self):
+		if len(self.targets) < (self.minSamples or self.population):
+			return False
+		if not self.estimator or self.pending >= (self.refitEvery or 1):
+			self.fit()
+		return True
+	##
+	# Add real evaluations to the archive
+	#
+	# params:
+	#	solutions:	2D array [candidates, dimensions]
+	#	fitnesses:	array [candidates] real fitness
+	#	predicted:	array [candidates] predictions made before scoring. None if they weren't screened
+	##
+	def add(self, solutions, fitnesses, predicted=None):
+		fitnesses	= [float(fitness) for fitness in fitnesses]
+		if not fitnesses:
+			return
+		self.inputs.extend(asarray(solution, dtype=float) for solution in solutions)
+		self.targets.extend(fitnesses)
+		if len(self.targets) > self.maxSamples:
+			del self.inputs[:-self.maxSamples]
+			del self.targets[:-self.maxSamples]
+		if predicted is not None:
+			self.predicted.extend(float(value) for value in predicted)
+			self.actual.extend(fitnesses)
+		self.realEvaluations	+= len(fitnesses)
+		self.pending			+= len(fitnesses)
+	##
+	# Fit the estimator on the archive
+	##
+	def fit(self):
+		inputs			= vstack(self.inputs)
+		data			= DataFrame(inputs, columns=["x%d" %(index) for index in range(inputs.shape[1])])
+		data["fitness"]	= self.targets
+		if not self.estimator:
+			self.estimator	= self.newEstimator(data)
+		else:
+			self.estimator.data	= data
+		self.estimator.train()
+		self.pending	= 0
+		self.refits		+= 1
+	##
+	# Make the estimator, with all rows for training
+	##
+	def newEstimator(self, data):
+		estimatorClass	= self.estimatorClass
+		params			= self.estimatorParams
+		if estimatorClass is None:
+			from lib.estimators.gbdt_estimator	import GBDTEstimator
+			estimatorClass	= GBDTEstimator
+			params			= __class__.DEFAULT_PARAMS if params is None else params
+		estimator	= estimatorClass(data, "fitness", trainTestSplit=1)
+		for key, value in (params or {}).items():
+			setattr(estimator, key, value)
+		return estimator
+	##
+	# Predicted fitness of candidates
+	##
+	def predict(self, solutions):
+		return asarray(self.estimator.predict(self.estimator.preprocessInputs(asarray(solutions, dtype=float))), dtype=float)
+	##
+	# Pick the candidates to score for real: The best predicted keepFraction
+	#
+	# params:
+	#	predicted:	array [candidates] predicted fitness
+	#	tieBreaks:	array [candidates] random numbers ordering equal predictions
+	#
+	# output:	int index array, best predicted first
+	##
+	def screen(self, predicted, tieBreaks):
+		keep	= max(1, ceil(len(predicted) * self.keepFraction))
+		order	= predicted if self.minMax == "min" else -predicted
+		return lexsort((tieBreaks, order))[:keep]
+	##
+	# Fitness for the candidates that aren't scored: Their prediction, no better than the worst real fitness
+	##
+	def screenedOut(self, predicted):
+		if self.minMax == "min":
+			return maximum(predicted, max(self.targets))
+		return minimum(predicted, min(self.targets))
+	##
+	# Counters and out-of-sample accuracy since attach()
+	#
+	# output:	dict realEvaluations, surrogateEvaluations, refits, samples and, once
+	#			candidates have been screened, rmse, mae and rankCorrelation (Spearman)
+	##
+	@property
+	def stats(self):
+		stats	= {"realEvaluations": self.realEvaluations, "surrogateEvaluations": self.surrogateEvaluations,
+			"refits": self.refits, "samples": len(self.targets), "rmse": None, "mae": None, "rankCorrelation": None}
+		if self.actual:
+			predicted, actual	= asarray(self.predicted), asarray(self.actual)
+			stats["rmse"]		= float(sqrt(((predicted - actual) ** 2).mean()))
+			stats["mae"]		= float(npAbs(predicted - actual).mean())
+			if len(actual) > 1 and predicted.std() and actual.std():
+				stats["rankCorrelation"]	= float(corrcoef(argsort(argsort(predicted)), argsort(argsort(actual)))[0, 1])
+		return stats
@@ -0,0 +1,139 @@
+### Includes ###
+## Native
+from hashlib		import blake2b
+from json			import dumps, loads
+from os				import getpid, makedirs
+from os.path		import dirname, expanduser
+from pickle			import dumps as pickleDumps, loads as pickleLoads, HIGHEST_PROTOCOL
+from sqlite3		import connect
+from time			import time
+## Project
+
+##
+# Trial store: SQLite file of finished hyperopt trials, shared by tuners on one machine
+#
+# Trials are grouped by study: A hash of everything a trial's loss depends on apart
+# from its hyperparameters. The tuner class, the model's configuration and data
+# fingerprint, the search space and the cross-validation settings (see
+# HyperoptHpTunerBase.trialStoreState). Tuners with a trialStore:
+#	- Warm-start from the study's stored trials, so TPE picks up where earlier runs stopped
+#	- Answer exact repeats of stored points without training
+#	- Append every trial they finish, for the other tuners and later runs
+#
+# Several processes can read and append at once (WAL journal). Results are pickles:
+# Only point it at a file you trust.
+##
+class TrialStore():
+	SCHEMA	= """
+		CREATE TABLE IF NOT EXISTS trials (
+			id			INTEGER PRIMARY KEY AUTOINCREMENT,
+			study		TEXT NOT NULL,
+			point		TEXT NOT NULL,
+			vals		TEXT NOT NULL,
+			loss		REAL,
+			reusable	INTEGER NOT NULL,
+			result		BLOB NOT NULL,
+			created		REAL NOT NULL
+		);
+		CREATE INDEX IF NOT EXISTS trials_study_point ON trials (study, point);
+	"""
+	##
+	# params:
+	#	path:		string SQLite file. Created with its directory if missing
+	#	timeout:	float seconds to wait for another process's write
+	##
+	def __init__(self, path, timeout=30):
+		self.path		= expanduser(path)	# string SQLite file
+		self.timeout	= timeout			# float seconds a write waits for the lock
+		self.connection	= False				# sqlite3.Connection, opened on first use per process
+		self.pid		= 0					# int process the connection was opened in
+	##
+	# Connections aren't shared with forked or spawned processes: Each opens its own
+	##
+	def __getstate__(self):
+		state				= self.__dict__.copy()
+		state["connection"]	= False
+		return state
+	@property
+	def database(self):
+		if not self.connection or self.pid != getpid():
+			if dirname(self.path):
+				makedirs(dirname(self.path), exist_ok=True)
+			self.connection	= connect(self.path, timeout=self.timeout)
+			self.pid		= getpid()
+			self.connection.execute("PRAGMA journal_mode=WAL")
+			self.connection.executescript(self.SCHEMA)
+		return self.connection
+	##
+	# Study key of a tuner's current configuration
+	#
+	# output:	string hex digest
+	##
+	def key(self, tuner):
+		digest	= blake2b(digest_size=20)
+		digest.update(repr(tuner.trialStoreState).encode())
+		return digest.hexdigest()
+	##
+	# Append a finished trial
+	#
+	# params:
+	#	study:		string study key
+	#	point:		string canonical hyperparameters, see HyperoptHpTunerBase.PointKey
+	#	vals:		dict hyperopt misc vals {label: [value] or []}
+	#	result:		dict hyperopt result document
+	#	reusable:	bool result can answer exact repeats. False for e.g. pruned trials
+	#
+	# output:	int row id
+	##
+	def add(self, study, point, vals, result, reusable=True):
+		with self.database as database:
+			cursor	= database.execute("INSERT INTO trials (study, point, vals, loss, reusable, result, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+				(study, point, dumps(vals, sort_keys=True, default=__class__.PlainValue), float(result["loss"]), int(reusable),
+				pickleDumps(result, protocol=HIGHEST_PROTOCOL), time()))
+		return cursor.lastrowid
+	##
+	# Stored result of a point, if it has a reusable one
+	#
+	# output:	dict hyperopt result document or None
+	##
+	def lookup(self, study, point):
+		row	= self.database.execute("SELECT result FROM trials WHERE study = ? AND point = ? AND reusable = 1 ORDER BY id LIMIT 1",
+			(study, point)).fetchone()
+		return pickleLoads(row[0]) if row else None
+	##
+	# A study's trials, oldest first
+	#
+	# params:
+	#	after:	int only rows with a greater id
+	#
+	# output:	[(int id, dict vals, dict result)]
+	##
+	def rows(self, study, after=0):
+		rows	= self.database.execute("SELECT id, vals, result FROM trials WHERE study = ? AND id > ? ORDER BY id", (study, after))
+		return [(id, loads(vals), pickleLoads(result)) for id, vals, result in rows]
+	##
+	# Stored trials per study: {string study: {"trials", "bestLoss"}}
+	##
+	@property
+	def studies(self):
+		rows	= self.database.execute("SELECT study, COUNT(*), MIN(loss) FROM trials GROUP BY study")
+		return {study: {"trials": count, "bestLoss": loss} for study, count, loss in rows}
+	##
+	# Delete a study's trials, or every trial
+	##
+	def clear(self, study=None):
+		with self.database as database:
+			if study is None:
+				database.execute("DELETE FROM trials")
+			else:
+				database.execute("DELETE FROM trials WHERE study = ?", (study,))
+	##
+	# NumPy scalars in hyperopt's vals -> JSON values
+	##
+	@staticmethod
+	def PlainValue(value):
+		return value.item()
+	def close(self):
+		if self.connection:
+			self.connection.close()
+		self.connection	= False